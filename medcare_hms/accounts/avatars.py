@@ -0,0 +1,90 @@
+"""
+Avatar URL resolution for any kind of user.
+
+get_avatar_urls() resolves a batch of users with at most one query per profile
+type (doctor, then patient, then receptionist, the order the templates have
+always preferred) and caches each user's URL under its own key. accounts.signals
+drops that key whenever one of the user's profiles is saved or deleted, so a new
+profile picture shows up straight away.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+CACHE_KEY_PREFIX = 'accounts:avatar:'
+DEFAULT_AVATAR_URL = '/static/profile_pictures/default.jpeg'
+
+
+def _profile_models():
+    from doctors.models import DoctorProfile
+    from patients.models import PatientProfile
+    from receptionist.models import ReceptionistProfile
+
+    return (DoctorProfile, PatientProfile, ReceptionistProfile)
+
+
+def _cache_key(user_id):
+    return f'{CACHE_KEY_PREFIX}{user_id}'
+
+
+def invalidate_avatar(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def _load(user_ids):
+    urls = {}
+    pending = set(user_ids)
+    for model in _profile_models():
+        if not pending:
+            break
+        rows = (
+            model.objects.filter(user_id__in=pending)
+            .exclude(profile_picture='')
+            .exclude(profile_picture__isnull=True)
+            .values_list('user_id', 'profile_picture')
+        )
+        for user_id, name in rows:
+            urls[user_id] = default_storage.url(name)
+        pending -= urls.keys()
+    for user_id in pending:
+        urls[user_id] = DEFAULT_AVATAR_URL
+    return urls
+
+
+def get_avatar_urls(users):
+    """Return {user_id: avatar URL} for an iterable of users or user ids"""
+    user_ids = {getattr(user, 'pk', user) for user in users}
+    user_ids.discard(None)
+    if not user_ids:
+        return {}
+
+    keys = {_cache_key(user_id): user_id for user_id in user_ids}
+    urls = {keys[key]: url for key, url in cache.get_many(keys).items()}
+    missing = user_ids - urls.keys()
+    if missing:
+        loaded = _load(missing)
+        cache.set_many(
+            {_cache_key(user_id): url for user_id, url in loaded.items()},
+            timeout=getattr(settings, 'AVATAR_CACHE_TTL', 60 * 60),
+        )
+        urls.update(loaded)
+    return urls
+
+
+def prime_avatars(users):
+    """Resolve avatars for a list of user objects in one batch and remember them on each"""
+    users = [user for user in users if getattr(user, 'pk', None) is not None]
+    urls = get_avatar_urls(users)
+    for user in users:
+        user._avatar_url = urls[user.pk]
+    return urls
+
+
+def get_avatar_url(user):
+    url = getattr(user, '_avatar_url', None)
+    if url is None:
+        if getattr(user, 'pk', None) is None:
+            return DEFAULT_AVATAR_URL
+        url = prime_avatars([user])[user.pk]
+    return url
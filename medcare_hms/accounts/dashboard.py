@@ -0,0 +1,156 @@
+"""
+Metrics for the admin dashboard.
+
+Each section gets its figures from one conditional-aggregation query per model
+and is cached on its own for ADMIN_DASHBOARD_CACHE_TTL seconds. Saving or
+deleting one of a section's models drops just that section's cache entry (see
+accounts.signals), so a burst of chat messages does not force the billing
+figures to be recomputed.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+CACHE_KEY_PREFIX = 'accounts:admin_dashboard:'
+
+
+def _money(expression, **filters):
+    return Coalesce(
+        Sum(expression, **filters), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def _user_stats():
+    from .models import UserProfile
+
+    active = Q(user__is_active=True)
+    stats = UserProfile.objects.aggregate(
+        active_doctors_count=Count('id', filter=active & Q(role='DOCTOR')),
+        active_receptionists_count=Count('id', filter=active & Q(role='RECEPTIONIST')),
+        active_patients_count=Count('id', filter=active & Q(role='PATIENT')),
+        pending_staff_count=Count('id', filter=Q(role__in=['DOCTOR', 'RECEPTIONIST'], user__is_active=False)),
+        new_patients_count=Count(
+            'id', filter=Q(role='PATIENT', user__date_joined__gte=timezone.now() - timedelta(days=30))
+        ),
+    )
+    total_users = stats['active_doctors_count'] + stats['active_receptionists_count'] + stats['active_patients_count']
+    stats['total_users'] = total_users
+    for role, key in (('patient', 'active_patients_count'), ('doctor', 'active_doctors_count'),
+                      ('receptionist', 'active_receptionists_count')):
+        stats[f'{role}_percentage'] = int((stats[key] / total_users) * 100) if total_users else 0
+    return stats
+
+
+def _appointment_stats():
+    from patients.models import Appointment
+
+    return Appointment.objects.aggregate(
+        total_appointments=Count('id'),
+        pending_appointments=Count('id', filter=Q(status='Pending')),
+        approved_appointments=Count('id', filter=Q(status='Approved')),
+        completed_appointments=Count('id', filter=Q(status='Completed')),
+        todays_appointments=Count('id', filter=Q(appointment_date=timezone.now().date())),
+        appointments_last_week=Count('id', filter=Q(created_at__gte=timezone.now() - timedelta(days=7))),
+    )
+
+
+def _billing_stats():
+    from billing.models import Bill
+
+    return Bill.objects.aggregate(
+        total_bills=Count('id'),
+        unpaid_bills=Count('id', filter=Q(status='Unpaid')),
+        paid_bills=Count('id', filter=Q(status='Paid')),
+        total_revenue=_money('amount_paid', filter=Q(status='Paid')),
+        pending_revenue=_money('total_amount', filter=Q(status__in=['Unpaid', 'Partially Paid'])),
+        revenue_last_month=_money(
+            'amount_paid', filter=Q(status='Paid', created_at__gte=timezone.now() - timedelta(days=30))
+        ),
+    )
+
+
+def _prescription_stats():
+    from prescriptions.models import Prescription
+
+    return Prescription.objects.aggregate(
+        total_prescriptions=Count('id'),
+        active_prescriptions=Count('id', filter=Q(status='ACTIVE')),
+        completed_prescriptions=Count('id', filter=Q(status='COMPLETED')),
+    )
+
+
+def _medical_record_stats():
+    from patients.models import MedicalRecord
+
+    return MedicalRecord.objects.aggregate(
+        total_medical_records=Count('id'),
+        recent_medical_records=Count('id', filter=Q(record_date__gte=timezone.now().date() - timedelta(days=7))),
+    )
+
+
+def _facility_stats():
+    from management.models import Department, Room
+
+    stats = Department.objects.aggregate(total_departments=Count('id', filter=Q(is_active=True)))
+    stats.update(Room.objects.filter(is_active=True).aggregate(
+        total_rooms=Count('id'),
+        available_rooms=Count('id', filter=Q(status='AVAILABLE')),
+        occupied_rooms=Count('id', filter=Q(status='OCCUPIED')),
+    ))
+    return stats
+
+
+def _chat_stats():
+    from chat.models import ChatMessage
+
+    return ChatMessage.objects.aggregate(
+        total_messages=Count('id'),
+        recent_messages=Count('id', filter=Q(timestamp__gte=timezone.now() - timedelta(days=1))),
+    )
+
+
+# section name -> (compute function, models whose changes invalidate it)
+SECTIONS = {
+    'users': (_user_stats, ['accounts.UserProfile', 'auth.User']),
+    'appointments': (_appointment_stats, ['patients.Appointment']),
+    'billing': (_billing_stats, ['billing.Bill']),
+    'prescriptions': (_prescription_stats, ['prescriptions.Prescription']),
+    'medical_records': (_medical_record_stats, ['patients.MedicalRecord']),
+    'facilities': (_facility_stats, ['management.Department', 'management.Room']),
+    'chat': (_chat_stats, ['chat.ChatMessage']),
+}
+
+
+def invalidate_section(section):
+    cache.delete(CACHE_KEY_PREFIX + section)
+
+
+def get_dashboard_metrics():
+    """
+    Return (metrics, timings) for the admin dashboard.
+
+    metrics is a flat dict of every section's figures. timings maps each
+    section to {'ms': ..., 'cached': ...}, the time spent fetching it and
+    whether it came from the cache.
+    """
+    ttl = getattr(settings, 'ADMIN_DASHBOARD_CACHE_TTL', 60)
+    cached = cache.get_many([CACHE_KEY_PREFIX + name for name in SECTIONS])
+    metrics = {}
+    timings = {}
+    for name, (compute, _) in SECTIONS.items():
+        key = CACHE_KEY_PREFIX + name
+        started = time.perf_counter()
+        stats = cached.get(key)
+        hit = stats is not None
+        if not hit:
+            stats = compute()
+            cache.set(key, stats, ttl)
+        timings[name] = {'ms': round((time.perf_counter() - started) * 1000, 2), 'cached': hit}
+        metrics.update(stats)
+    return metrics, timings
@@ -4,6 +4,8 @@ from functools import wraps
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 
+from .roles import get_request_role_info
+
 def role_required(allowed_roles=[]):
     """
     Decorator for views that checks that the user is logged in and has the correct role.
@@ -20,21 +22,23 @@ def role_required(allowed_roles=[]):
             if not request.user.is_authenticated:
                 return redirect('login') # Or your login URL
 
+            role_info = get_request_role_info(request)
+
             # 2. Superusers always allowed (admin override)
             if request.user.is_superuser:
                 # Optionally ensure a profile exists for consistency
-                from accounts.models import UserProfile
-                if not hasattr(request.user, 'userprofile'):
+                if not role_info.has_profile:
+                    from accounts.models import UserProfile
                     # Create a synthetic ADMIN profile so role-based UI works
-                    UserProfile.objects.create(user=request.user, role='ADMIN')
+                    UserProfile.objects.get_or_create(user=request.user, defaults={'role': 'ADMIN'})
                 return view_func(request, *args, **kwargs)
 
             # 3. Ensure profile exists; if not, deny
-            if not hasattr(request.user, 'userprofile'):
+            if not role_info.has_profile:
                 raise PermissionDenied("You do not have a role assigned.")
 
             # 4. Check role membership
-            if request.user.userprofile.role in allowed_roles:
+            if role_info.role in allowed_roles:
                 return view_func(request, *args, **kwargs)
             raise PermissionDenied("You do not have permission to access this page.")
         
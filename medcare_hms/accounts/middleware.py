@@ -0,0 +1,10 @@
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_role_info
+
+
+class RoleInfoMiddleware(MiddlewareMixin):
+    """Attach request.role_info, resolved on first use and shared by the whole request."""
+    def process_request(self, request):
+        request.role_info = SimpleLazyObject(lambda: get_role_info(request.user, request.session))
@@ -0,0 +1,148 @@
+"""
+Role resolution for the current user.
+
+A user's role comes from their UserProfile row and which of the doctor,
+patient or receptionist profiles they have. get_role_info() works that out in
+one query, memoises it on the user object and, for the logged-in user, keeps it
+in the session. The session copy carries a version token from the cache;
+accounts.signals drops the token whenever one of the user's profile rows is
+saved or deleted, so a role change is picked up on the next request. The
+token only reaches every worker when the cache is shared between them (see
+CACHES in settings); with a per-process cache other workers keep serving the
+old role.
+RoleInfoMiddleware exposes the result as request.role_info.
+"""
+
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+SESSION_KEY = '_role_info'
+VERSION_KEY_PREFIX = 'accounts:role_version:'
+
+# Profile relations in the order the templates have always checked them
+PROFILE_KINDS = ('doctor', 'patient', 'receptionist')
+
+THEME_ROLES = {'DOCTOR': 'doctor', 'PATIENT': 'patient', 'RECEPTIONIST': 'receptionist'}
+
+
+class RoleInfo:
+    """What the UI and access checks need to know about a user's role"""
+
+    def __init__(self, role=None, profile_kind=None, is_superuser=False, is_staff=False):
+        self.role = role
+        self.profile_kind = profile_kind
+        self.is_superuser = is_superuser
+        self.is_staff = is_staff
+
+    @property
+    def has_profile(self):
+        return self.role is not None
+
+    @property
+    def theme_kind(self):
+        """doctor/patient/receptionist/admin, or None when nothing identifies the user"""
+        if self.is_superuser or self.is_staff:
+            return 'admin'
+        return self.profile_kind or THEME_ROLES.get(self.role)
+
+    @property
+    def display_name(self):
+        if self.is_superuser:
+            return 'Administrator'
+        if self.profile_kind:
+            return self.profile_kind.title()
+        if self.role:
+            return self.role.title()
+        return 'User'
+
+    def __repr__(self):
+        return f'<RoleInfo role={self.role!r} profile_kind={self.profile_kind!r}>'
+
+
+ANONYMOUS = RoleInfo()
+
+
+def _version_key(user_id):
+    return f'{VERSION_KEY_PREFIX}{user_id}'
+
+
+def _current_version(user_id):
+    # A missing token (never set, evicted or invalidated) gets a fresh one, which
+    # can never match an older session copy
+    return cache.get_or_set(_version_key(user_id), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_role(user_id):
+    """Force the next request from this user to re-resolve their role"""
+    cache.delete(_version_key(user_id))
+
+
+def _load(user_ids):
+    """{user_id: (role, profile_kind)} for the given ids, in one query"""
+    rows = User.objects.filter(pk__in=user_ids).values(
+        'pk', 'userprofile__role', *(f'{kind}profile__id' for kind in PROFILE_KINDS)
+    )
+    return {
+        row['pk']: (
+            row['userprofile__role'],
+            next((kind for kind in PROFILE_KINDS if row[f'{kind}profile__id']), None),
+        )
+        for row in rows
+    }
+
+
+def get_role_info(user, session=None):
+    """
+    Resolve a user's role, at most once per user object.
+
+    Pass the request session for the logged-in user to reuse the resolution
+    across requests until the role changes.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return ANONYMOUS
+    cached = getattr(user, '_role_info', None)
+    if cached is not None:
+        return cached
+
+    version = stored = None
+    if session is not None:
+        version = _current_version(user.pk)
+        stored = session.get(SESSION_KEY)
+    if stored and stored.get('user_id') == user.pk and stored.get('version') == version:
+        role, profile_kind = stored['role'], stored['profile_kind']
+    else:
+        role, profile_kind = _load([user.pk]).get(user.pk, (None, None))
+        if session is not None:
+            session[SESSION_KEY] = {
+                'user_id': user.pk, 'role': role, 'profile_kind': profile_kind, 'version': version,
+            }
+
+    info = RoleInfo(role, profile_kind, user.is_superuser, user.is_staff)
+    user._role_info = info
+    return info
+
+
+def prime_role_info(users):
+    """Resolve roles for a list of user objects (e.g. a sidebar or message stream) in one query"""
+    pending = [
+        user for user in users
+        if getattr(user, 'is_authenticated', False) and getattr(user, '_role_info', None) is None
+    ]
+    if not pending:
+        return
+    loaded = _load({user.pk for user in pending})
+    for user in pending:
+        role, profile_kind = loaded.get(user.pk, (None, None))
+        user._role_info = RoleInfo(role, profile_kind, user.is_superuser, user.is_staff)
+
+
+def get_request_role_info(request):
+    """request.role_info when the middleware ran, otherwise resolve it here"""
+    if request is None:
+        return ANONYMOUS
+    info = getattr(request, 'role_info', None)
+    if info is None:
+        info = get_role_info(getattr(request, 'user', None), getattr(request, 'session', None))
+    return info
@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from .avatars import invalidate_avatar
+from .dashboard import SECTIONS, invalidate_section
+from .roles import invalidate_role
+
+
+def _section_invalidator(section):
+    def invalidate(sender, **kwargs):
+        invalidate_section(section)
+    return invalidate
+
+
+# Keep references so the weakly-connected receivers stay alive
+_receivers = []
+
+for section, (_, model_labels) in SECTIONS.items():
+    receiver = _section_invalidator(section)
+    _receivers.append(receiver)
+    for label in model_labels:
+        model = apps.get_model(label)
+        post_save.connect(receiver, sender=model, dispatch_uid=f'admin_dashboard_{section}_{label}_save')
+        post_delete.connect(receiver, sender=model, dispatch_uid=f'admin_dashboard_{section}_{label}_delete')
+
+
+def _profile_changed(sender, instance, **kwargs):
+    invalidate_role(instance.user_id)
+    invalidate_avatar(instance.user_id)
+
+
+for label in ('accounts.UserProfile', 'doctors.DoctorProfile', 'patients.PatientProfile',
+              'receptionist.ReceptionistProfile'):
+    model = apps.get_model(label)
+    post_save.connect(_profile_changed, sender=model, dispatch_uid=f'user_profile_{label}_save')
+    post_delete.connect(_profile_changed, sender=model, dispatch_uid=f'user_profile_{label}_delete')
@@ -1,28 +1,23 @@
 from django import template
 from django.utils.safestring import mark_safe
 
+from accounts.avatars import get_avatar_url
+from accounts.roles import get_role_info
+
 register = template.Library()
 
+ROLE_COLORS = {
+    'doctor': '#14B8A6',  # Teal accent for doctors
+    'patient': '#0E7490',  # Primary teal for patients
+    'receptionist': '#5ce9f6',  # Purple accent for receptionists
+}
+
 @register.simple_tag
 def get_profile_image_url(user):
     """
     Get the profile image URL for any user type, with fallbacks
     """
-    try:
-        # Check if user has a doctor profile
-        if hasattr(user, 'doctorprofile') and user.doctorprofile.profile_picture:
-            return user.doctorprofile.profile_picture.url
-        # Check if user has a patient profile
-        elif hasattr(user, 'patientprofile') and user.patientprofile.profile_picture:
-            return user.patientprofile.profile_picture.url
-        # Check if user has a receptionist profile
-        elif hasattr(user, 'receptionistprofile') and user.receptionistprofile.profile_picture:
-            return user.receptionistprofile.profile_picture.url
-    except (AttributeError, ValueError):
-        pass
-    
-    # Return default image path
-    return '/static/profile_pictures/default.jpeg'
+    return get_avatar_url(user)
 
 @register.simple_tag
 def get_user_initials(user):
@@ -42,17 +37,7 @@ def get_user_role_color(user):
     """
     Get the theme color for user role
     """
-    try:
-        if hasattr(user, 'doctorprofile'):
-            return '#14B8A6'  # Teal accent for doctors
-        elif hasattr(user, 'patientprofile'):
-            return '#0E7490'  # Primary teal for patients
-        elif hasattr(user, 'receptionistprofile'):
-            return '#5ce9f6'  # Purple accent for receptionists
-    except AttributeError:
-        pass
-    
-    return '#14B8A6'  # Default to teal
+    return ROLE_COLORS.get(get_role_info(user).profile_kind, '#14B8A6')  # Default to teal
 
 @register.inclusion_tag('components/profile_image.html')
 def profile_image(user, size="40", css_class="user-avatar", show_fallback=True):
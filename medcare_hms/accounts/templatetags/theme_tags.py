@@ -1,5 +1,6 @@
 from django import template
-from django.contrib.auth.models import User
+
+from accounts.roles import get_request_role_info
 
 register = template.Library()
 
@@ -13,38 +14,9 @@ def get_user_theme(context):
     if not request or not request.user.is_authenticated:
         return 'public-theme'  # Default theme for non-authenticated users
     
-    user = request.user
-    
-    # Check if user is admin/superuser
-    if user.is_superuser or user.is_staff:
-        return 'admin-theme'
-    
-    # Check for specific role profiles
-    try:
-        # Check for doctor profile
-        if hasattr(user, 'doctorprofile'):
-            return 'doctor-theme'
-        
-        # Check for patient profile  
-        elif hasattr(user, 'patientprofile'):
-            return 'patient-theme'
-            
-        # Check for receptionist profile
-        elif hasattr(user, 'receptionistprofile'):
-            return 'receptionist-theme'
-            
-        # Check for general user profile with role
-        elif hasattr(user, 'userprofile'):
-            role = user.userprofile.role.lower() if user.userprofile.role else None
-            if role == 'doctor':
-                return 'doctor-theme'
-            elif role == 'patient':
-                return 'patient-theme'
-            elif role == 'receptionist':
-                return 'receptionist-theme'
-            
-    except Exception:
-        pass
+    theme_kind = get_request_role_info(request).theme_kind
+    if theme_kind:
+        return f'{theme_kind}-theme'
     
     # Default fallback
     return 'patient-theme'
@@ -174,23 +146,4 @@ def get_user_role_display(context):
     if not request or not request.user.is_authenticated:
         return 'Guest'
     
-    user = request.user
-    
-    if user.is_superuser:
-        return 'Administrator'
-    
-    try:
-        if hasattr(user, 'doctorprofile'):
-            return 'Doctor'
-        elif hasattr(user, 'patientprofile'):
-            return 'Patient'
-        elif hasattr(user, 'receptionistprofile'):
-            return 'Receptionist'
-        elif hasattr(user, 'userprofile'):
-            role = user.userprofile.role
-            if role:
-                return role.title()
-    except Exception:
-        pass
-    
-    return 'User'
\ No newline at end of file
+    return get_request_role_info(request).display_name
@@ -1,8 +1,15 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.core.cache import cache
+from billing.models import Bill
+from patients.models import Appointment
 from .models import UserProfile
 from .forms import RegistrationForm 
+from .dashboard import get_dashboard_metrics
+from .roles import get_role_info
+from .avatars import DEFAULT_AVATAR_URL, get_avatar_urls
+from doctors.models import DoctorProfile
 
 
 # A helper function to create users of different roles for our tests
@@ -133,4 +140,116 @@ class DashboardAccessTests(TestCase):
         self.assertRedirects(response, f"{reverse('accounts:login')}?next={reverse('accounts:doctor_dashboard')}")
         
         response = self.client.get(reverse('accounts:admin_dashboard'))
-        self.assertRedirects(response, f"{reverse('accounts:login')}?next={reverse('accounts:admin_dashboard')}")
\ No newline at end of file
+        self.assertRedirects(response, f"{reverse('accounts:login')}?next={reverse('accounts:admin_dashboard')}")
+
+class AdminDashboardMetricsTests(TestCase):
+    """
+    Tests for the cached, per-section admin dashboard metrics.
+    """
+
+    def setUp(self):
+        cache.clear()
+        create_user_with_role('adminuser', 'password', 'ADMIN')
+        create_user_with_role('doctoruser', 'password', 'DOCTOR', is_active=False)
+        self.client.login(username='adminuser', password='password')
+
+    def test_metrics_match_plain_counts(self):
+        """Conditional aggregates agree with the per-filter counts they replace."""
+        metrics, _ = get_dashboard_metrics()
+        self.assertEqual(metrics['pending_staff_count'], UserProfile.objects.filter(
+            role__in=['DOCTOR', 'RECEPTIONIST'], user__is_active=False
+        ).count())
+        self.assertEqual(metrics['total_appointments'], Appointment.objects.count())
+        self.assertEqual(metrics['paid_bills'], Bill.objects.filter(status='Paid').count())
+
+    def test_sections_are_cached_until_their_models_change(self):
+        """A second load is served from cache; saving a model recomputes only its section."""
+        _, timings = get_dashboard_metrics()
+        self.assertFalse(any(t['cached'] for t in timings.values()))
+
+        with self.assertNumQueries(0):
+            _, timings = get_dashboard_metrics()
+        self.assertTrue(all(t['cached'] for t in timings.values()))
+
+        create_user_with_role('patientuser', 'password', 'PATIENT')
+        metrics, timings = get_dashboard_metrics()
+        self.assertFalse(timings['users']['cached'])
+        self.assertTrue(timings['billing']['cached'])
+        self.assertEqual(metrics['active_patients_count'], UserProfile.objects.filter(
+            role='PATIENT', user__is_active=True
+        ).count())
+
+    def test_dashboard_reports_section_timings(self):
+        """The dashboard response carries a Server-Timing entry per section."""
+        response = self.client.get(reverse('accounts:admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('dashboard_timings', response.context)
+        self.assertIn('billing;dur=', response['Server-Timing'])
+
+
+class RoleInfoTests(TestCase):
+    """
+    Tests for the request-scoped role resolver and its session cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user_with_role('doctoruser', 'password', 'DOCTOR')
+
+    def test_role_is_resolved_once_per_user_object(self):
+        """Repeated lookups on the same user object do not query again."""
+        user = User.objects.get(pk=self.user.pk)
+        info = get_role_info(user)
+        self.assertEqual(info.role, 'DOCTOR')
+        self.assertIsNone(info.profile_kind)
+        with self.assertNumQueries(0):
+            self.assertIs(get_role_info(user), info)
+
+    def test_session_copy_is_reused_until_the_role_changes(self):
+        """A new request reuses the session copy; saving the profile forces a reload."""
+        session = {}
+        get_role_info(User.objects.get(pk=self.user.pk), session)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role_info(user, session).role, 'DOCTOR')
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'RECEPTIONIST'
+        profile.save()
+        self.assertEqual(get_role_info(User.objects.get(pk=self.user.pk), session).role, 'RECEPTIONIST')
+
+    def test_middleware_attaches_role_info(self):
+        """Views and decorators see the same request.role_info."""
+        self.client.login(username='doctoruser', password='password')
+        response = self.client.get(reverse('accounts:doctor_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.role_info.role, 'DOCTOR')
+
+
+class AvatarResolverTests(TestCase):
+    """
+    Tests for batched, cached avatar URL resolution.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_user_with_role('doctoruser', 'password', 'DOCTOR')
+        self.profile = DoctorProfile.objects.create(user=self.doctor, specialization='Cardiology')
+        self.patients = [create_user_with_role(f'patient{i}', 'password', 'PATIENT') for i in range(3)]
+
+    def test_batch_uses_one_query_per_profile_type(self):
+        """A whole list resolves in at most three queries, then from the cache."""
+        users = [self.doctor] + self.patients
+        with self.assertNumQueries(3):
+            urls = get_avatar_urls(users)
+        self.assertEqual(urls[self.doctor.pk], self.profile.profile_picture.url)
+        self.assertEqual(urls[self.patients[0].pk], DEFAULT_AVATAR_URL)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_avatar_urls(users), urls)
+
+    def test_saving_a_profile_picture_drops_the_cached_url(self):
+        """A new picture is served on the next lookup."""
+        get_avatar_urls([self.doctor])
+        self.profile.profile_picture = 'profile_pictures/doctors/doctoruser/new.png'
+        self.profile.save()
+        self.assertEqual(get_avatar_urls([self.doctor])[self.doctor.pk], self.profile.profile_picture.url)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SystemLog
+from .models import RequestTrace, SystemLog
 
 @admin.register(SystemLog)
 class SystemLogAdmin(admin.ModelAdmin):
@@ -21,3 +21,11 @@ class SystemLogAdmin(admin.ModelAdmin):
             ('30d', (now - timezone.timedelta(days=30)).isoformat()),
         ]
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(RequestTrace)
+class RequestTraceAdmin(admin.ModelAdmin):
+    list_display = ('created_at','method','path','status_code','duration_ms','db_queries','db_time_ms','user','correlation_id')
+    list_filter = ('method','status_code','created_at')
+    search_fields = ('path','correlation_id','user__username')
+    readonly_fields = ('created_at',)
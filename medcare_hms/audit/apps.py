@@ -7,3 +7,5 @@ class AuditConfig(AppConfig):
 
     def ready(self):
         from . import signals  # noqa
+        from .registry import register_configured_models
+        register_configured_models()
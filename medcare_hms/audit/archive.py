@@ -0,0 +1,192 @@
+"""
+Archiving of old SystemLog rows to compressed NDJSON segments.
+
+archive_logs() walks the rows older than a cutoff in batches of consecutive
+ids. Each batch is split by day (local date of created_at) and every day's
+rows are written to their own gzip segment:
+
+    AUDIT_ARCHIVE_DIR/2025/03/2025-03-14.1200-1449.ndjson.gz
+
+A segment is written to a temporary name and renamed into place, then
+recorded in manifest.json, and only then are that batch's rows deleted, so an
+interrupted run never loses rows; running it again rewrites the same segment
+in place. Each DELETE is bounded to one batch's id range; delete_in_batches()
+applies the same bounded deletes to other tables (purge_audit_logs uses it
+for RequestTrace).
+
+read_archive() answers queries from the segments alone: the manifest narrows
+a date range down to the files that can hold matching rows, and a correlation
+id is checked against the raw line before it is parsed.
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import SystemLog
+
+ARCHIVE_BATCH_SIZE = 5000
+MANIFEST_NAME = 'manifest.json'
+
+_FIELDS = (
+    'id', 'created_at', 'actor_id', 'actor__username', 'action', 'target_model', 'target_id',
+    'summary', 'details', 'ip_address', 'user_agent', 'correlation_id',
+)
+_KEYS = (
+    'id', 'created_at', 'actor_id', 'actor', 'action', 'target_model', 'target_id',
+    'summary', 'details', 'ip_address', 'user_agent', 'correlation_id',
+)
+
+
+def archive_dir(path=None):
+    return Path(path or getattr(settings, 'AUDIT_ARCHIVE_DIR', settings.BASE_DIR / 'audit_archive'))
+
+
+def load_manifest(root):
+    try:
+        with open(root / MANIFEST_NAME) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'segments': []}
+
+
+def _save_manifest(root, manifest):
+    tmp = root / f'{MANIFEST_NAME}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, root / MANIFEST_NAME)
+
+
+def _write_segment(root, day, rows):
+    first_id, last_id = rows[0]['id'], rows[-1]['id']
+    relative = Path(f'{day:%Y}', f'{day:%m}', f'{day.isoformat()}.{first_id}-{last_id}.ndjson.gz')
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, default=str) + '\n')
+    os.replace(tmp, path)
+    return {
+        'file': relative.as_posix(),
+        'date': day.isoformat(),
+        'first_id': first_id,
+        'last_id': last_id,
+        'count': len(rows),
+        'start': rows[0]['created_at'],
+        'end': rows[-1]['created_at'],
+    }
+
+
+def _batch_by_day(queryset):
+    by_day = {}
+    for values in queryset.order_by('id').values_list(*_FIELDS).iterator():
+        row = dict(zip(_KEYS, values))
+        created_at = row['created_at']
+        row['created_at'] = created_at.isoformat()
+        by_day.setdefault(timezone.localtime(created_at).date(), []).append(row)
+    for rows in by_day.values():
+        rows.sort(key=lambda row: row['created_at'])
+    return by_day
+
+
+def archive_logs(cutoff, batch_size=ARCHIVE_BATCH_SIZE, path=None, delete=True):
+    """
+    Move logs created before cutoff into archive segments.
+
+    With delete=False the rows are only copied. Returns (rows archived,
+    segments written).
+    """
+    root = archive_dir(path)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(root)
+    known = {segment['file']: index for index, segment in enumerate(manifest['segments'])}
+    old = SystemLog.objects.filter(created_at__lt=cutoff)
+    bounds = old.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0, 0
+
+    archived = segments = 0
+    low = bounds['low']
+    while low <= bounds['high']:
+        batch = old.filter(id__gte=low, id__lt=low + batch_size)
+        by_day = _batch_by_day(batch)
+        for day in sorted(by_day):
+            segment = _write_segment(root, day, by_day[day])
+            if segment['file'] in known:
+                manifest['segments'][known[segment['file']]] = segment
+            else:
+                known[segment['file']] = len(manifest['segments'])
+                manifest['segments'].append(segment)
+            archived += len(by_day[day])
+            segments += 1
+        if by_day:
+            _save_manifest(root, manifest)
+            if delete:
+                batch.delete()
+        low += batch_size
+    return archived, segments
+
+
+def delete_logs(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Delete logs created before cutoff one id range at a time; returns the number deleted"""
+    return delete_in_batches(SystemLog.objects.filter(created_at__lt=cutoff), batch_size)
+
+
+def delete_in_batches(old, batch_size=ARCHIVE_BATCH_SIZE):
+    """Delete the rows of a queryset one id range at a time; returns the number deleted"""
+    bounds = old.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+    deleted = 0
+    low = bounds['low']
+    while low <= bounds['high']:
+        count, _ = old.filter(id__gte=low, id__lt=low + batch_size).delete()
+        deleted += count
+        low += batch_size
+    return deleted
+
+
+def _as_datetime(value, end=False):
+    if value is None or hasattr(value, 'hour'):
+        return value
+    # A bare date covers the whole day
+    return timezone.make_aware(datetime.combine(value, time.max if end else time.min))
+
+
+def read_archive(start=None, end=None, correlation_id=None, path=None):
+    """
+    Yield archived log dicts, oldest segment first.
+
+    start and end are dates or aware datetimes (inclusive); any of the three
+    filters may be left out.
+    """
+    root = archive_dir(path)
+    start, end = _as_datetime(start), _as_datetime(end, end=True)
+    start_day = timezone.localtime(start).date().isoformat() if start else None
+    end_day = timezone.localtime(end).date().isoformat() if end else None
+    needle = json.dumps(correlation_id) if correlation_id else None
+
+    segments = sorted(load_manifest(root)['segments'], key=lambda segment: (segment['date'], segment['first_id']))
+    for segment in segments:
+        if (start_day and segment['date'] < start_day) or (end_day and segment['date'] > end_day):
+            continue
+        with gzip.open(root / segment['file'], 'rt', encoding='utf-8') as f:
+            for line in f:
+                if needle and needle not in line:
+                    continue
+                row = json.loads(line)
+                if correlation_id and row['correlation_id'] != correlation_id:
+                    continue
+                if start or end:
+                    created_at = parse_datetime(row['created_at'])
+                    if (start and created_at < start) or (end and created_at > end):
+                        continue
+                yield row
@@ -0,0 +1,104 @@
+"""
+Buffered writing of SystemLog entries.
+
+audit_log() no longer INSERTs on the spot. Inside buffered() (which
+AuditBufferMiddleware wraps around every request) entries collect in a list
+and are written with one bulk_create when the block ends. An entry created
+inside a transaction the view opened joins the buffer only once that
+transaction commits, so rolled-back changes leave no audit trail. Outside a
+buffer an entry is written on commit, or straight away in autocommit.
+
+With AUDIT_LOG_ASYNC on, the batch is handed to a background thread instead of
+being written before the response goes out.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import SystemLog
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _atomic_depth():
+    return (connection.in_atomic_block, len(connection.savepoint_ids))
+
+
+def _write(entries):
+    try:
+        SystemLog.objects.bulk_create(entries)
+    except Exception:
+        logger.exception("Failed to write %d audit log entries", len(entries))
+
+
+def _write_in_background(entries):
+    try:
+        _write(entries)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audit-writer')
+        return _executor
+
+
+def flush(entries):
+    if not entries:
+        return
+    if getattr(settings, 'AUDIT_LOG_ASYNC', False):
+        _get_executor().submit(_write_in_background, entries)
+    else:
+        _write(entries)
+
+
+def _accept(entry):
+    buffer = getattr(_state, 'buffer', None)
+    if buffer is not None:
+        buffer.append(entry)
+    else:
+        flush([entry])
+
+
+def enqueue(entry):
+    """Queue one unsaved SystemLog for writing"""
+    request = getattr(_state, 'request', None)
+    if request is not None and entry.correlation_id is None:
+        entry.correlation_id = getattr(request, 'correlation_id', None)
+
+    if getattr(_state, 'buffer', None) is not None and _atomic_depth() == _state.depth:
+        _state.buffer.append(entry)
+    elif connection.in_atomic_block:
+        transaction.on_commit(lambda: _accept(entry))
+    else:
+        flush([entry])
+
+
+@contextmanager
+def buffered(request=None):
+    """Collect audit entries for the duration of the block and write them in one batch"""
+    if getattr(_state, 'buffer', None) is not None:
+        yield
+        return
+    _state.buffer = []
+    _state.request = request
+    _state.depth = _atomic_depth()
+    try:
+        yield
+    finally:
+        entries = _state.buffer
+        _state.buffer = None
+        _state.request = None
+        flush(entries)
@@ -1,22 +1,42 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from audit.models import SystemLog
+from audit.archive import ARCHIVE_BATCH_SIZE, archive_dir, archive_logs, delete_in_batches, delete_logs
+from audit.models import RequestTrace, SystemLog
 
 class Command(BaseCommand):
-    help = 'Purge or archive audit logs older than N days (default 90).'
+    help = 'Purge or archive audit logs older than N days (default 90); request traces that old are deleted.'
 
     def add_arguments(self, parser):
         parser.add_argument('--days', type=int, default=90, help='Age in days beyond which logs are purged')
         parser.add_argument('--dry-run', action='store_true', help='Only report how many would be deleted')
+        parser.add_argument('--archive', action='store_true', help='Write the logs to compressed NDJSON segments before deleting them')
+        parser.add_argument('--archive-dir', help='Archive location (default AUDIT_ARCHIVE_DIR)')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Ids handled per batch and per DELETE')
 
     def handle(self, *args, **options):
         days = options['days']
         cutoff = timezone.now() - timedelta(days=days)
-        qs = SystemLog.objects.filter(created_at__lt=cutoff)
-        count = qs.count()
+        old_traces = RequestTrace.objects.filter(created_at__lt=cutoff)
         if options['dry_run']:
-            self.stdout.write(self.style.NOTICE(f"[DRY RUN] {count} logs older than {days} days would be deleted."))
+            count = SystemLog.objects.filter(created_at__lt=cutoff).count()
+            verb = 'archived' if options['archive'] else 'deleted'
+            self.stdout.write(self.style.NOTICE(
+                f"[DRY RUN] {count} logs older than {days} days would be {verb}; "
+                f"{old_traces.count()} request traces would be deleted."
+            ))
             return
-        qs.delete()
-        self.stdout.write(self.style.SUCCESS(f"Deleted {count} logs older than {days} days."))
\ No newline at end of file
+        # Traces are only diagnostics; they are never archived
+        traces = delete_in_batches(old_traces, batch_size=options['batch_size'])
+        if options['archive']:
+            root = archive_dir(options['archive_dir'])
+            count, segments = archive_logs(cutoff, batch_size=options['batch_size'], path=root)
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {count} logs older than {days} days into {segments} segments under {root}; "
+                f"deleted {traces} request traces."
+            ))
+            return
+        count = delete_logs(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {count} logs and {traces} request traces older than {days} days."
+        ))
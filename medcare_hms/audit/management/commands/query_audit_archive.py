@@ -0,0 +1,24 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from audit.archive import read_archive
+
+class Command(BaseCommand):
+    help = 'Print archived audit logs as NDJSON, filtered by date range and/or correlation id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day, YYYY-MM-DD')
+        parser.add_argument('--to', dest='end', help='Last day, YYYY-MM-DD')
+        parser.add_argument('--correlation-id', help='Only logs from this request')
+        parser.add_argument('--archive-dir', help='Archive location (default AUDIT_ARCHIVE_DIR)')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for key in ('start', 'end'):
+            if options[key]:
+                dates[key] = parse_date(options[key])
+                if dates[key] is None:
+                    raise CommandError(f"Invalid date '{options[key]}'; use YYYY-MM-DD.")
+        rows = read_archive(correlation_id=options['correlation_id'], path=options['archive_dir'], **dates)
+        for row in rows:
+            self.stdout.write(json.dumps(row))
@@ -1,7 +1,23 @@
 import uuid
-from django.utils.deprecation import MiddlewareMixin
 
-class CorrelationIdMiddleware(MiddlewareMixin):
-    """Attach a correlation_id to each request for audit grouping."""
-    def process_request(self, request):
+from .buffer import buffered
+from .tracing import trace_request
+
+class CorrelationIdMiddleware:
+    """Attach a correlation_id to each request for audit grouping, and time the request (see audit.tracing)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
         request.correlation_id = request.headers.get('X-Correlation-ID') or uuid.uuid4().hex
+        return trace_request(request, self.get_response)
+
+
+class AuditBufferMiddleware:
+    """Write every audit entry of a request in one batch once the response is ready."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered(request):
+            return self.get_response(request)
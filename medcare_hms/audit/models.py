@@ -35,4 +35,22 @@ class SystemLog(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.action} {self.target_model} {self.target_id} by {self.actor}"
\ No newline at end of file
+        return f"{self.action} {self.target_model} {self.target_id} by {self.actor}"
+
+class RequestTrace(models.Model):
+    """Timing of a request that went over the slow-request thresholds (see audit.tracing)"""
+    correlation_id = models.CharField(max_length=64, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='request_traces')
+    duration_ms = models.FloatField()
+    db_queries = models.PositiveIntegerField(default=0)
+    db_time_ms = models.FloatField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} {self.duration_ms:.0f}ms ({self.correlation_id})"
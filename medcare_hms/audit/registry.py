@@ -0,0 +1,129 @@
+"""
+Registry of models whose saves and deletes are audited.
+
+Receivers are connected per sender in AuditConfig.ready(), so Django only
+calls them for the models listed in AUDIT_TRACKED_MODELS, not for every save
+in the project (chat messages, notifications, sessions...).
+
+Each tracked instance keeps a snapshot of its audited field values, taken in
+post_init when it is loaded and refreshed after every save. An UPDATE entry
+then carries before/after values of just the fields that changed, worked out
+in memory without re-reading the row. Saves that change no audited field are
+not logged.
+
+Model.delete() fires post_delete inside the deletion collector's own
+transaction, so DELETE entries are queued with on_commit and written when
+that transaction commits (joining the request's buffer if one is open).
+"""
+
+import datetime
+import decimal
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .utils import audit_log
+
+# label -> list of field names to audit, or None for every concrete field
+DEFAULT_TRACKED_MODELS = {
+    'patients.Appointment': None,
+    'billing.Bill': None,
+    'billing.BillItem': None,
+    'prescriptions.Prescription': None,
+}
+
+_registry = {}
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, FieldFile):
+        return value.name or None
+    return value
+
+
+def _audited_fields(model, names):
+    fields = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            continue
+        if names is None or field.name in names:
+            fields.append(field)
+    return fields
+
+
+def _normalize(field, value):
+    # Assigned values may still be strings ('100' for a DecimalField)
+    try:
+        return field.to_python(value)
+    except ValidationError:
+        return value
+
+
+def _snapshot(instance):
+    # Only values already loaded; deferred fields would cost a query each
+    loaded = instance.__dict__
+    return {
+        field.name: _normalize(field, loaded[field.attname])
+        for field in _registry[type(instance)]
+        if field.attname in loaded
+    }
+
+
+def _serialized(values, names=None):
+    return {name: _serialize(value) for name, value in values.items() if names is None or name in names}
+
+
+def take_snapshot(sender, instance, **kwargs):
+    instance._audit_snapshot = _snapshot(instance)
+
+
+def model_saved(sender, instance, created, **kwargs):
+    current = _snapshot(instance)
+    if created:
+        details = {'after': _serialized(current)}
+    else:
+        previous = getattr(instance, '_audit_snapshot', {})
+        changed = [name for name, value in current.items() if name in previous and previous[name] != value]
+        if not changed:
+            instance._audit_snapshot = current
+            return
+        details = {
+            'fields': changed,
+            'before': _serialized(previous, changed),
+            'after': _serialized(current, changed),
+        }
+    instance._audit_snapshot = current
+    action = 'CREATE' if created else 'UPDATE'
+    audit_log(actor=getattr(instance, 'updated_by', None), action=action, target=instance,
+              summary=f'{action} {sender.__name__}', details=details)
+
+
+def model_deleted(sender, instance, **kwargs):
+    audit_log(actor=getattr(instance, 'updated_by', None), action='DELETE', target=instance,
+              summary=f'DELETE {sender.__name__}', details={'before': _serialized(_snapshot(instance))})
+
+
+def register(model, fields=None):
+    """Audit saves and deletes of a model, optionally only the named fields"""
+    _registry[model] = _audited_fields(model, fields)
+    label = model._meta.label
+    post_init.connect(take_snapshot, sender=model, dispatch_uid=f'audit_snapshot_{label}')
+    post_save.connect(model_saved, sender=model, dispatch_uid=f'audit_save_{label}')
+    post_delete.connect(model_deleted, sender=model, dispatch_uid=f'audit_delete_{label}')
+
+
+def register_configured_models():
+    for label, fields in getattr(settings, 'AUDIT_TRACKED_MODELS', DEFAULT_TRACKED_MODELS).items():
+        register(apps.get_model(label), fields)
+
+
+def is_tracked(model):
+    return model in _registry
@@ -0,0 +1,230 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.tests import create_user_with_role
+from billing.models import Bill
+from notifications.models import Notification
+from patients.models import PatientProfile
+from .archive import archive_logs, load_manifest, read_archive
+from .buffer import buffered
+from .exports import aiter_log_rows, iter_log_rows
+from .models import RequestTrace, SystemLog
+from .registry import is_tracked, model_saved
+from .utils import audit_log
+
+
+class AuditExportTests(TestCase):
+    """Tests for the streaming audit feed export"""
+
+    def setUp(self):
+        self.admin = create_user_with_role('audit_admin', 'password', 'ADMIN')
+        SystemLog.objects.bulk_create(
+            SystemLog(actor=self.admin, action='OTHER', target_model='Bill', summary=f'Event {i}')
+            for i in range(7)
+        )
+        self.client.login(username='audit_admin', password='password')
+
+    def test_keyset_pages_cover_every_row_once(self):
+        rows = list(iter_log_rows(SystemLog.objects.all(), batch_size=3))
+        self.assertEqual(len(rows), SystemLog.objects.count())
+        self.assertEqual(len({row[5] for row in rows}), len(rows))
+
+    def test_async_pages_match_the_sync_ones(self):
+        async def collect():
+            return [row async for row in aiter_log_rows(SystemLog.objects.all(), batch_size=3)]
+        self.assertEqual(async_to_sync(collect)(), list(iter_log_rows(SystemLog.objects.all(), batch_size=3)))
+
+    def test_csv_export_streams_without_truncation(self):
+        response = self.client.get(reverse('audit:audit_feed'), {'export': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'timestamp')
+        self.assertEqual(len(lines) - 1, SystemLog.objects.count())
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse('audit:audit_feed'), {'export': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(records[0]['actor'], 'audit_admin')
+        self.assertEqual(len(records), SystemLog.objects.count())
+
+
+class AuditBufferTests(TestCase):
+    """Tests for batched audit log writes"""
+
+    def test_entries_are_written_in_one_insert_when_the_buffer_closes(self):
+        with CaptureQueriesContext(connection) as queries:
+            with buffered():
+                for i in range(3):
+                    audit_log(action='OTHER', summary=f'Buffered {i}')
+                pending = len(queries)
+        self.assertEqual(pending, 0)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('INSERT'))
+        self.assertEqual(SystemLog.objects.filter(summary__startswith='Buffered').count(), 3)
+
+    def test_entries_from_rolled_back_transactions_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with buffered():
+                try:
+                    with transaction.atomic():
+                        audit_log(action='OTHER', summary='Rolled back')
+                        raise ValueError
+                except ValueError:
+                    pass
+                with transaction.atomic():
+                    audit_log(action='OTHER', summary='Committed')
+        self.assertFalse(SystemLog.objects.filter(summary='Rolled back').exists())
+        self.assertTrue(SystemLog.objects.filter(summary='Committed').exists())
+
+    def test_requests_tag_entries_with_their_correlation_id(self):
+        create_user_with_role('buffer_user', 'password', 'PATIENT')
+        self.client.post(reverse('accounts:login'), {'username': 'buffer_user', 'password': 'password'},
+                         HTTP_X_CORRELATION_ID='trace-123')
+        self.assertTrue(SystemLog.objects.filter(action='LOGIN', correlation_id='trace-123').exists())
+
+
+class AuditRegistryTests(TestCase):
+    """Tests for per-model audit receivers and field diffs"""
+
+    def setUp(self):
+        user = create_user_with_role('registry_patient', 'password', 'PATIENT')
+        self.patient = PatientProfile.objects.create(user=user)
+
+    def test_receivers_are_connected_only_to_tracked_models(self):
+        self.assertTrue(is_tracked(Bill))
+        self.assertFalse(is_tracked(Notification))
+        sync_receivers, _ = post_save._live_receivers(Bill)
+        self.assertIn(model_saved, sync_receivers)
+        sync_receivers, _ = post_save._live_receivers(Notification)
+        self.assertNotIn(model_saved, sync_receivers)
+
+    def test_update_logs_only_changed_fields(self):
+        with buffered():
+            bill = Bill.objects.create(patient=self.patient, total_amount=Decimal('100.00'))
+        with buffered():
+            bill = Bill.objects.get(pk=bill.pk)
+            bill.status = 'Paid'
+            bill.amount_paid = '100.00'
+            bill.save()
+        created = SystemLog.objects.get(action='CREATE', target_model='Bill')
+        self.assertEqual(created.details['after']['total_amount'], '100.00')
+        update = SystemLog.objects.get(action='UPDATE', target_model='Bill')
+        self.assertEqual(sorted(update.details['fields']), ['amount_paid', 'status'])
+        self.assertEqual(update.details['before'], {'amount_paid': '0.00', 'status': 'Unpaid'})
+        self.assertEqual(update.details['after'], {'amount_paid': '100.00', 'status': 'Paid'})
+
+    def test_save_without_changes_is_not_logged(self):
+        bill = Bill.objects.create(patient=self.patient, total_amount=Decimal('50.00'))
+        with buffered():
+            bill.total_amount = '50.00'
+            bill.save()
+        self.assertFalse(SystemLog.objects.filter(action='UPDATE', target_model='Bill').exists())
+
+    def test_delete_records_the_last_values(self):
+        bill = Bill.objects.create(patient=self.patient, total_amount=Decimal('75.00'))
+        # Deletes run inside the collector's transaction, so the entry is written on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            with buffered():
+                bill.delete()
+        deleted = SystemLog.objects.get(action='DELETE', target_model='Bill')
+        self.assertEqual(deleted.details['before']['total_amount'], '75.00')
+
+
+class AuditArchiveTests(TestCase):
+    """Tests for archiving old logs to compressed segments"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        now = timezone.now()
+        SystemLog.objects.bulk_create(
+            SystemLog(action='OTHER', target_model='Bill', summary=f'Old {i}',
+                      correlation_id=f'req-{i % 3}', created_at=now - timedelta(days=100 + i % 4))
+            for i in range(12)
+        )
+        SystemLog.objects.create(action='OTHER', target_model='Bill', summary='Recent', created_at=now)
+
+    def test_archive_writes_day_segments_and_deletes_in_batches(self):
+        cutoff = timezone.now() - timedelta(days=90)
+        archived, segments = archive_logs(cutoff, batch_size=5, path=self.root)
+        self.assertEqual(archived, 12)
+        self.assertEqual(SystemLog.objects.count(), 1)
+        manifest = load_manifest(Path(self.root))
+        self.assertEqual(len(manifest['segments']), segments)
+        self.assertEqual(sum(segment['count'] for segment in manifest['segments']), 12)
+        self.assertEqual(len({segment['date'] for segment in manifest['segments']}), 4)
+
+    def test_reader_filters_by_date_and_correlation_id(self):
+        archive_logs(timezone.now() - timedelta(days=90), batch_size=5, path=self.root)
+        rows = list(read_archive(correlation_id='req-1', path=self.root))
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(row['correlation_id'] == 'req-1' for row in rows))
+        day = timezone.localdate() - timedelta(days=100)
+        rows = list(read_archive(start=day, end=day, path=self.root))
+        self.assertEqual({row['summary'] for row in rows}, {'Old 0', 'Old 4', 'Old 8'})
+
+    def test_purge_command_archive_mode(self):
+        out = StringIO()
+        call_command('purge_audit_logs', '--archive', '--archive-dir', self.root, stdout=out)
+        self.assertIn('Archived 12 logs', out.getvalue())
+        self.assertEqual(list(SystemLog.objects.values_list('summary', flat=True)), ['Recent'])
+
+
+class RequestTraceTests(TestCase):
+    """Tests for request timing and the correlation view"""
+
+    def setUp(self):
+        self.admin = create_user_with_role('trace_admin', 'password', 'ADMIN')
+        self.client.login(username='trace_admin', password='password')
+
+    @override_settings(AUDIT_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_saved_with_query_counts(self):
+        response = self.client.get(reverse('audit:audit_feed'), HTTP_X_CORRELATION_ID='slow-1')
+        self.assertEqual(response.status_code, 200)
+        trace = RequestTrace.objects.get(correlation_id='slow-1')
+        self.assertEqual(trace.path, reverse('audit:audit_feed'))
+        self.assertEqual(trace.user, self.admin)
+        self.assertGreater(trace.db_queries, 0)
+        self.assertGreaterEqual(trace.duration_ms, trace.db_time_ms)
+
+    @override_settings(AUDIT_SLOW_REQUEST_MS=60 * 1000, AUDIT_SLOW_REQUEST_QUERIES=1000)
+    def test_fast_requests_are_not_saved(self):
+        self.client.get(reverse('audit:audit_feed'), HTTP_X_CORRELATION_ID='fast-1')
+        self.assertFalse(RequestTrace.objects.filter(correlation_id='fast-1').exists())
+
+    def test_correlation_view_shows_traces_next_to_events(self):
+        SystemLog.objects.create(action='OTHER', target_model='Bill', summary='Traced event', correlation_id='cid-1')
+        RequestTrace.objects.create(correlation_id='cid-1', method='GET', path='/slow/', status_code=200,
+                                    duration_ms=812.5, db_queries=42, db_time_ms=300)
+        response = self.client.get(reverse('audit:correlation_detail', args=['cid-1']))
+        self.assertContains(response, 'Traced event')
+        self.assertContains(response, '/slow/')
+        self.assertEqual(response.context['traces'][0].db_queries, 42)
+
+    def test_correlation_view_404s_without_events_or_traces(self):
+        response = self.client.get(reverse('audit:correlation_detail', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_purge_deletes_old_traces(self):
+        for correlation_id, age in (('old-1', 120), ('old-2', 100), ('new-1', 1)):
+            RequestTrace.objects.create(correlation_id=correlation_id, method='GET', path='/slow/', status_code=200,
+                                        duration_ms=900, created_at=timezone.now() - timedelta(days=age))
+        out = StringIO()
+        call_command('purge_audit_logs', '--days', '90', '--batch-size', '1', stdout=out)
+        self.assertIn('2 request traces', out.getvalue())
+        self.assertEqual(list(RequestTrace.objects.values_list('correlation_id', flat=True)), ['new-1'])
@@ -0,0 +1,74 @@
+"""
+Per-request timing keyed by correlation id.
+
+CorrelationIdMiddleware runs each request under trace_request(), which wraps
+the default database connection with a QueryTimer (connection.execute_wrapper)
+and measures wall time. The numbers are left on request.trace for the rest of
+the stack. Requests slower than AUDIT_SLOW_REQUEST_MS, or issuing more than
+AUDIT_SLOW_REQUEST_QUERIES queries, are saved as RequestTrace rows so the
+correlation view can show them next to the request's audit events.
+
+Wall time ends when the view returns; the body of a streaming response is not
+included.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import RequestTrace
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and adds up the time spent in them"""
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def is_slow(trace):
+    max_queries = getattr(settings, 'AUDIT_SLOW_REQUEST_QUERIES', None)
+    return (trace['duration_ms'] >= getattr(settings, 'AUDIT_SLOW_REQUEST_MS', 500)
+            or (max_queries is not None and trace['db_queries'] > max_queries))
+
+
+def _save(request, response, trace):
+    user = getattr(request, 'user', None)
+    try:
+        RequestTrace.objects.create(
+            correlation_id=request.correlation_id,
+            method=request.method[:10],
+            path=request.path[:255],
+            status_code=response.status_code,
+            user=user if user is not None and user.is_authenticated else None,
+            **trace,
+        )
+    except Exception:
+        logger.exception("Failed to save request trace %s", request.correlation_id)
+
+
+def trace_request(request, get_response):
+    timer = QueryTimer()
+    start = time.perf_counter()
+    with connection.execute_wrapper(timer):
+        response = get_response(request)
+    request.trace = trace = {
+        'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+        'db_queries': timer.count,
+        'db_time_ms': round(timer.seconds * 1000, 2),
+    }
+    if is_slow(trace):
+        _save(request, response, trace)
+    return response
@@ -1,10 +1,11 @@
 from .models import SystemLog
+from .buffer import enqueue
 from django.utils import timezone
 
 SAFE_DETAIL_KEYS = {'before','after','fields','extra'}
 
 def audit_log(actor=None, action='OTHER', target=None, summary='', details=None, request=None, correlation_id=None):
-    """Create a system audit log entry.
+    """Queue a system audit log entry (written in batches, see audit.buffer).
 
     Parameters:
         actor (User|None): The user performing the action.
@@ -30,7 +31,7 @@ def audit_log(actor=None, action='OTHER', target=None, summary='', details=None,
         ua = request.META.get('HTTP_USER_AGENT','')[:255]
         if correlation_id is None:
             correlation_id = getattr(request, 'correlation_id', None)
-    SystemLog.objects.create(
+    enqueue(SystemLog(
         actor=actor,
         action=action,
         target_model=target_model or 'N/A',
@@ -41,4 +42,4 @@ def audit_log(actor=None, action='OTHER', target=None, summary='', details=None,
         user_agent=ua,
         created_at=timezone.now(),
         correlation_id=correlation_id
-    )
+    ))
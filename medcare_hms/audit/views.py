@@ -1,13 +1,14 @@
-from django.http import JsonResponse, Http404, HttpResponse
+from django.http import JsonResponse, Http404
 import re
 from django.shortcuts import render
 from django.core.paginator import Paginator
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth.decorators import login_required
 from accounts.decorators import admin_required
-from .models import SystemLog
+from .models import RequestTrace, SystemLog
+from .exports import FORMATS, stream_logs
 from datetime import datetime, timedelta
 from django.db.models import Q
-import csv
 
 @login_required
 @admin_required
@@ -31,7 +32,7 @@ def recent_audit_events(request):
 
 @login_required
 def audit_feed(request):
-    """Read-only HTML feed for staff (non-admin also allowed) with filtering & optional CSV export"""
+    """Read-only HTML feed for staff (non-admin also allowed) with filtering & optional CSV/NDJSON export"""
     action = request.GET.get('action')
     correlation_id = request.GET.get('correlation') or request.GET.get('cid')
     start_date_str = request.GET.get('start_date')
@@ -62,36 +63,14 @@ def audit_feed(request):
         except ValueError:
             end_date_str = None
     q = q.order_by('-created_at')
-    # CSV export (before pagination)
-    if export == 'csv':
-        # Hard cap to prevent memory blow-up; could allow a higher cap or stream
-        max_rows = 5000
-        rows = list(q[:max_rows])  # Convert to list to get count and iterate
-        response = HttpResponse(content_type='text/csv')
+    # Streaming CSV/NDJSON export of the whole filtered range (before pagination)
+    if export in FORMATS:
         filename_parts = ["audit"]
         if start_date_str:
             filename_parts.append(start_date_str)
         if end_date_str:
             filename_parts.append(end_date_str)
-        filename = "_".join(filename_parts) + ".csv"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        writer = csv.writer(response)
-        writer.writerow(['timestamp','action','actor','target_model','target_id','summary','correlation_id'])
-        for log in rows:
-            writer.writerow([
-                log.created_at.isoformat(),
-                log.action,
-                log.actor.username if log.actor else '',
-                log.target_model or '',
-                log.target_id or '',
-                log.summary or '',
-                log.correlation_id or '',
-            ])
-        # Check if there are more rows than the limit
-        total_count = q.count()
-        if total_count > max_rows:
-            writer.writerow([f"TRUNCATED: Showing {max_rows} of {total_count} total rows"])
-        return response
+        return stream_logs(q, export, "_".join(filename_parts), asynchronous=isinstance(request, ASGIRequest))
     try:
         page_size = int(request.GET.get('page_size', 50))
     except ValueError:
@@ -119,13 +98,19 @@ def correlation_detail(request, correlation_id):
     # If correlation_id is 32 hex chars without hyphens, format it to UUID style
     if re.fullmatch(r'[0-9a-fA-F]{32}', correlation_id):
         correlation_id = f"{correlation_id[0:8]}-{correlation_id[8:12]}-{correlation_id[12:16]}-{correlation_id[16:20]}-{correlation_id[20:32]}".lower()
+    ids = [original, correlation_id]
+    # Both lookups go through the correlation_id index; events are paged
     logs = (SystemLog.objects
-            .filter(correlation_id__in=[original, correlation_id])
+            .filter(correlation_id__in=ids)
             .select_related('actor')
-            .order_by('created_at'))
-    if not logs.exists():
+            .order_by('created_at', 'id'))
+    traces = list(RequestTrace.objects.filter(correlation_id__in=ids).select_related('user').order_by('created_at'))
+    page_obj = Paginator(logs, 50).get_page(request.GET.get('page'))
+    if not page_obj.paginator.count and not traces:
         raise Http404('No events for this correlation id')
     return render(request, 'audit/correlation_detail.html', {
         'correlation_id': correlation_id,
-        'logs': logs,
-    })
\ No newline at end of file
+        'logs': page_obj.object_list,
+        'page_obj': page_obj,
+        'traces': traces,
+    })
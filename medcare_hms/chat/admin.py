@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Thread, ChatMessage, UserPresence, CannedResponse
+from .models import Thread, ChatMessage, UserPresence, CannedResponse, UnreadCounter, ChunkedUpload
 
 @admin.register(Thread)
 class ThreadAdmin(admin.ModelAdmin):
@@ -32,6 +32,20 @@ class UserPresenceAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email']
 
 
+@admin.register(UnreadCounter)
+class UnreadCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread_count']
+    search_fields = ['user__username', 'user__email']
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ['upload_id', 'user', 'thread', 'filename', 'offset', 'total_size', 'status', 'updated']
+    list_filter = ['status', 'created']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['upload_id', 'created', 'updated']
+
+
 @admin.register(CannedResponse)
 class CannedResponseAdmin(admin.ModelAdmin):
     list_display = ['title', 'created_by', 'is_active', 'created_at']
@@ -1,19 +1,43 @@
+import asyncio
 import json
+import time
+from collections import Counter
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Thread, ChatMessage, UserPresence
+from asgiref.sync import sync_to_async
+from .models import Thread, ChatMessage
+from . import presence
 from django.contrib.auth.models import User
-from notifications.utils import create_notification
+from accounts.avatars import get_avatar_url
+from notifications.utils import create_notifications
 from django.urls import reverse
+from django.conf import settings
+
+# Process-wide typing indicator counters, used to size the channel layer:
+# received = frames from clients, broadcast = group_sends, suppressed = frames
+# coalesced or rate-limited away, expired = typing states ended by the timeout.
+typing_stats = Counter()
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
+    # Minimum seconds between two broadcast "started typing" events per (user, thread)
+    typing_min_interval = getattr(settings, 'CHAT_TYPING_MIN_INTERVAL', 2.0)
+    # Seconds without a typing frame after which "stopped typing" is sent on the user's behalf
+    typing_timeout = getattr(settings, 'CHAT_TYPING_TIMEOUT', 5.0)
+
     async def connect(self):
-        self.thread_id = self.scope['url_route']['kwargs']['thread_id']
+        self.thread_id = int(self.scope['url_route']['kwargs']['thread_id'])
         self.thread_group_name = f'chat_{self.thread_id}'
+        self.user_group_name = None
         self.user = self.scope['user']
+        self.participant_ids = set()
+        self.is_typing = False
+        self.typing_started_at = None
+        self.typing_deadline = None
+        self.typing_expiry_task = None
 
-        # Security check: Ensure user is authenticated and part of the thread
-        if not self.user.is_authenticated or not await self.is_user_in_thread():
+        # Security check: Ensure user is authenticated and part of the thread.
+        # Membership and sender display data are resolved once and held for the socket's lifetime.
+        if not self.user.is_authenticated or not await self.load_thread_state():
             await self.close()
             return
 
@@ -22,86 +46,108 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             self.thread_group_name,
             self.channel_name
         )
+        # Per-user group, used to invalidate cached sender data
+        self.user_group_name = f'chat_user_{self.user.pk}'
+        await self.channel_layer.group_add(
+            self.user_group_name,
+            self.channel_name
+        )
         
-        # Set user as online
-        await self.set_user_online(True)
+        # Count this socket towards the user's presence
+        came_online = await self.track_presence(True)
         
         # Mark all unread messages as read when user enters the chat
         await self.mark_messages_as_read()
         
         await self.accept()
         
-        # Notify other participants that user is online
-        await self.channel_layer.group_send(
-            self.thread_group_name,
-            {
-                'type': 'user_status',
-                'user': self.user.username,
-                'status': 'online'
-            }
-        )
+        # Notify other participants only when the user's first socket opens
+        if came_online:
+            await self.channel_layer.group_send(
+                self.thread_group_name,
+                {
+                    'type': 'user_status',
+                    'user': self.user.username,
+                    'status': 'online'
+                }
+            )
 
     async def disconnect(self, close_code):
-        # Set user as offline
-        await self.set_user_online(False)
+        if self.user_group_name is None:
+            # Rejected in connect(); nothing was joined
+            return
+
+        # A closing socket can't keep typing
+        await self.set_typing(False)
+
+        # Release this socket; the user is offline once their last socket closes
+        went_offline = await self.track_presence(False)
         
         # Notify other participants that user is offline
-        await self.channel_layer.group_send(
-            self.thread_group_name,
-            {
-                'type': 'user_status',
-                'user': self.user.username,
-                'status': 'offline'
-            }
-        )
+        if went_offline:
+            await self.channel_layer.group_send(
+                self.thread_group_name,
+                {
+                    'type': 'user_status',
+                    'user': self.user.username,
+                    'status': 'offline'
+                }
+            )
         
         # Leave room group
         await self.channel_layer.group_discard(
             self.thread_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_discard(
+            self.user_group_name,
+            self.channel_name
+        )
 
     # Receive message from WebSocket
     async def receive_json(self, content):
         message_type = content.get('type', 'message')
         
         if message_type == 'typing':
-            # Handle typing indicator
-            await self.channel_layer.group_send(
-                self.thread_group_name,
-                {
-                    'type': 'typing_indicator',
-                    'user': self.user.username,
-                    'is_typing': content.get('is_typing', False)
-                }
-            )
+            # Handle typing indicator; only state transitions reach the group
+            typing_stats['received'] += 1
+            await self.set_typing(bool(content.get('is_typing', False)))
         
         elif message_type == 'read_receipt':
-            # Handle read receipt
+            # Handle read receipt: "read up to message id N" in one UPDATE and one event.
+            # A bare message_id (older clients) marks just that message.
+            up_to_id = content.get('up_to_id')
             message_id = content.get('message_id')
-            await self.mark_message_read(message_id)
+            if up_to_id is not None:
+                try:
+                    up_to_id = int(up_to_id)
+                except (TypeError, ValueError):
+                    return
+                updated = await self.mark_messages_as_read(up_to_id)
+            elif message_id is not None:
+                updated = await self.mark_message_read(message_id)
+            else:
+                return
             
-            await self.channel_layer.group_send(
-                self.thread_group_name,
-                {
-                    'type': 'read_receipt_update',
-                    'message_id': message_id,
-                    'read_by': self.user.username
-                }
-            )
+            if updated:
+                await self.channel_layer.group_send(
+                    self.thread_group_name,
+                    {
+                        'type': 'read_receipt_update',
+                        'message_id': message_id,
+                        'up_to_id': up_to_id,
+                        'read_by': self.user.username
+                    }
+                )
         
         elif message_type == 'message':
             message = content['message']
             
+            # Sending ends the typing state
+            await self.set_typing(False)
+            
             # Save message to database
             new_message = await self.save_message(message)
-
-            # Get sender's profile picture
-            sender_avatar = await self.get_sender_avatar()
-
-            # --- NOTIFICATION LOGIC ---
-            await self.notify_other_participants(new_message)
-            # --- END NOTIFICATION LOGIC ---
             
             # Send message to room group
             await self.channel_layer.group_send(
@@ -110,14 +156,63 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
                     'type': 'chat_message',
                     'message_id': new_message.id,
                     'message': new_message.message,
-                    'sender': new_message.sender.username,
-                    'sender_name': new_message.sender.get_full_name(),
-                    'sender_avatar': sender_avatar,
+                    'sender': self.user.username,
+                    'sender_name': self.sender_name,
+                    'sender_avatar': self.sender_avatar,
                     'timestamp': new_message.timestamp.isoformat(),
                     'is_read': new_message.is_read
                 }
             )
 
+            # --- NOTIFICATION LOGIC ---
+            # Fan out after the broadcast so delivery doesn't wait on it
+            await self.notify_other_participants(new_message)
+            # --- END NOTIFICATION LOGIC ---
+
+    async def set_typing(self, is_typing):
+        """Coalesce typing frames into rate-limited start/stop transitions"""
+        now = time.monotonic()
+        if is_typing:
+            self.typing_deadline = now + self.typing_timeout
+            if self.is_typing:
+                typing_stats['suppressed'] += 1
+                return
+            if self.typing_started_at is not None and now - self.typing_started_at < self.typing_min_interval:
+                typing_stats['suppressed'] += 1
+                return
+            self.is_typing = True
+            self.typing_started_at = now
+            if self.typing_expiry_task is None or self.typing_expiry_task.done():
+                self.typing_expiry_task = asyncio.ensure_future(self.expire_typing())
+        else:
+            if not self.is_typing:
+                typing_stats['suppressed'] += 1
+                return
+            self.is_typing = False
+            if self.typing_expiry_task is not None and self.typing_expiry_task is not asyncio.current_task():
+                self.typing_expiry_task.cancel()
+            self.typing_expiry_task = None
+
+        typing_stats['broadcast'] += 1
+        await self.channel_layer.group_send(
+            self.thread_group_name,
+            {
+                'type': 'typing_indicator',
+                'user': self.user.username,
+                'is_typing': is_typing
+            }
+        )
+
+    async def expire_typing(self):
+        """Send "stopped typing" if the client goes quiet without saying so"""
+        while self.is_typing:
+            remaining = self.typing_deadline - time.monotonic()
+            if remaining <= 0:
+                typing_stats['expired'] += 1
+                await self.set_typing(False)
+                return
+            await asyncio.sleep(remaining)
+
     # Receive message from room group
     async def chat_message(self, event):
         # Send message to WebSocket
@@ -129,7 +224,20 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             'sender_name': event['sender_name'],
             'sender_avatar': event['sender_avatar'],
             'timestamp': event['timestamp'],
-            'is_read': event['is_read']
+            'is_read': event.get('is_read', False),
+            'attachment_url': event.get('attachment_url'),
+            'attachment_type': event.get('attachment_type'),
+            'attachment_name': event.get('attachment_name'),
+            'attachment_size': event.get('attachment_size'),
+            'thumbnail_url': event.get('thumbnail_url'),
+        })
+    
+    async def attachment_thumbnail(self, event):
+        # A background thumbnail for an image message is ready
+        await self.send_json({
+            'type': 'thumbnail',
+            'message_id': event['message_id'],
+            'thumbnail_url': event['thumbnail_url']
         })
     
     # Handle typing indicator
@@ -157,76 +265,81 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         await self.send_json({
             'type': 'read_receipt',
             'message_id': event['message_id'],
+            'up_to_id': event.get('up_to_id'),
             'read_by': event['read_by']
         })
 
+    # Cache invalidation: the thread's participant list changed
+    async def participants_changed(self, event):
+        if not await self.load_thread_state():
+            # Removed from the thread while connected
+            await self.close()
+
+    # Cache invalidation: this user's name or profile picture changed
+    async def sender_changed(self, event):
+        await self.load_sender_metadata()
+
     @database_sync_to_async
-    def is_user_in_thread(self):
-        try:
-            thread = Thread.objects.get(pk=self.thread_id)
-            return self.user in thread.participants.all()
-        except Thread.DoesNotExist:
+    def load_thread_state(self):
+        """Cache participant ids and sender display data; return whether the user is a member"""
+        self.participant_ids = set(
+            Thread.participants.through.objects
+            .filter(thread_id=self.thread_id)
+            .values_list('user_id', flat=True)
+        )
+        if self.user.pk not in self.participant_ids:
             return False
+        self._load_sender_metadata()
+        return True
+
+    @database_sync_to_async
+    def load_sender_metadata(self):
+        self._load_sender_metadata()
+
+    def _load_sender_metadata(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.sender_name = user.get_full_name()
+        self.sender_avatar = get_avatar_url(user)
 
     @database_sync_to_async
     def save_message(self, message_text):
-        thread = Thread.objects.get(pk=self.thread_id)
-        return ChatMessage.objects.create(thread=thread, sender=self.user, message=message_text)
+        return ChatMessage.objects.create(thread_id=self.thread_id, sender=self.user, message=message_text)
     
-    @database_sync_to_async
-    def set_user_online(self, is_online):
-        """Set user's online/offline status"""
-        presence, created = UserPresence.objects.get_or_create(user=self.user)
-        presence.is_online = is_online
-        presence.save()
+    async def track_presence(self, connected):
+        """Update the shared presence store; returns True if the user's online state flipped"""
+        if connected:
+            changed = await sync_to_async(presence.register_connection, thread_sensitive=False)(self.user.pk)
+        else:
+            changed = await sync_to_async(presence.release_connection, thread_sensitive=False)(self.user.pk)
+            if changed:
+                # The last socket closed; don't leave the row saying online until a flush happens
+                await database_sync_to_async(presence.persist_offline)(self.user.pk)
+        # Persist last_seen snapshots in batches rather than on every open/close
+        await database_sync_to_async(presence.flush_presence_if_due)()
+        return changed
     
     @database_sync_to_async
-    def mark_messages_as_read(self):
-        """Mark all unread messages in this thread as read for the current user"""
-        thread = Thread.objects.get(pk=self.thread_id)
-        unread_messages = thread.messages.filter(is_read=False).exclude(sender=self.user)
-        
-        from django.utils import timezone
-        for message in unread_messages:
-            message.is_read = True
-            message.read_at = timezone.now()
-        
-        ChatMessage.objects.bulk_update(unread_messages, ['is_read', 'read_at'])
+    def mark_messages_as_read(self, up_to_id=None):
+        """Mark unread messages in this thread as read for the current user, up to an id if given"""
+        return ChatMessage.mark_thread_read(self.thread_id, self.user, up_to_id=up_to_id)
     
     @database_sync_to_async
     def mark_message_read(self, message_id):
-        """Mark a specific message as read"""
+        """Mark a specific message as read; returns 1 if it changed"""
         try:
-            message = ChatMessage.objects.get(id=message_id)
-            if message.sender != self.user:
-                message.mark_as_read()
-        except ChatMessage.DoesNotExist:
-            pass
-    
-    @database_sync_to_async
-    def get_sender_avatar(self):
-        """Get the sender's profile picture URL"""
-        user = self.user
-        try:
-            if hasattr(user, 'doctorprofile') and user.doctorprofile.profile_picture:
-                return user.doctorprofile.profile_picture.url
-            elif hasattr(user, 'patientprofile') and user.patientprofile.profile_picture:
-                return user.patientprofile.profile_picture.url
-            elif hasattr(user, 'receptionistprofile') and user.receptionistprofile.profile_picture:
-                return user.receptionistprofile.profile_picture.url
-        except:
-            pass
-        return '/media/profile_pictures/default.jpeg'
+            message = ChatMessage.objects.get(id=message_id, thread_id=self.thread_id)
+        except (ChatMessage.DoesNotExist, ValueError):
+            return 0
+        if message.sender_id == self.user.pk or message.is_read:
+            return 0
+        message.mark_as_read()
+        return 1
     
     # --- NEW ASYNC HELPER METHOD ---
     @database_sync_to_async
     def notify_other_participants(self, new_message):
-        thread = new_message.thread
-        sender = new_message.sender
-        
-        # Get all participants in the thread except the sender
-        for participant in thread.participants.all():
-            if participant != sender:
-                message = f"You have a new message from {sender.get_full_name()}."
-                link = reverse('chat:thread_detail', kwargs={'thread_id': thread.id})
-                create_notification(recipient=participant, message=message, link=link)
\ No newline at end of file
+        """Notify every other participant with one bulk INSERT"""
+        recipient_ids = self.participant_ids - {self.user.pk}
+        message = f"You have a new message from {self.sender_name}."
+        link = reverse('chat:thread_detail', kwargs={'thread_id': self.thread_id})
+        create_notifications(recipient_ids, message, link)
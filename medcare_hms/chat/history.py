@@ -0,0 +1,44 @@
+"""
+Keyset-paginated message history for chat threads.
+
+Pages walk backwards from the newest message on (timestamp, id), which the
+(thread, timestamp) index on ChatMessage serves directly.
+"""
+
+from django.db.models import Q
+
+from accounts.avatars import prime_avatars
+from accounts.roles import prime_role_info
+
+from .utils import encode_cursor, decode_cursor
+
+MESSAGE_PAGE_SIZE = 50
+
+
+def get_message_history(thread, cursor=None, limit=MESSAGE_PAGE_SIZE):
+    """
+    Return (messages, next_cursor) for the page of messages older than cursor.
+
+    Messages come back in chronological order; next_cursor points at the
+    oldest message of the page and is None once the start of the thread is reached.
+    """
+    messages = thread.messages.select_related('sender').order_by('-timestamp', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, pk = position
+        messages = messages.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    page = list(messages[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].timestamp, page[-1].pk)
+    page.reverse()
+
+    # One User object per sender, so avatar and role lookups are shared across their messages
+    senders = {}
+    for message in page:
+        message.sender = senders.setdefault(message.sender_id, message.sender)
+    prime_avatars(senders.values())
+    prime_role_info(senders.values())
+    return page, next_cursor
@@ -0,0 +1,80 @@
+"""
+Inbox queries for the chat sidebar.
+
+Builds the per-thread summary (other participant, last message, unread count,
+presence) for a page of a user's threads in a fixed number of queries, paged
+by keyset on (Thread.updated, Thread.id).
+"""
+
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.avatars import prime_avatars
+from accounts.roles import prime_role_info
+
+from .models import Thread, ChatMessage
+from .presence import get_presence_store
+from .utils import encode_cursor, decode_cursor
+
+INBOX_PAGE_SIZE = 30
+
+
+def get_inbox(user, cursor=None, limit=INBOX_PAGE_SIZE):
+    """
+    Return (threads, next_cursor) for one page of the user's inbox.
+
+    Each thread entry is a dict with thread_object, other_user, last_message,
+    unread_count and is_online. next_cursor is None on the last page.
+    """
+    participants = Thread.participants.through.objects.filter(thread=OuterRef('pk')).exclude(user=user)
+    latest = ChatMessage.objects.filter(thread=OuterRef('pk')).order_by('-timestamp', '-id')
+    unread = (
+        ChatMessage.objects.filter(thread=OuterRef('pk'), is_read=False)
+        .exclude(sender=user)
+        .values('thread')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+
+    threads = (
+        Thread.objects.filter(participants=user)
+        .annotate(
+            other_user_id=Subquery(participants.values('user_id')[:1]),
+            last_message_id=Subquery(latest.values('id')[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)),
+        )
+        .order_by('-updated', '-id')
+    )
+    position = decode_cursor(cursor)
+    if position:
+        updated, pk = position
+        threads = threads.filter(Q(updated__lt=updated) | Q(updated=updated, id__lt=pk))
+
+    page = list(threads[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].updated, page[-1].pk)
+
+    # Resolve users (with avatars and roles), last messages and live presence in bulk
+    other_user_ids = {t.other_user_id for t in page if t.other_user_id}
+    users = User.objects.in_bulk(other_user_ids)
+    prime_avatars(users.values())
+    prime_role_info(users.values())
+    online_ids = get_presence_store().online_user_ids(other_user_ids)
+    last_messages = ChatMessage.objects.filter(
+        pk__in={t.last_message_id for t in page if t.last_message_id}
+    ).select_related('sender').in_bulk()
+
+    entries = []
+    for thread in page:
+        other_user = users.get(thread.other_user_id)
+        entries.append({
+            'thread_object': thread,
+            'other_user': other_user,
+            'last_message': last_messages.get(thread.last_message_id),
+            'unread_count': thread.unread_count,
+            'is_online': thread.other_user_id in online_ids,
+        })
+    return entries, next_cursor
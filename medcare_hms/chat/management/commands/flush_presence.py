@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from chat.presence import flush_presence
+
+class Command(BaseCommand):
+    help = 'Persist pending chat presence (last_seen / online) snapshots to UserPresence in one batch.'
+
+    def handle(self, *args, **options):
+        written = flush_presence()
+        self.stdout.write(self.style.SUCCESS(f"Flushed presence for {written} users."))
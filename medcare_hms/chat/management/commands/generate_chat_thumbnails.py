@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from chat.models import ChatMessage
+from chat.thumbnails import generate_thumbnail
+
+class Command(BaseCommand):
+    help = 'Create thumbnails for image chat attachments that do not have one yet.'
+
+    def handle(self, *args, **options):
+        pending = ChatMessage.objects.filter(
+            attachment_type='image', thumbnail=''
+        ).exclude(attachment='').only('id', 'attachment', 'attachment_type', 'thumbnail')
+        created = sum(1 for message in pending.iterator() if generate_thumbnail(message))
+        self.stdout.write(self.style.SUCCESS(f"Created {created} chat thumbnails."))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from chat.uploads import purge_stale_uploads
+
+class Command(BaseCommand):
+    help = 'Delete unfinished chunked chat uploads (and their partial files) idle for longer than CHAT_UPLOAD_EXPIRY.'
+
+    def handle(self, *args, **options):
+        purged = purge_stale_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} stale chat uploads."))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_unreadcounter'),
+        ('patients', '0003_alter_patientprofile_profile_picture_medicalrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['thread', 'timestamp'], name='chat_chatme_thread__a19d84_idx'),
+        ),
+    ]
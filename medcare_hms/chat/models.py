@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+import uuid
 
 class Thread(models.Model):
     participants = models.ManyToManyField(User, related_name='chat_threads')
@@ -24,6 +27,8 @@ class ChatMessage(models.Model):
     # File/Image attachment support
     attachment = models.FileField(upload_to='chat_attachments/%Y/%m/%d/', null=True, blank=True)
     attachment_type = models.CharField(max_length=20, null=True, blank=True)  # 'image', 'document', 'other'
+    # Downscaled preview of image attachments, filled in in the background (see chat.thumbnails)
+    thumbnail = models.ImageField(upload_to='chat_attachments/thumbnails/%Y/%m/%d/', null=True, blank=True)
     
     # Optional link to appointment for context
     appointment = models.ForeignKey(
@@ -36,9 +41,19 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['thread', 'timestamp']),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} in Thread ({self.thread.pk})"
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new and not self.is_read:
+            # Every other participant now has one more unread message
+            UnreadCounter.adjust(self.thread_id, self.sender_id, 1)
     
     def mark_as_read(self):
         """Mark this message as read"""
@@ -46,7 +61,120 @@ class ChatMessage(models.Model):
             from django.utils import timezone
             self.is_read = True
             self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            # Only the request that actually flips the row decrements the counter
+            if ChatMessage.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=self.read_at):
+                UnreadCounter.adjust(self.thread_id, self.sender_id, -1)
+
+    @classmethod
+    def mark_thread_read(cls, thread_id, reader, up_to_id=None):
+        """Mark other participants' messages in a thread as read with a single UPDATE.
+
+        With up_to_id only messages with id <= up_to_id are marked. Returns the
+        number of messages that changed.
+        """
+        from django.utils import timezone
+        unread = cls.objects.filter(thread_id=thread_id, is_read=False).exclude(sender=reader)
+        if up_to_id is not None:
+            unread = unread.filter(id__lte=up_to_id)
+        now = timezone.now()
+        updated = 0
+        with transaction.atomic():
+            # One UPDATE per sender, each decrementing by the rows it actually
+            # changed, so a concurrent reader can't have the same rows counted twice
+            for sender_id in unread.order_by().values_list('sender_id', flat=True).distinct():
+                changed = unread.filter(sender_id=sender_id).update(is_read=True, read_at=now)
+                if changed:
+                    UnreadCounter.adjust(thread_id, sender_id, -changed)
+                updated += changed
+        return updated
+
+
+class UnreadCounter(models.Model):
+    """Denormalized total of unread chat messages per user.
+
+    Kept in step by ChatMessage.save / mark_as_read / mark_thread_read, so the
+    unread badge rendered on every page is a single lookup. Deleted messages
+    and threads and participant changes are handled in chat.signals.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='unread_chat_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.unread_count} unread"
+
+    @classmethod
+    def adjust(cls, thread_id, sender_id, delta):
+        """Add delta to the counter of every participant of a thread except the sender"""
+        counters = cls.objects.filter(user__chat_threads=thread_id).exclude(user_id=sender_id)
+        counters.update(unread_count=Greatest(F('unread_count') + delta, 0))
+
+    @staticmethod
+    def _unread_total(user_id):
+        return (
+            ChatMessage.objects.filter(thread__participants=user_id, is_read=False)
+            .exclude(sender_id=user_id)
+            .aggregate(total=Count('id'))['total']
+        )
+
+    @classmethod
+    def recount(cls, user):
+        """Rebuild a user's counter from the messages table and return the total"""
+        total = cls._unread_total(user.pk)
+        cls.objects.update_or_create(user=user, defaults={'unread_count': total})
+        return total
+
+    @classmethod
+    def recount_users(cls, user_ids):
+        """Rebuild the counters that already exist for the given users; the rest are seeded on first use"""
+        for user_id in cls.objects.filter(user_id__in=list(user_ids)).values_list('user_id', flat=True):
+            cls.objects.filter(user_id=user_id).update(unread_count=cls._unread_total(user_id))
+
+    @classmethod
+    def get_for_user(cls, user):
+        """Return the user's unread total, seeding the counter on first use"""
+        count = cls.objects.filter(user=user).values_list('unread_count', flat=True).first()
+        if count is None:
+            count = cls.recount(user)
+        return count
+
+
+class ChunkedUpload(models.Model):
+    """A resumable chat attachment upload that arrives in chunks.
+
+    Received bytes are appended to a partial file outside storage; offset is the
+    number of bytes written so far, so a client can ask where to resume.
+    """
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_uploads')
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    message = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    chat_message = models.OneToOneField(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.upload_id} ({self.offset}/{self.total_size} bytes)"
+
+    @property
+    def is_complete(self):
+        return self.status == self.STATUS_COMPLETE
 
 
 class UserPresence(models.Model):
@@ -0,0 +1,210 @@
+"""
+Presence tracking for chat users.
+
+Live online state is reference-counted per user across every open socket and
+kept in the channel layer's backing store (Redis when the Redis channel layer
+is configured, process memory otherwise). Consumers only broadcast when a
+user's first socket opens or last socket closes. UserPresence rows are a
+snapshot written in batches by flush_presence(), at most once per
+CHAT_PRESENCE_FLUSH_INTERVAL seconds; a user going offline is written straight
+away (persist_offline), since nothing may trigger another flush for a while.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import UserPresence
+
+PRESENCE_FLUSH_INTERVAL = getattr(settings, 'CHAT_PRESENCE_FLUSH_INTERVAL', 60)
+PRESENCE_TTL = getattr(settings, 'CHAT_PRESENCE_TTL', 6 * 60 * 60)
+
+
+class InMemoryPresenceStore:
+    """Single-process store, used with the in-memory channel layer in development"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._last_seen = {}
+        self._last_flush = time.monotonic()
+
+    def connect(self, user_id):
+        """Register a socket; returns True if the user just came online"""
+        with self._lock:
+            count = self._connections.get(user_id, 0) + 1
+            self._connections[user_id] = count
+            self._last_seen[user_id] = timezone.now()
+            return count == 1
+
+    def disconnect(self, user_id):
+        """Release a socket; returns True if the user just went offline"""
+        with self._lock:
+            count = self._connections.get(user_id, 0) - 1
+            self._last_seen[user_id] = timezone.now()
+            if count > 0:
+                self._connections[user_id] = count
+                return False
+            return self._connections.pop(user_id, None) is not None
+
+    def online_user_ids(self, user_ids):
+        with self._lock:
+            return {user_id for user_id in user_ids if user_id in self._connections}
+
+    def claim_flush(self, interval):
+        """Return True if the caller should flush now; at most once per interval"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_flush < interval:
+                return False
+            self._last_flush = now
+            return True
+
+    def drain_last_seen(self):
+        with self._lock:
+            pending, self._last_seen = self._last_seen, {}
+            return pending
+
+
+class RedisPresenceStore:
+    """Store shared by all workers, kept in the Redis instance behind the channel layer"""
+
+    KEY_PREFIX = 'chat:presence'
+
+    # Decrement, record last_seen and drop the counter at zero in one step, so a
+    # socket opening on another worker between the two can't lose its count
+    DISCONNECT_SCRIPT = """
+    local count = redis.call('DECR', KEYS[1])
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+    if count <= 0 then
+        redis.call('DEL', KEYS[1])
+    end
+    return count
+    """
+
+    def __init__(self, host):
+        import redis
+
+        if isinstance(host, str):
+            self.client = redis.Redis.from_url(host)
+        elif isinstance(host, dict):
+            self.client = redis.Redis.from_url(host['address']) if 'address' in host else redis.Redis(**host)
+        else:
+            self.client = redis.Redis(host=host[0], port=host[1])
+        self._disconnect = self.client.register_script(self.DISCONNECT_SCRIPT)
+
+    def _key(self, user_id):
+        return f'{self.KEY_PREFIX}:conn:{user_id}'
+
+    def connect(self, user_id):
+        pipe = self.client.pipeline()
+        pipe.incr(self._key(user_id))
+        # A crashed worker can't decrement; let its connections age out
+        pipe.expire(self._key(user_id), PRESENCE_TTL)
+        pipe.hset(f'{self.KEY_PREFIX}:last_seen', user_id, timezone.now().isoformat())
+        count = pipe.execute()[0]
+        return count == 1
+
+    def disconnect(self, user_id):
+        count = self._disconnect(
+            keys=[self._key(user_id), f'{self.KEY_PREFIX}:last_seen'],
+            args=[user_id, timezone.now().isoformat()],
+        )
+        return count == 0
+
+    def online_user_ids(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        counts = self.client.mget([self._key(user_id) for user_id in user_ids])
+        return {user_id for user_id, count in zip(user_ids, counts) if count and int(count) > 0}
+
+    def claim_flush(self, interval):
+        return bool(self.client.set(f'{self.KEY_PREFIX}:flush', 1, nx=True, ex=max(int(interval), 1)))
+
+    def drain_last_seen(self):
+        key = f'{self.KEY_PREFIX}:last_seen'
+        pipe = self.client.pipeline()
+        pipe.hgetall(key)
+        pipe.delete(key)
+        raw = pipe.execute()[0]
+        return {int(user_id): datetime.fromisoformat(seen.decode()) for user_id, seen in raw.items()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_presence_store():
+    """Return the process-wide presence store matching the configured channel layer"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                layer = settings.CHANNEL_LAYERS.get('default', {})
+                if layer.get('BACKEND', '').startswith('channels_redis.'):
+                    _store = RedisPresenceStore(layer['CONFIG']['hosts'][0])
+                else:
+                    _store = InMemoryPresenceStore()
+    return _store
+
+
+def flush_presence(store=None):
+    """Persist pending last_seen/is_online snapshots to UserPresence in bulk; returns rows written"""
+    store = store or get_presence_store()
+    pending = store.drain_last_seen()
+    if not pending:
+        return 0
+    online = store.online_user_ids(pending.keys())
+    existing = UserPresence.objects.filter(user_id__in=pending.keys()).in_bulk(field_name='user_id')
+
+    to_update, to_create = [], []
+    for user_id, last_seen in pending.items():
+        presence = existing.get(user_id)
+        if presence is None:
+            to_create.append(UserPresence(user_id=user_id, is_online=user_id in online, last_seen=last_seen))
+        else:
+            presence.is_online = user_id in online
+            presence.last_seen = last_seen
+            to_update.append(presence)
+    if to_create:
+        # Users deleted since their socket was tracked would fail the foreign key
+        live = set(User.objects.filter(pk__in=[p.user_id for p in to_create]).values_list('pk', flat=True))
+        to_create = [presence for presence in to_create if presence.user_id in live]
+    UserPresence.objects.bulk_update(to_update, ['is_online', 'last_seen'])
+    UserPresence.objects.bulk_create(to_create, ignore_conflicts=True)
+    return len(pending)
+
+
+def persist_offline(user_id):
+    """Write a user's offline state now rather than at the next flush, which may never come"""
+    now = timezone.now()
+    if not UserPresence.objects.filter(user_id=user_id).update(is_online=False, last_seen=now):
+        UserPresence.objects.bulk_create([UserPresence(user_id=user_id, is_online=False, last_seen=now)],
+                                         ignore_conflicts=True)
+
+
+def is_user_online(user_id):
+    return user_id in get_presence_store().online_user_ids([user_id])
+
+
+def register_connection(user_id):
+    """Track a newly opened socket; returns True when the user came online"""
+    return get_presence_store().connect(user_id)
+
+
+def release_connection(user_id):
+    """Track a closed socket; returns True when the user went offline"""
+    return get_presence_store().disconnect(user_id)
+
+
+def flush_presence_if_due():
+    """Flush pending snapshots if this worker wins the per-interval flush slot"""
+    store = get_presence_store()
+    if store.claim_flush(PRESENCE_FLUSH_INTERVAL):
+        return flush_presence(store)
+    return 0
@@ -0,0 +1,127 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from doctors.models import DoctorProfile
+from patients.models import PatientProfile
+from receptionist.models import ReceptionistProfile
+from .models import Thread, ChatMessage, UnreadCounter
+from .thumbnails import schedule_thumbnail
+
+
+def _group_send(group, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(group, event)
+
+
+# Connected ChatConsumers cache participants and sender metadata; these
+# receivers tell them when that cache is stale.
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def thread_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # post_clear carries no pk_set, so note the user's threads while they still exist
+        instance._chat_cleared_thread_ids = list(
+            sender.objects.filter(user_id=instance.pk).values_list('thread_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Changed from the user side (user.chat_threads.add(...)); instance is the user
+        if action == 'post_clear':
+            thread_ids = instance.__dict__.pop('_chat_cleared_thread_ids', [])
+        else:
+            thread_ids = pk_set or []
+    else:
+        thread_ids = [instance.pk]
+    for thread_id in thread_ids:
+        _group_send(f'chat_{thread_id}', {'type': 'participants_changed'})
+
+
+# The fields a consumer's cached sender name and avatar are built from
+SENDER_FIELDS = {
+    User: ('first_name', 'last_name'),
+    DoctorProfile: ('profile_picture',),
+    PatientProfile: ('profile_picture',),
+    ReceptionistProfile: ('profile_picture',),
+}
+
+
+def _sender_values(instance, fields):
+    values = []
+    for name in fields:
+        value = getattr(instance, name)
+        values.append(value.name if isinstance(value, FieldFile) else value)
+    return tuple(values)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=DoctorProfile)
+@receiver(pre_save, sender=PatientProfile)
+@receiver(pre_save, sender=ReceptionistProfile)
+def remember_sender_metadata(sender, instance, update_fields=None, **kwargs):
+    fields = SENDER_FIELDS[sender]
+    instance._chat_sender_before = None
+    if instance.pk is None or (update_fields is not None and not set(fields) & set(update_fields)):
+        # New rows, and saves such as the last_login update on every login
+        return
+    instance._chat_sender_before = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=DoctorProfile)
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_save, sender=ReceptionistProfile)
+def sender_metadata_changed(sender, instance, created, **kwargs):
+    before = instance.__dict__.pop('_chat_sender_before', None)
+    if created or before is None or before == _sender_values(instance, SENDER_FIELDS[sender]):
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    _group_send(f'chat_user_{user_id}', {'type': 'sender_changed'})
+
+
+# UnreadCounter follows saves and reads in chat.models; deletions and
+# membership changes are caught here.
+
+@receiver(post_delete, sender=ChatMessage)
+def unread_message_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        UnreadCounter.adjust(instance.thread_id, instance.sender_id, -1)
+
+
+@receiver(pre_delete, sender=Thread)
+def remember_thread_participants(sender, instance, **kwargs):
+    instance._unread_participant_ids = list(instance.participants.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Thread)
+def thread_deleted(sender, instance, **kwargs):
+    # Recount rather than adjust: the cascade may drop the membership rows
+    # before or after the messages
+    UnreadCounter.recount_users(instance.__dict__.pop('_unread_participant_ids', []))
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def thread_membership_unread(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._unread_cleared_user_ids = list(instance.participants.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            user_ids = [instance.pk]
+        elif action == 'post_clear':
+            user_ids = instance.__dict__.pop('_unread_cleared_user_ids', [])
+        else:
+            user_ids = pk_set or []
+        UnreadCounter.recount_users(user_ids)
+
+
+@receiver(post_save, sender=ChatMessage)
+def queue_attachment_thumbnail(sender, instance, created, **kwargs):
+    if created and instance.attachment_type == 'image' and instance.attachment:
+        transaction.on_commit(lambda: schedule_thumbnail(instance.pk))
@@ -1,16 +1,36 @@
-from django.test import TestCase, TransactionTestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Thread, ChatMessage, UserPresence, CannedResponse
+from .models import Thread, ChatMessage, UserPresence, CannedResponse, UnreadCounter, ChunkedUpload
 from accounts.tests import create_user_with_role
 from channels.testing import WebsocketCommunicator
 from channels.routing import URLRouter
 from django.urls import path
 from .consumers import ChatConsumer
+from .presence import InMemoryPresenceStore, get_presence_store, flush_presence, persist_offline
+from channels.db import database_sync_to_async
+import asyncio
 import json
+from unittest import mock
 from datetime import timedelta
+import io
+import os
+import shutil
+import tempfile
+from PIL import Image
+
+
+def use_temp_media_root(test):
+    """Point MEDIA_ROOT at a throwaway directory for the rest of the test"""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    return media_root
 
 
 class ChatModelTest(TestCase):
@@ -57,6 +77,7 @@ class ChatModelTest(TestCase):
     
     def test_chat_message_with_attachment(self):
         """Test creating a chat message with file attachment"""
+        use_temp_media_root(self)
         thread = Thread.objects.create()
         thread.participants.add(self.user1, self.user2)
         
@@ -263,6 +284,7 @@ class ChatViewsTest(TestCase):
     
     def test_file_upload_view(self):
         """Test file upload functionality"""
+        use_temp_media_root(self)
         self.client.login(username='userA', password='password')
         
         # Create a test file
@@ -291,4 +313,534 @@ class ChatViewsTest(TestCase):
         response = self.client.get(reverse('chat:thread_detail', kwargs={'thread_id': self.thread.id}))
         
         self.assertEqual(response.status_code, 200)
-        self.assertIn('canned_responses', response.context)
\ No newline at end of file
+        self.assertIn('canned_responses', response.context)
+
+
+class UnreadCounterTest(TestCase):
+    """Test suite for the denormalized unread chat counter"""
+
+    def setUp(self):
+        self.user_a = create_user_with_role('userA', 'password', 'PATIENT')
+        self.user_b = create_user_with_role('userB', 'password', 'DOCTOR')
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.user_a, self.user_b)
+
+    def test_counter_seeded_from_existing_messages(self):
+        """The first lookup builds the counter from the messages table"""
+        for i in range(3):
+            ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message=f"Message {i}")
+
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 3)
+        self.assertEqual(UnreadCounter.get_for_user(self.user_b), 0)
+        self.assertTrue(UnreadCounter.objects.filter(user=self.user_a).exists())
+
+    def test_counter_tracks_new_and_read_messages(self):
+        """New messages increment and mark_as_read decrements the recipient's counter"""
+        UnreadCounter.get_for_user(self.user_a)
+        first = ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="One")
+        ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="Two")
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 2)
+
+        first.mark_as_read()
+        first.mark_as_read()  # Already read, must not decrement twice
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 1)
+
+    def test_counter_follows_deletes_and_membership(self):
+        """Deleting messages or threads and joining a thread keep the counter exact"""
+        UnreadCounter.get_for_user(self.user_a)
+        first = ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="One")
+        ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="Two")
+        first.delete()
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 1)
+
+        other = Thread.objects.create()
+        other.participants.add(self.user_b)
+        ChatMessage.objects.create(thread=other, sender=self.user_b, message="Before joining")
+        other.participants.add(self.user_a)
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 2)
+
+        self.thread.delete()
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 1)
+        self.user_a.chat_threads.clear()
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 0)
+
+    def test_concurrent_reads_decrement_once(self):
+        """Two requests reading the same messages only take them off the counter once"""
+        UnreadCounter.get_for_user(self.user_a)
+        message = ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="One")
+        ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="Two")
+        stale = ChatMessage.objects.get(pk=message.pk)
+        message.mark_as_read()
+        stale.mark_as_read()
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 1)
+        ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message="Three")
+        self.assertEqual(ChatMessage.mark_thread_read(self.thread.pk, self.user_a), 2)
+        self.assertEqual(ChatMessage.mark_thread_read(self.thread.pk, self.user_a), 0)
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 0)
+
+    def test_mark_thread_read_up_to_id(self):
+        """Marking up to an id touches only older messages and keeps the counter in step"""
+        UnreadCounter.get_for_user(self.user_a)
+        messages = [
+            ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message=f"Message {i}")
+            for i in range(4)
+        ]
+        ChatMessage.objects.create(thread=self.thread, sender=self.user_a, message="Reply")
+
+        updated = ChatMessage.mark_thread_read(self.thread.pk, self.user_a, up_to_id=messages[2].pk)
+
+        self.assertEqual(updated, 3)
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 1)
+        self.assertFalse(ChatMessage.objects.get(pk=messages[3].pk).is_read)
+        self.assertEqual(ChatMessage.mark_thread_read(self.thread.pk, self.user_a, up_to_id=messages[2].pk), 0)
+        self.assertEqual(UnreadCounter.get_for_user(self.user_a), 1)
+
+    def test_context_processor_uses_single_query(self):
+        """The unread badge costs one query regardless of thread count"""
+        from .context_processors import unread_chat_messages
+        for _ in range(5):
+            thread = Thread.objects.create()
+            thread.participants.add(self.user_a, self.user_b)
+            ChatMessage.objects.create(thread=thread, sender=self.user_b, message="Hi")
+        UnreadCounter.recount(self.user_a)
+
+        request = type('Request', (), {'user': self.user_a})()
+        with self.assertNumQueries(1):
+            context = unread_chat_messages(request)
+        self.assertEqual(context['unread_chat_messages_count'], 5)
+
+
+class ConsumerCacheSignalTest(TestCase):
+    """Test suite for the signals that tell connected consumers their cache is stale"""
+
+    def setUp(self):
+        self.user = create_user_with_role('signal_user', 'password', 'PATIENT')
+        self.other = create_user_with_role('signal_other', 'password', 'DOCTOR')
+        self.threads = [Thread.objects.create() for _ in range(2)]
+        for thread in self.threads:
+            thread.participants.add(self.user, self.other)
+        self.user = User.objects.get(pk=self.user.pk)
+
+    def sent(self, send):
+        return [(group, event['type']) for (group, event), _ in send.call_args_list]
+
+    def test_login_does_not_invalidate_sender_metadata(self):
+        with mock.patch('chat.signals._group_send') as send:
+            self.client.login(username='signal_user', password='password')
+            self.user.email = 'new@example.com'
+            self.user.save()
+        self.assertEqual(send.call_count, 0)
+
+    def test_name_change_invalidates_sender_metadata(self):
+        with mock.patch('chat.signals._group_send') as send:
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        self.assertEqual(self.sent(send), [(f'chat_user_{self.user.pk}', 'sender_changed')])
+
+    def test_clearing_a_users_threads_notifies_each_thread(self):
+        with mock.patch('chat.signals._group_send') as send:
+            self.user.chat_threads.clear()
+        self.assertEqual(
+            sorted(self.sent(send)),
+            sorted((f'chat_{thread.pk}', 'participants_changed') for thread in self.threads)
+        )
+
+
+class InboxQueryTest(TestCase):
+    """Test suite for the annotated inbox query"""
+
+    def setUp(self):
+        self.user = create_user_with_role('inboxUser', 'password', 'DOCTOR')
+        self.others = [create_user_with_role(f'patient{i}', 'password', 'PATIENT') for i in range(4)]
+        self.threads = []
+        for other in self.others:
+            thread = Thread.objects.create()
+            thread.participants.add(self.user, other)
+            ChatMessage.objects.create(thread=thread, sender=other, message=f"Hi from {other.username}")
+            self.threads.append(thread)
+        store = get_presence_store()
+        store.connect(self.others[0].pk)
+        self.addCleanup(store.disconnect, self.others[0].pk)
+
+    def test_inbox_resolves_thread_summaries(self):
+        """Each entry carries the other user, last message, unread count and presence"""
+        from .inbox import get_inbox
+        ChatMessage.objects.create(thread=self.threads[0], sender=self.user, message="Reply")
+
+        entries, next_cursor = get_inbox(self.user)
+        self.assertIsNone(next_cursor)
+        by_thread = {e['thread_object'].pk: e for e in entries}
+        first = by_thread[self.threads[0].pk]
+        self.assertEqual(first['other_user'], self.others[0])
+        self.assertEqual(first['last_message'].message, "Reply")
+        self.assertEqual(first['unread_count'], 1)
+        self.assertTrue(first['is_online'])
+        self.assertFalse(by_thread[self.threads[1].pk]['is_online'])
+
+    def test_inbox_query_count_is_constant(self):
+        """The inbox costs the same number of queries regardless of thread count"""
+        from .inbox import get_inbox
+        cache.clear()
+        get_inbox(self.user)
+        # threads, users, roles and last messages; avatars come from the cache
+        with self.assertNumQueries(4):
+            entries, _ = get_inbox(self.user)
+        self.assertEqual(len(entries), 4)
+
+    def test_inbox_keyset_pagination(self):
+        """Pages follow each other without gaps or duplicates"""
+        from .inbox import get_inbox
+        first_page, cursor = get_inbox(self.user, limit=3)
+        self.assertEqual(len(first_page), 3)
+        self.assertIsNotNone(cursor)
+        second_page, cursor = get_inbox(self.user, cursor=cursor, limit=3)
+        self.assertEqual(len(second_page), 1)
+        self.assertIsNone(cursor)
+        seen = {e['thread_object'].pk for e in first_page + second_page}
+        self.assertEqual(seen, {t.pk for t in self.threads})
+
+
+class MessageHistoryTest(TestCase):
+    """Test suite for keyset-paginated message history"""
+
+    def setUp(self):
+        self.user_a = create_user_with_role('userA', 'password', 'PATIENT')
+        self.user_b = create_user_with_role('userB', 'password', 'DOCTOR')
+        self.outsider = create_user_with_role('userC', 'password', 'PATIENT')
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.user_a, self.user_b)
+        self.messages = [
+            ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message=f"Message {i}")
+            for i in range(7)
+        ]
+
+    def test_history_pages_walk_backwards(self):
+        """Pages are chronological and together cover the whole thread"""
+        from .history import get_message_history
+        latest, cursor = get_message_history(self.thread, limit=3)
+        self.assertEqual([m.message for m in latest], ["Message 4", "Message 5", "Message 6"])
+
+        collected = list(latest)
+        while cursor:
+            page, cursor = get_message_history(self.thread, cursor=cursor, limit=3)
+            collected = page + collected
+        self.assertEqual([m.pk for m in collected], [m.pk for m in self.messages])
+
+    def test_history_api_returns_older_page(self):
+        """The history endpoint serves the page before the given cursor"""
+        from .history import get_message_history
+        _, cursor = get_message_history(self.thread, limit=5)
+        self.client.login(username='userA', password='password')
+        response = self.client.get(
+            reverse('chat:message_history', kwargs={'thread_id': self.thread.id}),
+            {'before': cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual([m['message'] for m in data['messages']], ["Message 0", "Message 1"])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_history_api_requires_participation(self):
+        """Non-participants cannot read a thread's history"""
+        self.client.login(username='userC', password='password')
+        response = self.client.get(reverse('chat:message_history', kwargs={'thread_id': self.thread.id}))
+        self.assertEqual(response.status_code, 404)
+
+
+
+class ChunkedUploadTest(TestCase):
+    """Test suite for resumable chunked attachment uploads and thumbnails"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CHAT_UPLOAD_TEMP_DIR=os.path.join(self.media_root, 'partial'),
+            CHAT_THUMBNAIL_ASYNC=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user_a = create_user_with_role('userA', 'password', 'PATIENT')
+        self.user_b = create_user_with_role('userB', 'password', 'DOCTOR')
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.user_a, self.user_b)
+        self.client.login(username='userA', password='password')
+
+    def start(self, filename, total_size):
+        response = self.client.post(reverse('chat:chunked_upload_start'), {
+            'thread_id': self.thread.id,
+            'filename': filename,
+            'total_size': total_size,
+            'message': 'Scan results'
+        })
+        self.assertEqual(response.status_code, 201)
+        return reverse('chat:chunked_upload', kwargs={'upload_id': json.loads(response.content)['upload_id']})
+
+    def send(self, url, chunk, offset):
+        return self.client.post(url, chunk, content_type='application/octet-stream', HTTP_X_UPLOAD_OFFSET=str(offset))
+
+    def test_chunks_are_assembled_into_a_message(self):
+        """The chunks are joined in order and become one attachment message"""
+        content = b'0123456789' * 10
+        url = self.start('report.pdf', len(content))
+
+        response = self.send(url, content[:40], 0)
+        self.assertEqual(json.loads(response.content), {'status': 'uploading', 'offset': 40})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send(url, content[40:], 40)
+        data = json.loads(response.content)
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'partial')), [])
+
+        message = ChatMessage.objects.get(pk=data['message_id'])
+        self.assertEqual(message.message, 'Scan results')
+        self.assertEqual(message.attachment_type, 'pdf')
+        with message.attachment.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertTrue(ChunkedUpload.objects.get().is_complete)
+
+    def test_out_of_order_chunk_reports_resume_offset(self):
+        """A chunk at the wrong offset is refused with the offset to resume from"""
+        url = self.start('notes.txt', 20)
+        self.send(url, b'a' * 10, 0)
+
+        response = self.send(url, b'b' * 5, 15)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content)['offset'], 10)
+
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content)['offset'], 10)
+
+    def test_upload_requires_participation(self):
+        """Only thread participants can start an upload, and only the owner can continue it"""
+        url = self.start('notes.txt', 10)
+        create_user_with_role('userC', 'password', 'PATIENT')
+        self.client.login(username='userC', password='password')
+        response = self.client.post(reverse('chat:chunked_upload_start'), {
+            'thread_id': self.thread.id, 'filename': 'x.txt', 'total_size': 10
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.send(url, b'x' * 10, 0).status_code, 404)
+
+    def test_image_upload_gets_thumbnail(self):
+        """Image attachments are stored with a downscaled JPEG thumbnail"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'PNG')
+        content = buffer.getvalue()
+        url = self.start('xray.png', len(content))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send(url, content, 0)
+        message = ChatMessage.objects.get(pk=json.loads(response.content)['message_id'])
+
+        self.assertTrue(message.thumbnail)
+        with message.thumbnail.open('rb') as stored, Image.open(stored) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 320)
+
+    def test_stale_uploads_are_purged(self):
+        """Idle unfinished uploads are removed along with their partial files"""
+        from .uploads import partial_path, purge_stale_uploads
+        self.start('notes.txt', 10)
+        upload = ChunkedUpload.objects.get()
+        ChunkedUpload.objects.filter(pk=upload.pk).update(updated=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(purge_stale_uploads(), 1)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(partial_path(upload)))
+
+class ChatConsumerTest(TransactionTestCase):
+    """Test suite for the chat WebSocket consumer"""
+
+    def setUp(self):
+        self.user_a = create_user_with_role('userA', 'password', 'PATIENT')
+        self.user_b = create_user_with_role('userB', 'password', 'DOCTOR')
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.user_a, self.user_b)
+        self.application = URLRouter([
+            path('ws/chat/<int:thread_id>/', ChatConsumer.as_asgi()),
+        ])
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(self.application, f'/ws/chat/{self.thread.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_type(self, communicator, message_type):
+        """Skip frames until one of the given type arrives"""
+        while True:
+            response = await communicator.receive_json_from(timeout=2)
+            if response['type'] == message_type:
+                return response
+
+    async def test_message_is_broadcast_and_notified(self):
+        """A sent message reaches the group and notifies the other participant"""
+        from notifications.models import Notification
+        communicator = await self.connect(self.user_a)
+        await communicator.send_json_to({'type': 'message', 'message': 'Hello doctor'})
+
+        response = await self.receive_type(communicator, 'message')
+        self.assertEqual(response['message'], 'Hello doctor')
+        self.assertEqual(response['sender'], 'userA')
+        await communicator.disconnect()
+
+        recipients = await database_sync_to_async(
+            lambda: list(Notification.objects.values_list('recipient_id', flat=True))
+        )()
+        self.assertEqual(recipients, [self.user_b.pk])
+
+    async def test_message_path_uses_cached_sender_data(self):
+        """Sender name comes from the cache and is refreshed on a change event"""
+        communicator = await self.connect(self.user_a)
+
+        def rename():
+            self.user_a.first_name = 'Alice'
+            self.user_a.last_name = 'Patient'
+            self.user_a.save()
+        await database_sync_to_async(rename)()
+        # Let the consumer pick up the invalidation event from the channel layer
+        await asyncio.sleep(0.2)
+
+        await communicator.send_json_to({'type': 'message', 'message': 'Renamed'})
+        response = await self.receive_type(communicator, 'message')
+        self.assertEqual(response['sender_name'], 'Alice Patient')
+        await communicator.disconnect()
+
+    async def test_removed_participant_is_disconnected(self):
+        """Removing a participant invalidates the cached membership and closes their socket"""
+        communicator = await self.connect(self.user_a)
+        await database_sync_to_async(self.thread.participants.remove)(self.user_a)
+
+        while True:
+            output = await communicator.receive_output(timeout=2)
+            if output['type'] == 'websocket.close':
+                break
+        await communicator.wait()
+
+    async def test_non_participant_is_rejected(self):
+        """Users outside the thread cannot connect"""
+        outsider = await database_sync_to_async(create_user_with_role)('userC', 'password', 'PATIENT')
+        communicator = WebsocketCommunicator(self.application, f'/ws/chat/{self.thread.id}/')
+        communicator.scope['user'] = outsider
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_read_up_to_is_one_receipt(self):
+        """A batched receipt marks every earlier message and broadcasts a single event"""
+        reader = await self.connect(self.user_a)
+        sender = await self.connect(self.user_b)
+
+        def send_messages():
+            return [
+                ChatMessage.objects.create(thread=self.thread, sender=self.user_b, message=f"Message {i}").pk
+                for i in range(3)
+            ]
+        message_ids = await database_sync_to_async(send_messages)()
+
+        await reader.send_json_to({'type': 'read_receipt', 'up_to_id': message_ids[-1]})
+        receipt = await self.receive_type(sender, 'read_receipt')
+        self.assertEqual(receipt['up_to_id'], message_ids[-1])
+        self.assertEqual(receipt['read_by'], 'userA')
+
+        # Nothing left to mark, so a repeat receipt is not broadcast
+        await reader.send_json_to({'type': 'read_receipt', 'up_to_id': message_ids[-1]})
+        self.assertTrue(await sender.receive_nothing(timeout=0.2))
+
+        unread = await database_sync_to_async(
+            lambda: ChatMessage.objects.filter(thread=self.thread, is_read=False).count()
+        )()
+        self.assertEqual(unread, 0)
+        self.assertEqual(await database_sync_to_async(UnreadCounter.get_for_user)(self.user_a), 0)
+        await reader.disconnect()
+        await sender.disconnect()
+
+    async def test_typing_frames_are_coalesced(self):
+        """Repeated typing frames produce one start and one stop for the other participant"""
+        from .consumers import typing_stats
+        typing_stats.clear()
+        watcher = await self.connect(self.user_b)
+        typist = await self.connect(self.user_a)
+
+        for _ in range(5):
+            await typist.send_json_to({'type': 'typing', 'is_typing': True})
+        await typist.send_json_to({'type': 'typing', 'is_typing': False})
+        await typist.send_json_to({'type': 'typing', 'is_typing': False})
+
+        start = await self.receive_type(watcher, 'typing')
+        stop = await self.receive_type(watcher, 'typing')
+        self.assertTrue(start['is_typing'])
+        self.assertFalse(stop['is_typing'])
+        self.assertTrue(await watcher.receive_nothing(timeout=0.2))
+        self.assertEqual(typing_stats['broadcast'], 2)
+        self.assertEqual(typing_stats['suppressed'], 5)
+        await typist.disconnect()
+        await watcher.disconnect()
+
+    async def test_typing_state_expires(self):
+        """A client that goes quiet is reported as no longer typing"""
+        watcher = await self.connect(self.user_b)
+        typist = await self.connect(self.user_a)
+        with mock.patch.object(ChatConsumer, 'typing_timeout', 0.1):
+            await typist.send_json_to({'type': 'typing', 'is_typing': True})
+            self.assertTrue((await self.receive_type(watcher, 'typing'))['is_typing'])
+            self.assertFalse((await self.receive_type(watcher, 'typing'))['is_typing'])
+        await typist.disconnect()
+        await watcher.disconnect()
+
+class PresenceStoreTest(TestCase):
+    """Test suite for reference-counted presence tracking"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='presenceUser', password='pw')
+        self.store = InMemoryPresenceStore()
+
+    def test_multiple_sockets_are_reference_counted(self):
+        """Only the first open and the last close change the online state"""
+        self.assertTrue(self.store.connect(self.user.pk))
+        self.assertFalse(self.store.connect(self.user.pk))
+        self.assertFalse(self.store.disconnect(self.user.pk))
+        self.assertEqual(self.store.online_user_ids([self.user.pk]), {self.user.pk})
+        self.assertTrue(self.store.disconnect(self.user.pk))
+        self.assertEqual(self.store.online_user_ids([self.user.pk]), set())
+        # A stray close must not flip the state again
+        self.assertFalse(self.store.disconnect(self.user.pk))
+
+    def test_flush_persists_snapshots_in_bulk(self):
+        """Pending last_seen values are written once and then cleared"""
+        other = User.objects.create_user(username='presenceOther', password='pw')
+        UserPresence.objects.create(user=other, is_online=True)
+        self.store.connect(self.user.pk)
+        self.store.connect(other.pk)
+        self.store.disconnect(other.pk)
+
+        self.assertEqual(flush_presence(self.store), 2)
+        self.assertTrue(UserPresence.objects.get(user=self.user).is_online)
+        self.assertFalse(UserPresence.objects.get(user=other).is_online)
+        self.assertEqual(flush_presence(self.store), 0)
+
+    def test_flush_skips_deleted_users(self):
+        """A user deleted after connecting doesn't break the batch for everyone else"""
+        gone = User.objects.create_user(username='presenceGone', password='pw')
+        self.store.connect(gone.pk)
+        self.store.connect(self.user.pk)
+        gone.delete()
+        flush_presence(self.store)
+        self.assertTrue(UserPresence.objects.get(user=self.user).is_online)
+        self.assertFalse(UserPresence.objects.filter(user_id=gone.pk).exists())
+
+    def test_going_offline_is_persisted_without_a_flush(self):
+        """The last socket closing marks the row offline straight away"""
+        UserPresence.objects.create(user=self.user, is_online=True)
+        persist_offline(self.user.pk)
+        self.assertFalse(UserPresence.objects.get(user=self.user).is_online)
+        other = User.objects.create_user(username='presenceNew', password='pw')
+        persist_offline(other.pk)
+        self.assertFalse(UserPresence.objects.get(user=other).is_online)
+
+    def test_flush_is_claimed_once_per_interval(self):
+        """Only one caller per interval is told to flush"""
+        self.assertFalse(self.store.claim_flush(60))
+        self.assertTrue(self.store.claim_flush(0))
@@ -0,0 +1,96 @@
+"""
+Background thumbnails for chat image attachments.
+
+Image messages are shown as previews in the thread view, so each one gets a
+small JPEG stored next to the original. The work runs on a small thread pool
+after the message is committed, keeping Pillow off the upload request; the
+generate_chat_thumbnails command backfills anything that was missed.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def generate_thumbnail(message):
+    """Write a JPEG thumbnail for an image message; returns True if one was stored"""
+    if message.attachment_type != 'image' or not message.attachment or message.thumbnail:
+        return False
+
+    size = tuple(getattr(settings, 'CHAT_THUMBNAIL_SIZE', THUMBNAIL_SIZE))
+    buffer = io.BytesIO()
+    try:
+        with message.attachment.open('rb') as source, Image.open(source) as image:
+            # Lets the JPEG decoder scale down while reading instead of decoding full size
+            image.draft('RGB', size)
+            image.thumbnail(size)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(buffer, 'JPEG', quality=80, optimize=True)
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.warning("Could not create thumbnail for chat message %s: %s", message.pk, exc)
+        return False
+
+    name = os.path.splitext(os.path.basename(message.attachment.name))[0] + '_thumb.jpg'
+    message.thumbnail.save(name, ContentFile(buffer.getvalue()), save=False)
+    # Only touch the thumbnail column; read flags may have changed since the message was loaded
+    type(message).objects.filter(pk=message.pk).update(thumbnail=message.thumbnail.name)
+    return True
+
+
+def process_thumbnail(message_id):
+    """Generate the thumbnail for one message and tell open threads about it"""
+    from .models import ChatMessage
+    try:
+        message = ChatMessage.objects.filter(pk=message_id).first()
+        if message is None or not generate_thumbnail(message):
+            return
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(
+                f'chat_{message.thread_id}',
+                {
+                    'type': 'attachment_thumbnail',
+                    'message_id': message.pk,
+                    'thumbnail_url': message.thumbnail.url,
+                }
+            )
+    except Exception:
+        logger.exception("Thumbnail generation failed for chat message %s", message_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CHAT_THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='chat-thumbnails'
+            )
+        return _executor
+
+
+def schedule_thumbnail(message_id):
+    """Queue thumbnail generation, or run it inline when CHAT_THUMBNAIL_ASYNC is off"""
+    if getattr(settings, 'CHAT_THUMBNAIL_ASYNC', True):
+        _get_executor().submit(process_thumbnail, message_id)
+    else:
+        process_thumbnail(message_id)
@@ -0,0 +1,180 @@
+"""
+Resumable chunked uploads for chat attachments.
+
+A client starts an upload with the file name and size, then sends the file
+in chunks, each tagged with the byte offset it starts at. Chunks are streamed
+from the request in small blocks, so neither the file nor a chunk is ever
+held in memory, and no database lock is held while a chunk is in transit.
+If a chunk is lost the client asks for the current offset and carries on
+from there. When the last byte arrives the partial file is copied into
+storage and becomes an ordinary ChatMessage attachment.
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChatMessage, ChunkedUpload
+from .utils import get_attachment_type
+
+STREAM_BLOCK_SIZE = 64 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024
+
+
+class UploadError(Exception):
+    """A request that cannot be applied to an upload; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def get_upload_dir():
+    return str(getattr(settings, 'CHAT_UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'tmp', 'chat_uploads')))
+
+
+def get_chunk_size():
+    return getattr(settings, 'CHAT_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def partial_path(upload):
+    return os.path.join(get_upload_dir(), f'{upload.upload_id}.part')
+
+
+def start_upload(user, thread, filename, total_size, message=''):
+    """Register a new upload and create its empty partial file"""
+    filename = os.path.basename(filename or '')[:255]
+    if not filename or total_size <= 0:
+        raise UploadError('Missing required fields')
+    if total_size > getattr(settings, 'CHAT_UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE):
+        raise UploadError('File is too large', status=413)
+
+    upload = ChunkedUpload.objects.create(
+        user=user,
+        thread=thread,
+        filename=filename,
+        total_size=total_size,
+        message=message
+    )
+    os.makedirs(get_upload_dir(), exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def _check_chunk(upload, offset, length):
+    if upload.is_complete:
+        raise UploadError('Upload already complete', status=409)
+    if offset != upload.offset:
+        raise UploadError(f'Expected offset {upload.offset}', status=409)
+    if length <= 0 or offset + length > upload.total_size:
+        raise UploadError('Chunk does not fit the declared file size')
+
+
+def _receive(stream, path, length):
+    """Copy up to length bytes from stream to a new file at path; returns the number received"""
+    received = 0
+    with open(path, 'wb') as chunk:
+        while received < length:
+            block = stream.read(min(STREAM_BLOCK_SIZE, length - received))
+            if not block:
+                break
+            chunk.write(block)
+            received += len(block)
+    return received
+
+
+def append_chunk(upload, stream, offset, length):
+    """
+    Stream length bytes from stream onto the upload, starting at offset.
+
+    The offset must match what has been received so far; anything else is a
+    409 carrying the offset to resume from. If the stream ends early the bytes
+    that did arrive are kept. Returns the refreshed upload; once the last
+    chunk lands its chat_message is set.
+
+    The chunk is received into a file of its own with no transaction open,
+    so a slow client never holds a database lock (on SQLite, the write lock
+    for the whole database). Only the re-check of the offset, the local copy
+    onto the partial file and the offset update run under the row lock; of
+    two requests racing for the same offset the first to get there wins and
+    the other gets the 409.
+    """
+    _check_chunk(upload, offset, length)
+    os.makedirs(get_upload_dir(), exist_ok=True)
+    fd, chunk_path = tempfile.mkstemp(prefix=f'{upload.upload_id}.', suffix='.chunk', dir=get_upload_dir())
+    os.close(fd)
+    try:
+        received = _receive(stream, chunk_path, length)
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            _check_chunk(upload, offset, length)
+            if received:
+                with open(partial_path(upload), 'r+b') as partial, open(chunk_path, 'rb') as chunk:
+                    # Drop bytes past the recorded offset left by an interrupted request
+                    partial.seek(offset)
+                    partial.truncate()
+                    shutil.copyfileobj(chunk, partial, STREAM_BLOCK_SIZE)
+                upload.offset = offset + received
+                upload.save(update_fields=['offset', 'updated'])
+    finally:
+        os.remove(chunk_path)
+
+    if upload.offset == upload.total_size:
+        complete_upload(upload)
+    return upload
+
+
+def complete_upload(upload):
+    """
+    Move the finished partial file into storage as a new chat message.
+
+    The copy into storage happens before the transaction that records the
+    message; the partial file is removed only once that transaction commits.
+    """
+    path = partial_path(upload)
+    chat_message = ChatMessage(
+        thread_id=upload.thread_id,
+        sender_id=upload.user_id,
+        message=upload.message,
+        attachment_type=get_attachment_type(upload.filename)
+    )
+    with open(path, 'rb') as partial:
+        chat_message.attachment.save(upload.filename, File(partial), save=False)
+    try:
+        with transaction.atomic():
+            chat_message.save()
+            upload.status = ChunkedUpload.STATUS_COMPLETE
+            upload.chat_message = chat_message
+            upload.save(update_fields=['status', 'chat_message', 'updated'])
+            transaction.on_commit(lambda: os.remove(path))
+    except Exception:
+        # Nothing points at the stored copy; the partial file is still there to retry from
+        chat_message.attachment.delete(save=False)
+        raise
+    return chat_message
+
+
+def purge_stale_uploads(max_age=None):
+    """Delete unfinished uploads idle for longer than max_age (a timedelta); returns the count"""
+    if max_age is None:
+        max_age = timedelta(seconds=getattr(settings, 'CHAT_UPLOAD_EXPIRY', 24 * 60 * 60))
+    stale = ChunkedUpload.objects.filter(
+        status=ChunkedUpload.STATUS_UPLOADING,
+        updated__lt=timezone.now() - max_age
+    )
+    count = 0
+    for upload in stale:
+        try:
+            os.remove(partial_path(upload))
+        except FileNotFoundError:
+            pass
+        upload.delete()
+        count += 1
+    return count
@@ -5,6 +5,10 @@ app_name = 'chat'
 urlpatterns = [
     path('', views.thread_list_view, name='thread_list'),
     path('thread/<int:thread_id>/', views.thread_list_view, name='thread_detail'),
+    path('thread/<int:thread_id>/messages/', views.message_history_api, name='message_history'),
     path('start/<int:user_id>/', views.start_chat_view, name='start_chat'),
     path('upload/', views.upload_file_view, name='upload_file'),
+    path('upload/chunked/', views.chunked_upload_start_view, name='chunked_upload_start'),
+    path('upload/chunked/<uuid:upload_id>/', views.chunked_upload_view, name='chunked_upload'),
+    path('stats/typing/', views.typing_stats_api, name='typing_stats'),
 ]
\ No newline at end of file
@@ -0,0 +1,44 @@
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(moment, pk):
+    """Encode a (datetime, pk) keyset position as an opaque URL-safe string"""
+    delta = moment - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f"{micros}-{pk}"
+
+
+def decode_cursor(value):
+    """Decode a cursor from encode_cursor; returns (datetime, pk) or None if malformed"""
+    if not value:
+        return None
+    try:
+        micros, pk = value.split('-', 1)
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_attachment_size(attachment):
+    """Human readable size of an uploaded or stored file, or '' if unavailable"""
+    try:
+        size = attachment.size
+    except (OSError, ValueError):
+        return ''
+    return f'{size / 1024:.1f} KB' if size < 1024*1024 else f'{size / (1024*1024):.1f} MB'
+
+
+ATTACHMENT_TYPES = {
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image', '.webp': 'image',
+    '.pdf': 'pdf',
+    '.doc': 'document', '.docx': 'document', '.txt': 'document',
+    '.mp4': 'video', '.avi': 'video', '.mov': 'video', '.webm': 'video',
+}
+
+
+def get_attachment_type(filename):
+    """Classify an attachment by file extension: 'image', 'pdf', 'document', 'video' or 'file'"""
+    return ATTACHMENT_TYPES.get(os.path.splitext(filename)[1].lower(), 'file')
@@ -1,53 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from .models import Thread, UserPresence, CannedResponse, ChatMessage
+from .models import Thread, UserPresence, CannedResponse, ChatMessage, UnreadCounter, ChunkedUpload
+from .inbox import get_inbox
+from .history import get_message_history
+from .uploads import UploadError, start_upload, append_chunk, get_chunk_size
+from .utils import format_attachment_size, get_attachment_type
+from .presence import is_user_online
+from accounts.decorators import admin_required
+from accounts.avatars import get_avatar_url
 from django.db.models import Max, Q
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-import os
 
 @login_required
 def thread_list_view(request, thread_id=None):
-    # Get all threads the user is a part of
-    user_threads = Thread.objects.filter(participants=request.user).order_by('-updated')
-    
-    # --- NEW LOGIC: Prepare the data for the template ---
-    threads_with_other_user = []
-    total_unread = 0
-    
-    for thread in user_threads:
-        # For each thread, find the participant who is not the current user
-        other_participant = thread.participants.exclude(id=request.user.id).first()
-        
-        # We also want the last message to display
-        last_message = thread.messages.order_by('-timestamp').first()
-        
-        # Get unread count for this thread
-        unread_count = thread.get_unread_count_for_user(request.user)
-        total_unread += unread_count
-        
-        # Check if other user is online
-        is_online = False
-        if other_participant:
-            try:
-                is_online = other_participant.presence.is_online
-            except UserPresence.DoesNotExist:
-                is_online = False
-
-        threads_with_other_user.append({
-            'thread_object': thread,
-            'other_user': other_participant,
-            'last_message': last_message,
-            'unread_count': unread_count,
-            'is_online': is_online
-        })
+    # One page of the inbox, resolved in a constant number of queries
+    threads_with_other_user, next_cursor = get_inbox(request.user, cursor=request.GET.get('before'))
+    total_unread = UnreadCounter.get_for_user(request.user)
 
     # If thread_id is provided, load that thread's details
     active_thread = None
     messages = []
+    history_cursor = None
     other_user = None
     patient_context = None
     is_online = False
@@ -74,20 +51,15 @@ def thread_list_view(request, thread_id=None):
                 except Exception:
                     pass
                 
-                # Check online status
+                # Live status from the presence store; last_seen from the persisted snapshot
+                is_online = is_user_online(other_user.pk)
                 try:
-                    presence = other_user.presence
-                    is_online = presence.is_online
-                    last_seen = presence.last_seen
+                    last_seen = other_user.presence.last_seen
                 except UserPresence.DoesNotExist:
                     pass
             
-            # Get messages
-            messages = active_thread.messages.order_by('timestamp').select_related(
-                'sender__doctorprofile', 
-                'sender__patientprofile',
-                'sender__receptionistprofile'
-            )
+            # Only the latest page is rendered; older pages are fetched on scroll
+            messages, history_cursor = get_message_history(active_thread)
             
             # Get canned responses
             if request.user.groups.filter(name__in=['Doctors', 'Receptionists', 'Admins']).exists():
@@ -100,9 +72,11 @@ def thread_list_view(request, thread_id=None):
 
     context = {
         'threads': threads_with_other_user,
+        'next_cursor': next_cursor,
         'total_unread': total_unread,
         'active_thread': active_thread,
         'messages': messages,
+        'history_cursor': history_cursor,
         'other_user': other_user,
         'patient_context': patient_context,
         'is_online': is_online,
@@ -141,19 +115,14 @@ def thread_detail_view(request, thread_id):
     is_online = False
     last_seen = None
     if other_user:
+        is_online = is_user_online(other_user.pk)
         try:
-            presence = other_user.presence
-            is_online = presence.is_online
-            last_seen = presence.last_seen
+            last_seen = other_user.presence.last_seen
         except UserPresence.DoesNotExist:
             pass
     
-    # Get all messages and optimize by prefetching related user profiles
-    messages = thread.messages.order_by('timestamp').select_related(
-        'sender__doctorprofile', 
-        'sender__patientprofile',
-        'sender__receptionistprofile'
-    )
+    # Latest page of messages; older ones are served by message_history_api
+    messages, history_cursor = get_message_history(thread)
     
     # Get canned responses for staff members (doctors, receptionists)
     canned_responses = []
@@ -166,6 +135,7 @@ def thread_detail_view(request, thread_id):
     context = {
         'thread': thread,
         'messages': messages,
+        'history_cursor': history_cursor,
         'other_user': other_user,  # Pass the other user object
         'patient_context': patient_context,  # Pass patient context
         'is_online': is_online,  # Pass online status
@@ -174,6 +144,34 @@ def thread_detail_view(request, thread_id):
     }
     return render(request, 'chat/thread_detail.html', context)
 
+@login_required
+def message_history_api(request, thread_id):
+    """Return one page of older messages for lazy scroll-back"""
+    thread = get_object_or_404(Thread, pk=thread_id, participants=request.user)
+    try:
+        limit = min(int(request.GET.get('limit', 50)), 200)
+    except ValueError:
+        limit = 50
+    messages, next_cursor = get_message_history(thread, cursor=request.GET.get('before'), limit=max(limit, 1))
+    data = [
+        {
+            'message_id': message.id,
+            'message': message.message,
+            'sender': message.sender.username,
+            'sender_name': message.sender.get_full_name() or message.sender.username,
+            'sender_avatar': get_avatar_url(message.sender),
+            'timestamp': message.timestamp.isoformat(),
+            'is_read': message.is_read,
+            'attachment_url': message.attachment.url if message.attachment else None,
+            'attachment_type': message.attachment_type,
+            'attachment_name': message.attachment.name if message.attachment else None,
+            'attachment_size': format_attachment_size(message.attachment) if message.attachment else None,
+            'thumbnail_url': message.thumbnail.url if message.thumbnail else None,
+        }
+        for message in messages
+    ]
+    return JsonResponse({'messages': data, 'next_cursor': next_cursor})
+
 @login_required
 def start_chat_view(request, user_id):
     receiver = get_object_or_404(User, pk=user_id)
@@ -201,57 +199,16 @@ def upload_file_view(request):
         if request.user not in thread.participants.all():
             return JsonResponse({'error': 'Unauthorized'}, status=403)
         
-        # Determine attachment type
-        file_ext = os.path.splitext(attachment.name)[1].lower()
-        attachment_type = 'file'
-        if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-            attachment_type = 'image'
-        elif file_ext == '.pdf':
-            attachment_type = 'pdf'
-        elif file_ext in ['.doc', '.docx', '.txt']:
-            attachment_type = 'document'
-        elif file_ext in ['.mp4', '.avi', '.mov', '.webm']:
-            attachment_type = 'video'
-        
         # Create the message with attachment
         chat_message = ChatMessage.objects.create(
             thread=thread,
             sender=request.user,
             message=message_text,
             attachment=attachment,
-            attachment_type=attachment_type
+            attachment_type=get_attachment_type(attachment.name)
         )
         
-        # Get sender's avatar
-        sender_avatar = '/media/profile_pictures/default.jpeg'
-        try:
-            if hasattr(request.user, 'doctorprofile') and request.user.doctorprofile.profile_picture:
-                sender_avatar = request.user.doctorprofile.profile_picture.url
-            elif hasattr(request.user, 'patientprofile') and request.user.patientprofile.profile_picture:
-                sender_avatar = request.user.patientprofile.profile_picture.url
-            elif hasattr(request.user, 'receptionistprofile') and request.user.receptionistprofile.profile_picture:
-                sender_avatar = request.user.receptionistprofile.profile_picture.url
-        except:
-            pass
-        
-        # Broadcast the message via WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chat_{thread_id}',
-            {
-                'type': 'chat_message',
-                'message': message_text,
-                'sender': request.user.username,
-                'sender_name': request.user.get_full_name() or request.user.username,
-                'sender_avatar': sender_avatar,
-                'message_id': chat_message.id,
-                'timestamp': chat_message.timestamp.isoformat(),
-                'attachment_url': chat_message.attachment.url if chat_message.attachment else None,
-                'attachment_type': attachment_type,
-                'attachment_name': attachment.name,
-                'attachment_size': f'{attachment.size / 1024:.1f} KB' if attachment.size < 1024*1024 else f'{attachment.size / (1024*1024):.1f} MB'
-            }
-        )
+        _broadcast_attachment(request.user, chat_message, attachment.name, format_attachment_size(attachment))
         
         return JsonResponse({
             'status': 'success',
@@ -260,4 +217,117 @@ def upload_file_view(request):
         })
         
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def _broadcast_attachment(user, chat_message, attachment_name, attachment_size):
+    """Send a new attachment message to everyone in its thread via WebSocket"""
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        f'chat_{chat_message.thread_id}',
+        {
+            'type': 'chat_message',
+            'message': chat_message.message,
+            'sender': user.username,
+            'sender_name': user.get_full_name() or user.username,
+            'sender_avatar': get_avatar_url(user),
+            'message_id': chat_message.id,
+            'timestamp': chat_message.timestamp.isoformat(),
+            'attachment_url': chat_message.attachment.url if chat_message.attachment else None,
+            'attachment_type': chat_message.attachment_type,
+            'attachment_name': attachment_name,
+            'attachment_size': attachment_size
+        }
+    )
+
+
+@login_required
+@require_POST
+def chunked_upload_start_view(request):
+    """Begin a resumable attachment upload; the file itself follows in chunks"""
+    thread_id = request.POST.get('thread_id')
+    if not thread_id:
+        return JsonResponse({'error': 'Missing required fields'}, status=400)
+    thread = get_object_or_404(Thread, pk=thread_id)
+    if request.user not in thread.participants.all():
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    try:
+        total_size = int(request.POST.get('total_size', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid file size'}, status=400)
+
+    try:
+        upload = start_upload(
+            request.user,
+            thread,
+            request.POST.get('filename'),
+            total_size,
+            message=request.POST.get('message', '')
+        )
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+
+    return JsonResponse({
+        'status': 'uploading',
+        'upload_id': str(upload.upload_id),
+        'offset': upload.offset,
+        'chunk_size': get_chunk_size()
+    }, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def chunked_upload_view(request, upload_id):
+    """
+    GET reports how many bytes of an upload have been received.
+    POST appends the raw request body at the byte offset in the X-Upload-Offset header.
+    """
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, user=request.user)
+    if request.method == 'GET':
+        return JsonResponse({
+            'status': upload.status,
+            'offset': upload.offset,
+            'total_size': upload.total_size,
+            'message_id': upload.chat_message_id
+        })
+
+    try:
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid upload offset'}, status=400)
+
+    try:
+        # The body is read straight off the request stream, never buffered whole
+        upload = append_chunk(upload, request, offset, length)
+    except UploadError as e:
+        current = ChunkedUpload.objects.filter(pk=upload.pk).values_list('offset', flat=True).first()
+        return JsonResponse({'error': str(e), 'offset': current}, status=e.status)
+
+    if not upload.is_complete:
+        return JsonResponse({'status': 'uploading', 'offset': upload.offset})
+
+    chat_message = upload.chat_message
+    _broadcast_attachment(
+        request.user,
+        chat_message,
+        upload.filename,
+        format_attachment_size(chat_message.attachment)
+    )
+    return JsonResponse({
+        'status': 'success',
+        'message_id': chat_message.id,
+        'attachment_url': chat_message.attachment.url
+    })
+
+@login_required
+@admin_required
+def typing_stats_api(request):
+    """Typing indicator counters for this worker process, for channel layer sizing"""
+    from .consumers import typing_stats
+    return JsonResponse({
+        'received': typing_stats['received'],
+        'broadcast': typing_stats['broadcast'],
+        'suppressed': typing_stats['suppressed'],
+        'expired': typing_stats['expired'],
+    })
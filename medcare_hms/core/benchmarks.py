@@ -0,0 +1,153 @@
+"""
+Query-count and latency regression benchmarks for the hot views.
+
+Not part of the regular test run (the file is not named tests.py); run it with
+
+    python manage.py test core.benchmarks
+
+It seeds a large dataset (core.seed, BENCHMARK_SCALE), requests each view in
+HOT_VIEWS once to warm caches and then BENCHMARK_REPEAT times, and compares
+the results with benchmark_baselines.json next to this file. A view regresses
+when its warm or cold query count goes up at all, or when its median wall time
+is more than BENCHMARK_LATENCY_TOLERANCE above the baseline (and at least
+BENCHMARK_LATENCY_FLOOR_MS slower, so jitter on fast views is ignored).
+
+Query counts are deterministic, and the committed baselines hold only those,
+so any extra query fails the run anywhere. Wall times depend on the machine:
+record them (along with fresh query counts) on the machine that checks them
+
+    UPDATE_BENCHMARK_BASELINES=1 python manage.py test core.benchmarks
+
+and keep them out of the commit. A baseline without 'ms' skips the latency
+check only; views with no baseline at all are reported but never fail.
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from doctors.models import DoctorAvailability
+from .seed import SEED_PASSWORD, seed_dataset
+
+BASELINES_PATH = Path(__file__).with_name('benchmark_baselines.json')
+
+# name -> (URL name, account from seed_dataset that requests it)
+HOT_VIEWS = {
+    'admin_dashboard': ('accounts:admin_dashboard', 'admin'),
+    'bill_list': ('billing:bill_list', 'receptionist'),
+    'thread_list': ('chat:thread_list', 'doctor'),
+    'appointment_list': ('receptionist:appointment_list', 'receptionist'),
+    'kpi_summary_api': ('reports:kpi_summary_api', 'admin'),
+    'doctor_availability_api': ('doctors:api_get_doctor_availability', 'patient'),
+}
+
+
+def measure(client, url, repeat, data=None):
+    """Request url once cold and repeat times warm; returns query counts and median wall time"""
+    with CaptureQueriesContext(connection) as cold:
+        response = client.get(url, data)
+    assert response.status_code == 200, f'{url} returned {response.status_code}'
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as warm:
+            start = time.perf_counter()
+            client.get(url, data)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'cold_queries': len(cold),
+        'queries': len(warm),
+        'ms': round(statistics.median(timings), 2),
+    }
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results, path=BASELINES_PATH):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def find_regressions(results, baselines, tolerance, floor_ms):
+    """Return a readable line for every metric that got worse than its baseline"""
+    regressions = []
+    for name, result in sorted(results.items()):
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for key in ('cold_queries', 'queries'):
+            if result[key] > baseline[key]:
+                regressions.append(f'{name}: {key} {baseline[key]} -> {result[key]}')
+        if 'ms' not in baseline:
+            continue
+        slower = result['ms'] - baseline['ms']
+        if result['ms'] > baseline['ms'] * (1 + tolerance) and slower >= floor_ms:
+            regressions.append(f"{name}: {baseline['ms']}ms -> {result['ms']}ms")
+    return regressions
+
+
+def format_report(results, baselines):
+    lines = [f"{'view':<26}{'cold q':>8}{'warm q':>8}{'median ms':>11}{'baseline ms':>13}"]
+    for name, result in sorted(results.items()):
+        baseline = baselines.get(name, {}).get('ms', '-')
+        lines.append(f"{name:<26}{result['cold_queries']:>8}{result['queries']:>8}{result['ms']:>11}{baseline:>13}")
+    return '\n'.join(lines)
+
+
+@tag('benchmark')
+class HotViewBenchmarks(TestCase):
+    """Query counts and wall time of the busiest pages against stored baselines"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(scale=getattr(settings, 'BENCHMARK_SCALE', 1))
+
+    def _params(self, name):
+        if name != 'doctor_availability_api':
+            return None
+        # The next day the busiest doctor works
+        doctor = self.data['doctor'].doctorprofile
+        working_days = set(DoctorAvailability.objects.filter(doctor=doctor).values_list('day_of_week', flat=True))
+        day = timezone.localdate() + timedelta(days=1)
+        while day.weekday() not in working_days:
+            day += timedelta(days=1)
+        return {'doctor_id': doctor.pk, 'date': day.isoformat()}
+
+    def test_hot_views_against_baselines(self):
+        repeat = getattr(settings, 'BENCHMARK_REPEAT', 5)
+        results = {}
+        for name, (url_name, account) in HOT_VIEWS.items():
+            cache.clear()
+            self.client.login(username=self.data[account].username, password=SEED_PASSWORD)
+            results[name] = measure(self.client, reverse(url_name), repeat, self._params(name))
+            self.client.logout()
+
+        baselines = load_baselines()
+        sys.stderr.write('\n' + format_report(results, baselines) + '\n')
+        if os.environ.get('UPDATE_BENCHMARK_BASELINES'):
+            save_baselines(results)
+            return
+        regressions = find_regressions(
+            results, baselines,
+            tolerance=getattr(settings, 'BENCHMARK_LATENCY_TOLERANCE', 0.5),
+            floor_ms=getattr(settings, 'BENCHMARK_LATENCY_FLOOR_MS', 5),
+        )
+        self.assertFalse(regressions, 'Performance regressions:\n' + '\n'.join(regressions))
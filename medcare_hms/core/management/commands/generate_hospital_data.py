@@ -0,0 +1,41 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.seed import BATCH_SIZE, SEED_PASSWORD, generate_hospital
+
+class Command(BaseCommand):
+    help = 'Fill the database with a deterministic synthetic hospital (doctors, patients, months of appointments, records, bills, chats) for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=6, help='Number of departments')
+        parser.add_argument('--doctors', type=int, default=40, help='Number of doctors')
+        parser.add_argument('--patients', type=int, default=2000, help='Number of patients')
+        parser.add_argument('--months', type=int, default=6, help='Months of appointment history up to today')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the generated users')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per bulk INSERT')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f"Users named '{prefix}_*' already exist; pass a different --prefix.")
+        if min(options['departments'], options['doctors'], options['patients'], options['months']) < 1:
+            raise CommandError('--departments, --doctors, --patients and --months must be at least 1.')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            result = generate_hospital(
+                departments=options['departments'], doctors=options['doctors'], patients=options['patients'],
+                months=options['months'], seed=options['seed'], prefix=prefix, batch_size=options['batch_size'],
+                log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        elapsed = time.perf_counter() - started
+
+        for model, count in sorted(result['counts'].items()):
+            self.stdout.write(f"  {model:<22}{count:>10}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated hospital data in {elapsed:.1f}s. Log in as {result['admin'].username}, "
+            f"{result['receptionist'].username}, {result['doctor'].username} or {result['patient'].username} "
+            f"with password '{SEED_PASSWORD}'."
+        ))
@@ -0,0 +1,417 @@
+"""
+Deterministic synthetic hospital data for load testing and benchmarks.
+
+generate_hospital() fills the database with departments, doctors and their
+weekly DoctorAvailability, patients, and months of appointment history with
+what follows from it: medical records, prescriptions with their medications,
+itemised bills, chat threads and notifications. The same arguments and seed
+always produce the same rows.
+
+Everything is written with bulk_create in batches. Appointments and the rows
+that hang off them are generated one week at a time, so memory use does not
+grow with the number of months. bulk_create sends no signals, so nothing is
+audited. Afterwards the derived data that signals normally maintain is rebuilt
+once: doctor slots, report rollups, the KPI snapshot and the admin dashboard
+cache.
+
+The distributions are loose but not uniform:
+- a few doctors are much busier than the rest
+- a minority of patients account for most visits
+- past appointments are mostly completed and their bills mostly paid
+- recent bills are more often still open
+
+Every generated user has the password SEED_PASSWORD.
+"""
+
+import random
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from billing.models import Bill, BillItem
+from chat.models import ChatMessage, Thread
+from doctors.models import DoctorAvailability, DoctorProfile
+from management.models import Department
+from notifications.models import Notification
+from patients.models import Appointment, MedicalRecord, PatientProfile
+from prescriptions.models import PrescribedMedication, Prescription
+from receptionist.models import ReceptionistProfile
+
+BATCH_SIZE = 1000
+SEED_PASSWORD = 'seed-password'
+
+# seed_dataset() sizes per unit of scale
+SCALE = {'departments': 6, 'doctors': 40, 'patients': 2000}
+SCALE_MONTHS = 3
+
+DEPARTMENTS = [
+    'General Medicine', 'Pediatrics', 'Obstetrics & Gynecology', 'Cardiology', 'Orthopedics', 'Dermatology',
+    'Neurology', 'Ophthalmology', 'ENT', 'Dentistry', 'Psychiatry', 'Oncology', 'Urology', 'Radiology',
+    'Physiotherapy', 'Emergency Medicine',
+]
+FIRST_NAMES = [
+    'Amina', 'Brian', 'Grace', 'David', 'Esther', 'Joseph', 'Ruth', 'Samuel', 'Mary', 'Peter', 'Sarah',
+    'Isaac', 'Florence', 'Moses', 'Harriet', 'Daniel', 'Joan', 'Emmanuel', 'Patience', 'Ivan',
+]
+LAST_NAMES = [
+    'Okello', 'Nakato', 'Mugisha', 'Achieng', 'Kato', 'Namubiru', 'Ssempala', 'Atim', 'Otieno', 'Byaruhanga',
+    'Nansubuga', 'Tumusiime', 'Akello', 'Wasswa', 'Nabirye', 'Opio', 'Kyomuhendo', 'Lubega',
+]
+REASONS = [
+    'Routine check-up', 'Follow-up visit', 'Fever and headache', 'Persistent cough', 'Back pain',
+    'Skin rash', 'Prenatal visit', 'Blood pressure review', 'Joint pain', 'Stomach ache', 'Vaccination',
+]
+DIAGNOSES = [
+    'Malaria', 'Upper respiratory tract infection', 'Hypertension', 'Type 2 diabetes', 'Gastritis',
+    'Urinary tract infection', 'Lower back strain', 'Allergic dermatitis', 'Migraine', 'Healthy, no findings',
+]
+MEDICATIONS = [
+    ('Paracetamol', '500 mg', 'Three times a day', 5),
+    ('Amoxicillin', '500 mg', 'Three times a day', 7),
+    ('Artemether/Lumefantrine', '80/480 mg', 'Twice a day', 3),
+    ('Metformin', '500 mg', 'Twice a day', 30),
+    ('Amlodipine', '5 mg', 'Once a day', 30),
+    ('Omeprazole', '20 mg', 'Once a day', 14),
+    ('Ibuprofen', '400 mg', 'Twice a day', 5),
+    ('Cetirizine', '10 mg', 'Once a day', 10),
+]
+CHARGES = [
+    ('Laboratory tests', 15000, 60000),
+    ('Medication', 5000, 80000),
+    ('Imaging', 50000, 250000),
+    ('Procedure', 40000, 400000),
+]
+PAYMENT_METHODS = ['Cash', 'MTN Mobile Money', 'Airtel Money', 'Card', 'Insurance']
+PAYMENT_WEIGHTS = [35, 30, 15, 10, 10]
+SHIFTS = [(time(8), time(12)), (time(13), time(17)), (time(8), time(14))]
+
+
+class _Generator:
+    def __init__(self, seed, prefix, batch_size, log):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.today = timezone.localdate()
+        self.password = make_password(SEED_PASSWORD)
+        self.counts = defaultdict(int)
+        self.visits = defaultdict(int)
+        self._midday = {}
+
+    def bulk(self, model, objects):
+        objects = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model._meta.model_name] += len(objects)
+        return objects
+
+    def at(self, day, hour=12):
+        key = (day, hour)
+        if key not in self._midday:
+            self._midday[key] = timezone.make_aware(datetime.combine(day, time(hour)))
+        return self._midday[key]
+
+    def backdate(self, model, field, values):
+        """Overwrite an auto_now(_add) field: one UPDATE per distinct value and batch of pks"""
+        by_value = defaultdict(list)
+        for pk, value in values:
+            by_value[value].append(pk)
+        for value, pks in by_value.items():
+            for start in range(0, len(pks), self.batch_size):
+                model.objects.filter(pk__in=pks[start:start + self.batch_size]).update(**{field: value})
+
+    def users(self, kind, count, role, joined_within_days):
+        rng = self.rng
+        users = self.bulk(User, [
+            User(username=f'{self.prefix}_{kind}{i}', password=self.password,
+                 email=f'{self.prefix}_{kind}{i}@example.com',
+                 first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                 # Skewed towards recent sign-ups
+                 date_joined=self.at(self.today - timedelta(days=int(joined_within_days * rng.random() ** 1.5))))
+            for i in range(count)
+        ])
+        self.bulk(UserProfile, [UserProfile(user=user, role=role) for user in users])
+        return users
+
+    # --- Staff, doctors and patients ---
+
+    def departments(self, count):
+        names = [DEPARTMENTS[i % len(DEPARTMENTS)] + (f' {i // len(DEPARTMENTS) + 1}' if i >= len(DEPARTMENTS) else '')
+                 for i in range(count)]
+        return [Department.objects.get_or_create(name=name)[0] for name in names]
+
+    def staff(self, departments):
+        admin = self.users('admin', 1, 'ADMIN', 1000)[0]
+        receptionists = self.users('reception', max(1, len(departments) // 2), 'RECEPTIONIST', 1000)
+        self.bulk(ReceptionistProfile, [
+            ReceptionistProfile(user=user, department=departments[i % len(departments)],
+                                shift=self.rng.choice(['Morning', 'Afternoon', 'Night']))
+            for i, user in enumerate(receptionists)
+        ])
+        return admin, receptionists[0]
+
+    def doctors(self, count, departments):
+        rng = self.rng
+        users = self.users('doctor', count, 'DOCTOR', 5 * 365)
+        # General Medicine and Pediatrics get more doctors than the specialties
+        weights = [3 if i < 2 else 1 for i in range(len(departments))]
+        doctors = []
+        for i, user in enumerate(users):
+            department = rng.choices(departments, weights=weights)[0]
+            doctors.append(DoctorProfile(
+                user=user, department=department, specialization=department.name,
+                license_number=f'{self.prefix.upper()}-{i:05d}', years_of_experience=rng.randint(1, 35),
+            ))
+        doctors = self.bulk(DoctorProfile, doctors)
+
+        windows = []
+        schedule = {}
+        for doctor in doctors:
+            days = sorted(rng.sample(range(6), rng.choice([3, 4, 5, 5, 6])))
+            for day in days:
+                shifts = [rng.choice(SHIFTS)] if rng.random() < 0.7 else SHIFTS[:2]
+                schedule[(doctor.pk, day)] = shifts
+                windows.extend(DoctorAvailability(doctor=doctor, day_of_week=day, start_time=start, end_time=end)
+                               for start, end in shifts)
+        self.bulk(DoctorAvailability, windows)
+        # Share of a doctor's slots that get booked: a few are much busier than the rest
+        load = {doctor.pk: 0.25 + 0.6 / (1 + rank) ** 0.5 for rank, doctor in enumerate(doctors)}
+        return doctors, schedule, load
+
+    def patients(self, count, history_days):
+        rng = self.rng
+        users = self.users('patient', count, 'PATIENT', history_days + 2 * 365)
+        patients = self.bulk(PatientProfile, [
+            PatientProfile(
+                user=user, gender=rng.choice(['Male', 'Female']),
+                date_of_birth=self.today - timedelta(days=int(365 * rng.triangular(0, 90, 30))),
+                blood_group=rng.choices(['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-'],
+                                        weights=[38, 28, 20, 5, 4, 3, 1, 1])[0],
+                insurance_provider=rng.choice([None, None, None, 'Jubilee', 'AAR', 'Prudential']),
+            )
+            for user in users
+        ])
+        # A minority of patients account for most visits
+        visit_weights = list(accumulate(rng.paretovariate(1.2) for _ in patients))
+        return patients, visit_weights
+
+    # --- One week of activity ---
+
+    def week(self, days, doctors, schedule, load, patients, visit_weights, threads_seen):
+        rng = self.rng
+        appointments = []
+        for day in days:
+            past = day < self.today
+            for doctor in doctors:
+                for window_start, window_end in schedule.get((doctor.pk, day.weekday()), ()):
+                    current = datetime.combine(day, window_start)
+                    while current.time() < window_end:
+                        if rng.random() < load[doctor.pk] * (0.6 if day.weekday() == 5 else 1):
+                            patient = rng.choices(patients, cum_weights=visit_weights)[0]
+                            self.visits[patient.pk] += 1
+                            if past:
+                                status = rng.choices(['Completed', 'Cancelled', 'Rejected', 'Approved'],
+                                                     weights=[82, 10, 4, 4])[0]
+                            else:
+                                status = rng.choices(['Approved', 'Pending', 'Cancelled'], weights=[60, 35, 5])[0]
+                            appointments.append(Appointment(
+                                patient=patient, doctor=doctor, appointment_date=day,
+                                appointment_time=current.time(), reason=rng.choice(REASONS), status=status,
+                                created_by=patient.user,
+                            ))
+                        current += timedelta(minutes=30)
+        if not appointments:
+            return
+        appointments = self.bulk(Appointment, appointments)
+        self.backdate(Appointment, 'created_at', [
+            (a.pk, self.at(min(a.appointment_date - timedelta(days=rng.randint(0, 14)), self.today), 9))
+            for a in appointments
+        ])
+        completed = [a for a in appointments if a.status == 'Completed']
+        self.records_and_prescriptions(completed)
+        self.bills(completed)
+        self.notifications(appointments)
+        self.chats(completed, threads_seen)
+
+    def records_and_prescriptions(self, completed):
+        rng = self.rng
+        records = self.bulk(MedicalRecord, [
+            MedicalRecord(patient=a.patient, doctor=a.doctor, appointment=a,
+                          diagnosis=rng.choice(DIAGNOSES), notes=f'Seen for: {a.reason}.')
+            for a in completed
+        ])
+        self.backdate(MedicalRecord, 'record_date', [(r.pk, r.appointment.appointment_date) for r in records])
+
+        prescriptions = []
+        for record in records:
+            if rng.random() < 0.65:
+                age = (self.today - record.appointment.appointment_date).days
+                status = 'ACTIVE' if age <= 30 else rng.choices(['COMPLETED', 'CANCELLED'], weights=[95, 5])[0]
+                prescriptions.append(Prescription(patient=record.patient, doctor=record.doctor,
+                                                  medical_record=record, status=status))
+        prescriptions = self.bulk(Prescription, prescriptions)
+        self.backdate(Prescription, 'created_at', [
+            (p.pk, self.at(p.medical_record.appointment.appointment_date)) for p in prescriptions
+        ])
+        self.bulk(PrescribedMedication, [
+            PrescribedMedication(prescription=prescription, medication_name=name, dosage=dosage,
+                                 frequency=frequency, duration_days=duration)
+            for prescription in prescriptions
+            for name, dosage, frequency, duration in rng.sample(MEDICATIONS, rng.choice([1, 1, 2, 2, 3]))
+        ])
+
+    def bills(self, completed):
+        rng = self.rng
+        bills = []
+        items = []
+        for appointment in completed:
+            if rng.random() > 0.95:
+                continue
+            bill_items = [BillItem(description='Consultation', quantity=1, unit_price=Decimal(30000))]
+            for description, low, high in CHARGES:
+                if rng.random() < 0.35:
+                    quantity = rng.randint(1, 3) if description == 'Medication' else 1
+                    bill_items.append(BillItem(description=description, quantity=quantity,
+                                               unit_price=Decimal(rng.randrange(low, high, 500))))
+            for item in bill_items:
+                item.amount = item.quantity * item.unit_price
+            total = sum(item.amount for item in bill_items)
+            age = (self.today - appointment.appointment_date).days
+            weights = [85, 8, 7] if age > 30 else [55, 15, 30]
+            status = rng.choices(['Paid', 'Partially Paid', 'Unpaid'], weights=weights)[0]
+            paid = {'Paid': total, 'Partially Paid': (total / 2).quantize(Decimal('0.01')), 'Unpaid': Decimal(0)}[status]
+            bills.append(Bill(
+                patient=appointment.patient, appointment=appointment, total_amount=total, amount_paid=paid,
+                status=status, due_date=appointment.appointment_date + timedelta(days=30),
+                payment_method=rng.choices(PAYMENT_METHODS, weights=PAYMENT_WEIGHTS)[0] if paid else None,
+            ))
+            items.append(bill_items)
+        bills = self.bulk(Bill, bills)
+        self.backdate(Bill, 'bill_date', [(b.pk, b.appointment.appointment_date) for b in bills])
+        self.backdate(Bill, 'created_at', [(b.pk, self.at(b.appointment.appointment_date)) for b in bills])
+        for bill, bill_items in zip(bills, items):
+            for item in bill_items:
+                item.bill = bill
+        self.bulk(BillItem, [item for bill_items in items for item in bill_items])
+
+    def notifications(self, appointments):
+        rng = self.rng
+        notifications = []
+        stamps = []
+        for a in appointments:
+            when = a.appointment_date - timedelta(days=rng.randint(0, 7))
+            if a.status == 'Pending':
+                recipient, message = a.doctor.user, f'New appointment request for {a.appointment_date:%b %d}.'
+            else:
+                recipient, message = a.patient.user, f'Your appointment on {a.appointment_date:%b %d} was {a.status.lower()}.'
+            notifications.append(Notification(recipient=recipient, message=message,
+                                              is_read=(self.today - when).days > 7 or rng.random() < 0.3))
+            stamps.append(self.at(min(when, self.today), 10))
+        notifications = self.bulk(Notification, notifications)
+        self.backdate(Notification, 'timestamp', [(n.pk, stamp) for n, stamp in zip(notifications, stamps)])
+
+    def chats(self, completed, threads_seen):
+        rng = self.rng
+        pairs = []
+        for a in completed:
+            pair = (a.patient.user_id, a.doctor.user_id)
+            if pair not in threads_seen and rng.random() < 0.3:
+                threads_seen.add(pair)
+                pairs.append((pair, a.appointment_date))
+        if not pairs:
+            return
+        threads = self.bulk(Thread, [Thread() for _ in pairs])
+        self.bulk(Thread.participants.through, [
+            Thread.participants.through(thread_id=thread.pk, user_id=user_id)
+            for thread, (pair, _) in zip(threads, pairs)
+            for user_id in pair
+        ])
+        messages = []
+        stamps = []
+        thread_dates = []
+        for thread, ((patient_id, doctor_id), day) in zip(threads, pairs):
+            count = min(1 + int(rng.expovariate(1 / 5)), 40)
+            last_day = min(day + timedelta(days=count // 4), self.today)
+            for i in range(count):
+                sent = min(day + timedelta(days=i // 4), self.today)
+                recent = (self.today - sent).days < 3
+                messages.append(ChatMessage(
+                    thread=thread, sender_id=patient_id if i % 2 == 0 else doctor_id,
+                    message=f'Message {i + 1} about the visit on {day:%b %d}.',
+                    is_read=not (recent and i >= count - 2),
+                ))
+                stamps.append(self.at(sent, 9 + i % 9))
+            thread_dates.append((thread.pk, self.at(day)))
+            thread_dates.append((thread.pk, self.at(last_day, 18)))
+        messages = self.bulk(ChatMessage, messages)
+        self.backdate(ChatMessage, 'timestamp', [(m.pk, stamp) for m, stamp in zip(messages, stamps)])
+        self.backdate(Thread, 'created', thread_dates[0::2])
+        self.backdate(Thread, 'updated', thread_dates[1::2])
+
+
+def _rebuild_derived(doctors):
+    from accounts.dashboard import SECTIONS, invalidate_section
+    from doctors.slots import rebuild_doctor_slots
+    from reports.models import KpiSnapshot
+    from reports.rollups import rebuild_rollups
+
+    for doctor in doctors:
+        rebuild_doctor_slots(doctor.pk)
+    rebuild_rollups()
+    KpiSnapshot.capture()
+    for section in SECTIONS:
+        invalidate_section(section)
+
+
+def generate_hospital(departments=6, doctors=40, patients=2000, months=6, seed=0, prefix='seed',
+                      batch_size=BATCH_SIZE, log=None):
+    """
+    Generate a hospital's worth of data; months of history end today, plus two weeks of bookings ahead.
+
+    Returns a dict with the admin, a receptionist, the doctor with the most chat
+    threads and the most frequent patient (all User objects), and 'counts',
+    the number of rows written per model.
+    """
+    generator = _Generator(seed, prefix, batch_size, log)
+    history_days = months * 30
+
+    department_rows = generator.departments(departments)
+    admin, receptionist = generator.staff(department_rows)
+    doctor_rows, schedule, load = generator.doctors(doctors, department_rows)
+    patient_rows, visit_weights = generator.patients(patients, history_days)
+    generator.log(f'{len(doctor_rows)} doctors and {len(patient_rows)} patients created')
+
+    threads_seen = set()
+    start = generator.today - timedelta(days=history_days)
+    end = generator.today + timedelta(days=14)
+    day = start
+    while day <= end:
+        days = [day + timedelta(days=offset) for offset in range(7) if day + timedelta(days=offset) <= end]
+        generator.week(days, doctor_rows, schedule, load, patient_rows, visit_weights, threads_seen)
+        generator.log(f'{days[0]} to {days[-1]}: {generator.counts["appointment"]} appointments so far')
+        day += timedelta(days=7)
+
+    _rebuild_derived(doctor_rows)
+
+    thread_counts = defaultdict(int)
+    for _, doctor_user_id in threads_seen:
+        thread_counts[doctor_user_id] += 1
+    busiest_doctor = max(doctor_rows, key=lambda d: (thread_counts[d.user_id], -d.pk))
+    busiest_patient = max(patient_rows, key=lambda p: (generator.visits[p.pk], -p.pk))
+    return {
+        'admin': admin,
+        'receptionist': receptionist,
+        'doctor': busiest_doctor.user,
+        'patient': busiest_patient.user,
+        'counts': dict(generator.counts),
+    }
+
+
+def seed_dataset(scale=1, seed=0):
+    """Benchmark dataset: SCALE rows per unit of scale and SCALE_MONTHS of history"""
+    sizes = {key: max(1, int(value * scale)) for key, value in SCALE.items()}
+    return generate_hospital(months=SCALE_MONTHS, seed=seed, **sizes)
@@ -1,3 +1,76 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from billing.models import Bill
+from patients.models import Appointment
+from .benchmarks import find_regressions
+from .seed import generate_hospital
+
+
+class BenchmarkComparisonTest(SimpleTestCase):
+    """Test suite for comparing benchmark results with their baselines"""
+
+    def setUp(self):
+        self.baselines = {'bill_list': {'cold_queries': 6, 'queries': 5, 'ms': 40.0}}
+
+    def test_extra_query_is_a_regression(self):
+        results = {'bill_list': {'cold_queries': 6, 'queries': 6, 'ms': 40.0}}
+        self.assertEqual(find_regressions(results, self.baselines, 0.5, 5), ['bill_list: queries 5 -> 6'])
+
+    def test_latency_within_tolerance_or_floor_passes(self):
+        results = {'bill_list': {'cold_queries': 6, 'queries': 5, 'ms': 59.0}}
+        self.assertEqual(find_regressions(results, self.baselines, 0.5, 5), [])
+        # Three times slower, but only 2ms in absolute terms
+        baselines = {'kpi_summary_api': {'cold_queries': 1, 'queries': 1, 'ms': 1.0}}
+        results = {'kpi_summary_api': {'cold_queries': 1, 'queries': 1, 'ms': 3.0}}
+        self.assertEqual(find_regressions(results, baselines, 0.5, 5), [])
+
+    def test_slow_view_is_a_regression(self):
+        results = {'bill_list': {'cold_queries': 6, 'queries': 5, 'ms': 75.0}}
+        self.assertEqual(find_regressions(results, self.baselines, 0.5, 5), ['bill_list: 40.0ms -> 75.0ms'])
+
+    def test_baseline_without_wall_time_checks_queries_only(self):
+        baselines = {'bill_list': {'cold_queries': 6, 'queries': 5}}
+        results = {'bill_list': {'cold_queries': 7, 'queries': 5, 'ms': 500.0}}
+        self.assertEqual(find_regressions(results, baselines, 0.5, 5), ['bill_list: cold_queries 6 -> 7'])
+
+    def test_views_without_baseline_are_skipped(self):
+        results = {'thread_list': {'cold_queries': 50, 'queries': 50, 'ms': 500.0}}
+        self.assertEqual(find_regressions(results, self.baselines, 0.5, 5), [])
+
+
+class HospitalDataGeneratorTest(TestCase):
+    """Test suite for the synthetic hospital data generator"""
+
+    def _signature(self, prefix):
+        appointments = Appointment.objects.filter(patient__user__username__startswith=f'{prefix}_').order_by('id')
+        return [
+            (a.doctor.user.username.split('_', 1)[1], a.patient.user.username.split('_', 1)[1],
+             a.appointment_date, a.appointment_time, a.status)
+            for a in appointments.select_related('doctor__user', 'patient__user')
+        ]
+
+    def test_same_seed_gives_same_data(self):
+        generate_hospital(departments=2, doctors=3, patients=20, months=1, seed=7, prefix='runa')
+        generate_hospital(departments=2, doctors=3, patients=20, months=1, seed=7, prefix='runb')
+        first = self._signature('runa')
+        self.assertTrue(first)
+        self.assertEqual(first, self._signature('runb'))
+
+    def test_generated_rows_are_consistent(self):
+        result = generate_hospital(departments=2, doctors=3, patients=20, months=1, seed=1, prefix='check')
+        # Only the generator's rows; the sample data migration seeds its own
+        generated = {'patient__user__username__startswith': 'check_'}
+        self.assertEqual(result['counts']['appointment'], Appointment.objects.filter(**generated).count())
+        for bill in Bill.objects.filter(**generated).prefetch_related('items'):
+            self.assertEqual(bill.total_amount, sum(item.amount for item in bill.items.all()))
+            self.assertEqual(bill.bill_date, bill.appointment.appointment_date)
+
+    def test_command_refuses_an_existing_prefix(self):
+        out = StringIO()
+        call_command('generate_hospital_data', '--doctors=2', '--patients=10', '--months=1', stdout=out)
+        self.assertIn("password 'seed-password'", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_hospital_data', '--doctors=2', '--patients=10', '--months=1', stdout=out)
@@ -1,6 +1,7 @@
 # doctors/admin.py
 from django.contrib import admin
-from .models import DoctorProfile, DoctorAvailability
+from .models import DoctorProfile, DoctorAvailability, DoctorSlot
 
 admin.site.register(DoctorProfile)
-admin.site.register(DoctorAvailability)
\ No newline at end of file
+admin.site.register(DoctorAvailability)
+admin.site.register(DoctorSlot)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from doctors.models import DoctorProfile, DoctorSlot
+from doctors.slots import rebuild_doctor_slots
+
+class Command(BaseCommand):
+    help = 'Rebuild every doctor\'s bookable slots for the rolling horizon; schedule it nightly via cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=7, help='Delete slots older than this many days')
+
+    def handle(self, *args, **options):
+        doctor_ids = list(DoctorProfile.objects.values_list('pk', flat=True))
+        for doctor_id in doctor_ids:
+            rebuild_doctor_slots(doctor_id)
+        cutoff = timezone.localdate() - timedelta(days=options['keep_days'])
+        pruned, _ = DoctorSlot.objects.filter(date__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt slots for {len(doctor_ids)} doctors; pruned {pruned} old slots."))
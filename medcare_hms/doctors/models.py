@@ -33,4 +33,26 @@ class DoctorAvailability(models.Model):
 
 
     def __str__(self):
-        return f"{self.doctor} - {self.get_day_of_week_display()} ({self.start_time.strftime('%H:%M')} - {self.end_time.strftime('%H:%M')})"
\ No newline at end of file
+        return f"{self.doctor} - {self.get_day_of_week_display()} ({self.start_time.strftime('%H:%M')} - {self.end_time.strftime('%H:%M')})"
+
+
+class DoctorSlot(models.Model):
+    """One bookable slot of a doctor's day, materialized from their availability.
+
+    Maintained by doctors.slots: availability edits rebuild a doctor's upcoming
+    slots and appointment changes flip is_booked on the slots they touch.
+    """
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='slots')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_booked = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date', 'start_time'], name='unique_doctor_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} - {self.date} {self.start_time.strftime('%H:%M')}"
@@ -0,0 +1,139 @@
+"""
+Weekly availability templates for doctors.
+
+A doctor's week is diffed against their stored DoctorAvailability rows in
+memory and the difference is written with one bulk DELETE and one bulk INSERT
+inside a single transaction, so any schedule change costs a fixed number of
+round trips. The doctor's materialized slots are rebuilt once at the end (see
+doctors.slots.defer_slot_rebuilds) rather than once per changed row.
+"""
+
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import DoctorAvailability
+from .slots import defer_slot_rebuilds, schedule_slot_rebuild
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _parse_time(value):
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except (TypeError, ValueError):
+            continue
+    raise ValidationError(f"Invalid time '{value}'; use HH:MM.")
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _overlaps(windows, start, end):
+    return any(start < other_end and end > other_start for other_start, other_end in windows)
+
+
+def parse_window(start, end):
+    """Parse and check one (start, end) pair of HH:MM strings"""
+    start, end = _parse_time(start), _parse_time(end)
+    if start >= end:
+        raise ValidationError("End time must be after start time.")
+    return start, end
+
+
+def parse_week(data):
+    """
+    Validate a week schedule of the form {day_of_week: [{"start": "09:00", "end": "12:00"}, ...]}.
+
+    Days are 0 (Monday) to 6 (Sunday); days left out have no availability.
+    Returns {day_of_week: [(start, end), ...]} with each day's windows sorted.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("The schedule must map days of the week to lists of time windows.")
+    week = {}
+    for day, windows in data.items():
+        try:
+            day_of_week = int(day)
+        except (TypeError, ValueError):
+            raise ValidationError(f"Invalid day '{day}'.")
+        if not 0 <= day_of_week <= 6:
+            raise ValidationError(f"Invalid day '{day}'.")
+        if not isinstance(windows, list):
+            raise ValidationError(f"{DAY_NAMES[day_of_week]}: windows must be a list.")
+        parsed = []
+        for window in windows:
+            if not isinstance(window, dict):
+                raise ValidationError(f"{DAY_NAMES[day_of_week]}: each window needs a start and an end.")
+            try:
+                start, end = parse_window(window.get('start'), window.get('end'))
+            except ValidationError as e:
+                raise ValidationError(f"{DAY_NAMES[day_of_week]}: {e.messages[0]}")
+            if _overlaps(parsed, start, end):
+                raise ValidationError(f"{DAY_NAMES[day_of_week]}: time windows overlap.")
+            parsed.append((start, end))
+        week[day_of_week] = sorted(parsed)
+    return week
+
+
+def summarize(windows):
+    """Totals for a list of (day_of_week, start_time, end_time) windows"""
+    total_minutes = sum(_minutes(end) - _minutes(start) for _, start, end in windows)
+    return {
+        'total_hours': round(total_minutes / 60, 1),
+        'available_days': len({day for day, _, _ in windows}),
+        'total_slots': len(windows),
+    }
+
+
+def _existing(doctor):
+    return list(DoctorAvailability.objects.filter(doctor=doctor).values_list(
+        'pk', 'day_of_week', 'start_time', 'end_time'
+    ))
+
+
+def _apply(doctor, delete_ids, create):
+    with transaction.atomic(), defer_slot_rebuilds():
+        if delete_ids:
+            DoctorAvailability.objects.filter(pk__in=delete_ids).delete()
+        DoctorAvailability.objects.bulk_create(
+            DoctorAvailability(doctor=doctor, day_of_week=day, start_time=start, end_time=end)
+            for day, start, end in create
+        )
+        # bulk_create sends no post_save, so queue the rebuild ourselves
+        schedule_slot_rebuild(doctor.pk)
+
+
+def apply_week_template(doctor, week):
+    """
+    Make the doctor's stored availability match a parsed week exactly.
+
+    Returns the number of windows created and deleted plus the summary of the
+    resulting week.
+    """
+    desired = {(day, start, end) for day, windows in week.items() for start, end in windows}
+    existing = _existing(doctor)
+    kept = {(day, start, end) for _, day, start, end in existing if (day, start, end) in desired}
+    delete_ids = [pk for pk, day, start, end in existing if (day, start, end) not in desired]
+    create = sorted(desired - kept)
+    _apply(doctor, delete_ids, create)
+    return {'created': len(create), 'deleted': len(delete_ids), 'summary': summarize(sorted(desired))}
+
+
+def add_window_to_days(doctor, days, start, end):
+    """
+    Add the same time window to several days, skipping days where it would overlap.
+
+    Returns the number of windows created.
+    """
+    by_day = {}
+    for _, day, window_start, window_end in _existing(doctor):
+        by_day.setdefault(day, []).append((window_start, window_end))
+    create = [
+        (day, start, end) for day in sorted(set(days))
+        if 0 <= day <= 6 and not _overlaps(by_day.get(day, []), start, end)
+    ]
+    _apply(doctor, [], create)
+    return len(create)
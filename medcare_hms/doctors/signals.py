@@ -0,0 +1,35 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from patients.models import Appointment
+from .models import DoctorAvailability
+from .slots import refresh_slot, schedule_slot_rebuild
+
+
+@receiver(post_save, sender=DoctorAvailability)
+@receiver(post_delete, sender=DoctorAvailability)
+def availability_changed(sender, instance, **kwargs):
+    schedule_slot_rebuild(instance.doctor_id)
+
+
+# The stored row is read in pre_save so post_save can release the slot it used to hold
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_slot(sender, instance, **kwargs):
+    instance._slot_previous = (
+        sender.objects.filter(pk=instance.pk).values('doctor_id', 'appointment_date', 'appointment_time').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_slot_previous', None)
+    current = (instance.doctor_id, instance.appointment_date, instance.appointment_time)
+    if previous and tuple(previous.values()) != current:
+        refresh_slot(previous['doctor_id'], previous['appointment_date'], previous['appointment_time'])
+    refresh_slot(*current)
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    refresh_slot(instance.doctor_id, instance.appointment_date, instance.appointment_time)
@@ -0,0 +1,214 @@
+"""
+Materialized bookable slots for doctors.
+
+A doctor's weekly DoctorAvailability windows are cut into slots of
+DOCTOR_SLOT_MINUTES and stored as DoctorSlot rows for the next
+DOCTOR_SLOT_HORIZON_DAYS days, so the booking pages read a day's free slots
+with one indexed query. Days outside the horizon are materialized the first
+time they are asked for.
+
+The rows are kept in step incrementally (see doctors.signals): editing a
+doctor's availability rebuilds their upcoming slots, and saving or deleting an
+appointment re-checks only the slots at its old and new times. Only
+Appointment.ACTIVE_STATUSES hold a slot. refresh_doctor_slots rebuilds every
+doctor's horizon, e.g. nightly or after changing the slot length.
+
+search_open_slots() answers "next free slot" questions across many doctors
+and days straight from DoctorAvailability and Appointment.
+"""
+
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from patients.models import Appointment
+from .models import DoctorAvailability, DoctorSlot
+
+
+def slot_duration():
+    return timedelta(minutes=getattr(settings, 'DOCTOR_SLOT_MINUTES', 30))
+
+
+def horizon_dates(start=None):
+    start = start or timezone.localdate()
+    return [start + timedelta(days=offset) for offset in range(getattr(settings, 'DOCTOR_SLOT_HORIZON_DAYS', 28))]
+
+
+def iter_window_slots(day, start_time, end_time, duration=None):
+    """Yield (start, end) times of each whole slot in one availability window"""
+    duration = duration or slot_duration()
+    current = datetime.combine(day, start_time)
+    window_end = datetime.combine(day, end_time)
+    while current + duration <= window_end:
+        yield current.time(), (current + duration).time()
+        current += duration
+
+
+def _booked_times(doctor_id, dates):
+    return set(
+        Appointment.objects.filter(
+            doctor_id=doctor_id, appointment_date__in=dates, status__in=Appointment.ACTIVE_STATUSES
+        ).values_list('appointment_date', 'appointment_time')
+    )
+
+
+def _build_slots(doctor_id, dates):
+    windows = {}
+    for day_of_week, start_time, end_time in DoctorAvailability.objects.filter(doctor_id=doctor_id).values_list(
+        'day_of_week', 'start_time', 'end_time'
+    ):
+        windows.setdefault(day_of_week, []).append((start_time, end_time))
+
+    dates = [day for day in dates if day.weekday() in windows]
+    if not dates:
+        return []
+    booked = {}
+    for day, time in _booked_times(doctor_id, dates):
+        booked.setdefault(day, []).append(time)
+
+    duration = slot_duration()
+    slots = {}
+    for day in dates:
+        for window_start, window_end in windows[day.weekday()]:
+            for start, end in iter_window_slots(day, window_start, window_end, duration):
+                slots[(day, start)] = DoctorSlot(
+                    doctor_id=doctor_id, date=day, start_time=start, end_time=end,
+                    is_booked=any(start <= time < end for time in booked.get(day, ())),
+                )
+    return list(slots.values())
+
+
+def materialize_days(doctor_id, dates):
+    """Replace the stored slots of one doctor on the given dates"""
+    with transaction.atomic():
+        DoctorSlot.objects.filter(doctor_id=doctor_id, date__in=dates).delete()
+        DoctorSlot.objects.bulk_create(_build_slots(doctor_id, dates))
+
+
+def rebuild_doctor_slots(doctor_id):
+    """Drop a doctor's upcoming slots and materialize the rolling horizon again"""
+    dates = horizon_dates()
+    with transaction.atomic():
+        DoctorSlot.objects.filter(doctor_id=doctor_id, date__gte=dates[0]).delete()
+        DoctorSlot.objects.bulk_create(_build_slots(doctor_id, dates))
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def defer_slot_rebuilds():
+    """Collect availability-driven rebuilds and run each doctor's once on exit"""
+    if getattr(_deferred, 'doctor_ids', None) is not None:
+        yield
+        return
+    _deferred.doctor_ids = set()
+    try:
+        yield
+        doctor_ids = _deferred.doctor_ids
+    finally:
+        _deferred.doctor_ids = None
+    for doctor_id in doctor_ids:
+        rebuild_doctor_slots(doctor_id)
+
+
+def schedule_slot_rebuild(doctor_id):
+    doctor_ids = getattr(_deferred, 'doctor_ids', None)
+    if doctor_ids is None:
+        rebuild_doctor_slots(doctor_id)
+    else:
+        doctor_ids.add(doctor_id)
+
+
+def refresh_slot(doctor_id, day, time):
+    """Re-check whether the slot containing an appointment time is still taken"""
+    for slot in DoctorSlot.objects.filter(doctor_id=doctor_id, date=day, start_time__lte=time, end_time__gt=time):
+        is_booked = Appointment.objects.filter(
+            doctor_id=doctor_id, appointment_date=day, status__in=Appointment.ACTIVE_STATUSES,
+            appointment_time__gte=slot.start_time, appointment_time__lt=slot.end_time,
+        ).exists()
+        if is_booked != slot.is_booked:
+            DoctorSlot.objects.filter(pk=slot.pk).update(is_booked=is_booked)
+
+
+def get_free_slots(doctor_id, day):
+    """Start times of the doctor's unbooked slots on a day, in order"""
+    slots = list(DoctorSlot.objects.filter(doctor_id=doctor_id, date=day).values_list('start_time', 'is_booked'))
+    if not slots:
+        # Nothing stored yet: outside the horizon, or no availability that
+        # weekday. Only a working day is worth materializing; the rest stay a
+        # cheap miss instead of an empty rebuild on every call.
+        if not DoctorAvailability.objects.filter(doctor_id=doctor_id, day_of_week=day.weekday()).exists():
+            return []
+        materialize_days(doctor_id, [day])
+        slots = list(DoctorSlot.objects.filter(doctor_id=doctor_id, date=day).values_list('start_time', 'is_booked'))
+    return [start for start, is_booked in slots if not is_booked]
+
+
+def search_open_slots(doctors, start_date, end_date, limit):
+    """
+    Earliest open slots across several doctors, computed in bulk.
+
+    Reads every matching doctor's availability in one query and their active
+    appointments in the date range in another, then walks the days in order,
+    so the cost does not grow with the number of doctors or days searched.
+    Slots that have already started today are skipped. Returns up to limit
+    dicts with doctor_id, doctor_name, specialization, date, start_time and
+    end_time, ordered by date and time.
+    """
+    windows = {}
+    doctor_info = {}
+    rows = DoctorAvailability.objects.filter(doctor__in=doctors).values_list(
+        'doctor_id', 'doctor__user__first_name', 'doctor__user__last_name', 'doctor__specialization',
+        'day_of_week', 'start_time', 'end_time',
+    )
+    for doctor_id, first_name, last_name, specialization, day_of_week, start_time, end_time in rows:
+        doctor_info[doctor_id] = (f"Dr. {first_name} {last_name}".strip(), specialization)
+        windows.setdefault(day_of_week, []).append((doctor_id, start_time, end_time))
+    if not windows:
+        return []
+
+    booked = {}
+    appointments = Appointment.objects.filter(
+        doctor_id__in=doctor_info, appointment_date__range=(start_date, end_date),
+        status__in=Appointment.ACTIVE_STATUSES,
+    ).values_list('doctor_id', 'appointment_date', 'appointment_time')
+    for doctor_id, day, time in appointments:
+        booked.setdefault((doctor_id, day), []).append(time)
+    for times in booked.values():
+        times.sort()
+
+    now = timezone.localtime()
+    duration = slot_duration()
+    results = []
+    day = start_date
+    while day <= end_date and len(results) < limit:
+        candidates = []
+        for doctor_id, window_start, window_end in windows.get(day.weekday(), ()):
+            taken = booked.get((doctor_id, day), [])
+            for start, end in iter_window_slots(day, window_start, window_end, duration):
+                if day == now.date() and start <= now.time():
+                    continue
+                # Booked when an appointment starts inside [start, end)
+                index = bisect_left(taken, start)
+                if index < len(taken) and taken[index] < end:
+                    continue
+                candidates.append((start, doctor_id, end))
+        candidates.sort()
+        for start, doctor_id, end in candidates[:limit - len(results)]:
+            name, specialization = doctor_info[doctor_id]
+            results.append({
+                'doctor_id': doctor_id,
+                'doctor_name': name,
+                'specialization': specialization,
+                'date': day,
+                'start_time': start,
+                'end_time': end,
+            })
+        day += timedelta(days=1)
+    return results
@@ -113,4 +113,209 @@ class DoctorFormsTest(TestCase):
         form = DoctorProfileForm(data=form_data, instance=doctor_profile)
         self.assertFalse(form.is_valid())
         self.assertIn('last_name', form.errors)
-        self.assertIn('specialization', form.errors)
\ No newline at end of file
+        self.assertIn('specialization', form.errors)
+
+class DoctorSlotEngineTest(TestCase):
+    """Tests for the materialized slot table behind the availability API"""
+
+    def setUp(self):
+        from datetime import date, time, timedelta
+        from patients.models import PatientProfile
+        from .models import DoctorAvailability
+        self.doctor_user = create_user_with_role('slot_doc', 'password', 'DOCTOR')
+        self.doctor = DoctorProfile.objects.create(user=self.doctor_user, specialization='Cardiology')
+        patient_user = create_user_with_role('slot_pat', 'password', 'PATIENT')
+        self.patient = PatientProfile.objects.create(user=patient_user)
+        self.day = date.today() + timedelta(days=1)
+        DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=self.day.weekday(), start_time=time(9, 0), end_time=time(11, 0)
+        )
+
+    def free_slots(self):
+        self.client.login(username='slot_pat', password='password')
+        response = self.client.get(
+            reverse('doctors:api_get_doctor_availability'),
+            {'doctor_id': self.doctor.pk, 'date': self.day.isoformat()}
+        )
+        return [slot['value'] for slot in response.json()['available_slots']]
+
+    def book(self, hour, minute=0, status='Pending'):
+        from datetime import time
+        from patients.models import Appointment
+        return Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day,
+            appointment_time=time(hour, minute), reason='Checkup', status=status
+        )
+
+    def test_availability_edits_materialize_slots(self):
+        """Saving availability stores the horizon's slots up front."""
+        from .models import DoctorSlot
+        self.assertEqual(DoctorSlot.objects.filter(doctor=self.doctor, date=self.day).count(), 4)
+        self.assertEqual(self.free_slots(), ['09:00:00', '09:30:00', '10:00:00', '10:30:00'])
+
+    def test_appointment_changes_update_slots_incrementally(self):
+        """Booking takes a slot; cancelling or rescheduling releases it."""
+        from datetime import time
+        appointment = self.book(9, 30)
+        self.assertNotIn('09:30:00', self.free_slots())
+
+        appointment.appointment_time = time(10, 0)
+        appointment.save()
+        self.assertIn('09:30:00', self.free_slots())
+        self.assertNotIn('10:00:00', self.free_slots())
+
+        appointment.status = 'Cancelled'
+        appointment.save()
+        self.assertIn('10:00:00', self.free_slots())
+
+    def test_rejected_appointments_do_not_hold_slots(self):
+        """Only active statuses count as booked when slots are built."""
+        from .slots import rebuild_doctor_slots
+        self.book(9, status='Rejected')
+        rebuild_doctor_slots(self.doctor.pk)
+        self.assertIn('09:00:00', self.free_slots())
+
+    def test_free_slots_are_an_indexed_lookup(self):
+        """A materialized day is read with a single query."""
+        from .slots import get_free_slots
+        with self.assertNumQueries(1):
+            self.assertEqual(len(get_free_slots(self.doctor.pk, self.day)), 4)
+
+    def test_days_off_are_not_rebuilt(self):
+        """A day with no availability is answered without writing anything."""
+        from datetime import timedelta
+        from .slots import get_free_slots
+        with self.assertNumQueries(2):
+            self.assertEqual(get_free_slots(self.doctor.pk, self.day + timedelta(days=1)), [])
+
+    def test_schedule_bulk_writes_rebuild_slots(self):
+        """Windows added or removed through the bulk helpers show up as free slots."""
+        from datetime import time
+        from .schedule import add_window_to_days, apply_week_template
+        add_window_to_days(self.doctor, [self.day.weekday()], time(14, 0), time(15, 0))
+        self.assertEqual(self.free_slots(), ['09:00:00', '09:30:00', '10:00:00', '10:30:00', '14:00:00', '14:30:00'])
+
+        apply_week_template(self.doctor, {self.day.weekday(): [(time(14, 0), time(15, 0))]})
+        self.assertEqual(self.free_slots(), ['14:00:00', '14:30:00'])
+
+
+class AvailabilitySearchTest(TestCase):
+    """Tests for the multi-doctor availability search"""
+
+    def setUp(self):
+        from datetime import date, time, timedelta
+        from patients.models import PatientProfile, Appointment
+        from .models import DoctorAvailability
+        self.day = date.today() + timedelta(days=1)
+        self.doctors = []
+        for i, start in enumerate((time(10, 0), time(9, 0))):
+            user = create_user_with_role(f'cardio{i}', 'password', 'DOCTOR')
+            doctor = DoctorProfile.objects.create(user=user, specialization='Cardiology')
+            DoctorAvailability.objects.create(
+                doctor=doctor, day_of_week=self.day.weekday(), start_time=start, end_time=time(11, 0)
+            )
+            self.doctors.append(doctor)
+        other = DoctorProfile.objects.create(
+            user=create_user_with_role('derm', 'password', 'DOCTOR'), specialization='Dermatology'
+        )
+        DoctorAvailability.objects.create(
+            doctor=other, day_of_week=self.day.weekday(), start_time=time(8, 0), end_time=time(9, 0)
+        )
+        patient = PatientProfile.objects.create(user=create_user_with_role('searcher', 'password', 'PATIENT'))
+        Appointment.objects.create(
+            patient=patient, doctor=self.doctors[1], appointment_date=self.day,
+            appointment_time=time(9, 0), reason='Checkup'
+        )
+        self.client.login(username='searcher', password='password')
+
+    def test_search_returns_earliest_slots_across_doctors(self):
+        """Open slots from every matching doctor come back in time order."""
+        from .slots import search_open_slots
+        with self.assertNumQueries(2):
+            slots = search_open_slots(
+                DoctorProfile.objects.filter(specialization='Cardiology'), self.day, self.day, 3
+            )
+        self.assertEqual(
+            [(slot['doctor_id'], slot['start_time'].strftime('%H:%M')) for slot in slots],
+            [(self.doctors[1].pk, '09:30'), (self.doctors[0].pk, '10:00'), (self.doctors[1].pk, '10:00')]
+        )
+
+    def test_search_api_filters_by_specialization(self):
+        """The endpoint only returns doctors of the requested specialization."""
+        response = self.client.get(reverse('doctors:api_search_availability'), {
+            'specialization': 'cardiology', 'start': self.day.isoformat(), 'end': self.day.isoformat(), 'limit': 50,
+        })
+        self.assertEqual(response.status_code, 200)
+        doctor_ids = {slot['doctor_id'] for slot in response.json()['available_slots']}
+        self.assertEqual(doctor_ids, {doctor.pk for doctor in self.doctors})
+
+    def test_search_api_requires_a_filter(self):
+        response = self.client.get(reverse('doctors:api_search_availability'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_api_rejects_bad_department_and_long_ranges(self):
+        from datetime import timedelta
+        url = reverse('doctors:api_search_availability')
+        self.assertEqual(self.client.get(url, {'department_id': 'abc'}).status_code, 400)
+        start = self.day.isoformat()
+        response = self.client.get(url, {
+            'specialization': 'cardiology', 'start': start, 'end': (self.day + timedelta(days=31)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {
+            'specialization': 'cardiology', 'start': start, 'end': (self.day + timedelta(days=30)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+
+
+class WeeklyAvailabilityTemplateTest(TestCase):
+    """Tests for diffing and applying a whole week of availability"""
+
+    def setUp(self):
+        from datetime import time
+        from .models import DoctorAvailability
+        self.doctor_user = create_user_with_role('week_doc', 'password', 'DOCTOR')
+        self.doctor = DoctorProfile.objects.create(user=self.doctor_user, specialization='Neurology')
+        self.kept = DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=0, start_time=time(9, 0), end_time=time(12, 0)
+        )
+        DoctorAvailability.objects.create(doctor=self.doctor, day_of_week=2, start_time=time(14, 0), end_time=time(16, 0))
+        self.client.login(username='week_doc', password='password')
+
+    def post_week(self, schedule):
+        import json
+        return self.client.post(
+            reverse('doctors:api_weekly_availability'),
+            data=json.dumps({'schedule': schedule}), content_type='application/json'
+        )
+
+    def test_week_is_diffed_against_stored_windows(self):
+        """Unchanged windows are kept; only the difference is written."""
+        from .models import DoctorAvailability
+        response = self.post_week({
+            '0': [{'start': '09:00', 'end': '12:00'}],
+            '4': [{'start': '08:00', 'end': '10:30'}, {'start': '13:00', 'end': '15:00'}],
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['deleted']), (2, 1))
+        self.assertEqual(data['summary'], {'total_hours': 7.5, 'available_days': 2, 'total_slots': 3})
+        self.assertTrue(DoctorAvailability.objects.filter(pk=self.kept.pk).exists())
+        self.assertFalse(DoctorAvailability.objects.filter(doctor=self.doctor, day_of_week=2).exists())
+
+    def test_overlapping_windows_are_rejected(self):
+        from .models import DoctorAvailability
+        response = self.post_week({'1': [{'start': '09:00', 'end': '11:00'}, {'start': '10:00', 'end': '12:00'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DoctorAvailability.objects.filter(doctor=self.doctor).count(), 2)
+
+    def test_bulk_create_skips_overlapping_days(self):
+        """The bulk form adds the window to free days only, in one transaction."""
+        from .models import DoctorAvailability
+        self.client.post(reverse('doctors:bulk_create_availability'), {
+            'days': ['0', '1', '3'], 'start_time': '10:00', 'end_time': '11:00',
+        })
+        self.assertEqual(
+            sorted(DoctorAvailability.objects.filter(doctor=self.doctor).values_list('day_of_week', flat=True)),
+            [0, 1, 2, 3]
+        )
@@ -21,8 +21,10 @@ urlpatterns = [
     # Availability Management URLs
     path('availability/', views.manage_availability_view, name='manage_availability'),
     path('api/get-availability/', views.get_doctor_availability_api, name='api_get_doctor_availability'),
+    path('api/search-availability/', views.search_availability_api, name='api_search_availability'),
     path('availability/<int:pk>/edit/', views.edit_availability_view, name='edit_availability'),
     path('availability/<int:pk>/delete/', views.delete_availability_view, name='delete_availability'),
     path('availability/clear-all/', views.clear_all_availability_view, name='clear_all_availability'),
     path('availability/bulk-create/', views.bulk_create_availability_view, name='bulk_create_availability'),
+    path('api/weekly-availability/', views.weekly_availability_api, name='api_weekly_availability'),
 ]
\ No newline at end of file
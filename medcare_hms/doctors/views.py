@@ -5,15 +5,21 @@ from accounts.decorators import doctor_required
 from .models import DoctorProfile
 from .forms import DoctorProfileForm
 from patients.models import Appointment, MedicalRecord
+from patients.booking import SlotUnavailable, book_appointment
 from prescriptions.models import Prescription  # linkage for existing prescriptions
 from patients.forms import MedicalRecordForm
 from django.urls import reverse
+from django.utils import timezone
 from notifications.utils import create_notification
 from .forms import DoctorAvailabilityForm
 from .models import DoctorAvailability
+from .slots import get_free_slots, search_open_slots
+from .schedule import DAY_NAMES, add_window_to_days, apply_week_template, parse_week, parse_window, summarize
 from django.core.exceptions import ValidationError
 from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
 from datetime import datetime, timedelta
+import json
 from django.db import IntegrityError
 
 
@@ -121,7 +127,12 @@ def update_appointment_status_view(request, pk, status):
     
     # Update status and provide feedback
     appointment.status = status
-    appointment.save()
+    try:
+        # Reactivating a rejected or cancelled appointment re-claims its slot
+        book_appointment(appointment)
+    except SlotUnavailable as conflict:
+        messages.error(request, f"{conflict} The appointment status was not changed.")
+        return redirect('doctors:doctor_appointments')
     # --- NOTIFICATION LOGIC ---
     patient_user = appointment.patient.user
     message = f"Your appointment with Dr. {request.user.get_full_name()} on {appointment.appointment_date} has been {status.lower()}."
@@ -256,31 +267,18 @@ def manage_availability_view(request):
     slots = DoctorAvailability.objects.filter(doctor=doctor_profile).order_by('day_of_week', 'start_time')
     
     # Calculate statistics for the new template
-    total_hours = 0
-    available_days = set()
-    days_of_week = {}
-    
-    for slot in slots:
-        # Calculate duration in hours using datetime.combine to handle time objects
-        from datetime import date
-        start_datetime = datetime.combine(date.today(), slot.start_time)
-        end_datetime = datetime.combine(date.today(), slot.end_time)
-        duration = (end_datetime - start_datetime).total_seconds() / 3600
-        total_hours += duration
-        available_days.add(slot.day_of_week)
+    summary = summarize([(slot.day_of_week, slot.start_time, slot.end_time) for slot in slots])
     
     # Include all days of the week, even if no slots
-    day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    for i, day_name in enumerate(day_names):
-        days_of_week[i] = day_name
+    days_of_week = dict(enumerate(DAY_NAMES))
     
     context = {
         'form': form, 
         'slots': slots,
-        'total_hours': round(total_hours, 1),
-        'available_days': len(available_days),
+        'total_hours': summary['total_hours'],
+        'available_days': summary['available_days'],
         'days_of_week': days_of_week,
-        'total_slots': len(slots)
+        'total_slots': summary['total_slots']
     }
     return render(request, 'doctors/manage_availability.html', context)
 
@@ -302,34 +300,56 @@ def get_doctor_availability_api(request):
     except (ValueError, DoctorProfile.DoesNotExist):
         return JsonResponse({'error': 'Invalid doctor ID or date format'}, status=400)
 
-    day_of_week = selected_date.weekday()
-    
-    # Get the doctor's general availability for that day
-    availability_slots = DoctorAvailability.objects.filter(doctor=doctor, day_of_week=day_of_week)
-    
-    # Get all appointments already booked for this doctor on this day
-    booked_appointments = Appointment.objects.filter(doctor=doctor, appointment_date=selected_date)
-    booked_times = [appt.appointment_time for appt in booked_appointments]
-
-    available_time_slots = []
-    appointment_duration = timedelta(minutes=30)
-
-    for slot in availability_slots:
-        current_time = datetime.combine(selected_date, slot.start_time)
-        end_time = datetime.combine(selected_date, slot.end_time)
-        
-        while current_time + appointment_duration <= end_time:
-            time_slot = current_time.time()
-            # Check if this specific time slot is NOT already booked
-            if time_slot not in booked_times:
-                available_time_slots.append({
-                    'value': time_slot.strftime('%H:%M:%S'), # Use H:M:S for consistency
-                    'display': time_slot.strftime('%I:%M %p')
-                })
-            current_time += appointment_duration
+    available_time_slots = [
+        {
+            'value': time_slot.strftime('%H:%M:%S'), # Use H:M:S for consistency
+            'display': time_slot.strftime('%I:%M %p')
+        }
+        for time_slot in get_free_slots(doctor.pk, selected_date)
+    ]
     
     return JsonResponse({'available_slots': available_time_slots})
 
+@login_required
+def search_availability_api(request):
+    """Earliest open slots across all doctors of a department or specialization"""
+    department_id = request.GET.get('department_id')
+    specialization = request.GET.get('specialization')
+    if not department_id and not specialization:
+        return JsonResponse({'error': 'Missing department or specialization'}, status=400)
+
+    start_str = request.GET.get('start')
+    end_str = request.GET.get('end')
+    try:
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else timezone.localdate()
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date + timedelta(days=6)
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 100)
+        department_id = int(department_id) if department_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date format, limit or department'}, status=400)
+    # Both ends are included, so 30 days apart is the longest 31-day range
+    if end_date < start_date or (end_date - start_date).days >= 31:
+        return JsonResponse({'error': 'Date range must run forwards and span at most 31 days'}, status=400)
+
+    doctors = DoctorProfile.objects.filter(user__is_active=True)
+    if department_id:
+        doctors = doctors.filter(department_id=department_id)
+    if specialization:
+        doctors = doctors.filter(specialization__iexact=specialization)
+
+    slots = [
+        {
+            'doctor_id': slot['doctor_id'],
+            'doctor_name': slot['doctor_name'],
+            'specialization': slot['specialization'],
+            'date': slot['date'].isoformat(),
+            'value': slot['start_time'].strftime('%H:%M:%S'),
+            'display': slot['start_time'].strftime('%I:%M %p'),
+        }
+        for slot in search_open_slots(doctors, start_date, end_date, limit)
+    ]
+    return JsonResponse({'available_slots': slots})
+
 # --- VIEW for editing a slot ---
 @login_required
 @doctor_required
@@ -401,31 +421,49 @@ def bulk_create_availability_view(request):
             messages.error(request, "Please select days and set both start and end times.")
             return redirect('doctors:manage_availability')
         
-        created_count = 0
-        for day in selected_days:
-            try:
-                day_int = int(day)
-                # Check for overlapping slots
-                overlapping = DoctorAvailability.objects.filter(
-                    doctor=doctor_profile, 
-                    day_of_week=day_int,
-                    start_time__lt=end_time, 
-                    end_time__gt=start_time
-                )
-                if not overlapping.exists():
-                    DoctorAvailability.objects.create(
-                        doctor=doctor_profile,
-                        day_of_week=day_int,
-                        start_time=start_time,
-                        end_time=end_time
-                    )
-                    created_count += 1
-            except (ValueError, IntegrityError):
-                continue
+        try:
+            days = [int(day) for day in selected_days]
+            start, end = parse_window(start_time, end_time)
+        except (ValueError, ValidationError):
+            messages.error(request, "Please choose valid days and a start time before the end time.")
+            return redirect('doctors:manage_availability')
+
+        created_count = add_window_to_days(doctor_profile, days, start, end)
         
         if created_count > 0:
             messages.success(request, f"Successfully created {created_count} time slots.")
         else:
             messages.warning(request, "No new time slots were created. They may conflict with existing slots.")
     
-    return redirect('doctors:manage_availability')
\ No newline at end of file
+    return redirect('doctors:manage_availability')
+
+
+@login_required
+@doctor_required
+@require_http_methods(['GET', 'POST'])
+def weekly_availability_api(request):
+    """
+    GET the doctor's week as a template, or POST a whole week to replace it.
+
+    Body: {"schedule": {"0": [{"start": "09:00", "end": "12:00"}], ...}}, days 0 (Monday) to 6.
+    """
+    doctor_profile = get_object_or_404(DoctorProfile, user=request.user)
+
+    if request.method == 'GET':
+        windows = list(DoctorAvailability.objects.filter(doctor=doctor_profile).order_by(
+            'day_of_week', 'start_time'
+        ).values_list('day_of_week', 'start_time', 'end_time'))
+        schedule = {}
+        for day, start, end in windows:
+            schedule.setdefault(str(day), []).append({'start': start.strftime('%H:%M'), 'end': end.strftime('%H:%M')})
+        return JsonResponse({'schedule': schedule, 'summary': summarize(windows)})
+
+    try:
+        payload = json.loads(request.body or b'{}')
+        week = parse_week(payload.get('schedule'))
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': e.messages[0]}, status=400)
+
+    return JsonResponse(apply_week_template(doctor_profile, week))
@@ -78,15 +78,101 @@ else:
         },
     }
 
+# Cache: role version tokens (accounts.roles) and cache invalidations have to be
+# seen by every worker, so anything running more than one process needs a shared
+# cache. Use the same Redis as the channel layer whenever that is on; the
+# per-process memory cache is only fit for a single development server.
+if DEBUG and not USE_REDIS_CHANNEL_LAYER:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://127.0.0.1:6379/1",
+        }
+    }
+
+# Chat presence: live online state is kept in the channel layer's store (see chat.presence);
+# UserPresence rows are only written in batches, at most once per flush interval.
+CHAT_PRESENCE_FLUSH_INTERVAL = 60  # seconds
+CHAT_PRESENCE_TTL = 6 * 60 * 60  # seconds before a crashed worker's connections expire (Redis only)
+
+# Chat typing indicators: ChatConsumer only broadcasts start/stop transitions,
+# at most one start per interval per (user, thread), and ends a typing state
+# on its own after the timeout. Counters are served by chat:typing_stats.
+CHAT_TYPING_MIN_INTERVAL = 2.0  # seconds
+CHAT_TYPING_TIMEOUT = 5.0  # seconds
+
+# Chat attachments: large files go through the resumable chunked upload endpoints
+# (see chat.uploads), staged under CHAT_UPLOAD_TEMP_DIR until the last chunk arrives.
+# Image attachments get a thumbnail on a background pool (see chat.thumbnails).
+CHAT_UPLOAD_TEMP_DIR = BASE_DIR / 'tmp' / 'chat_uploads'
+CHAT_UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes per chunk suggested to clients
+CHAT_UPLOAD_MAX_SIZE = 200 * 1024 * 1024  # bytes
+CHAT_UPLOAD_EXPIRY = 24 * 60 * 60  # seconds before an idle upload is purged
+CHAT_THUMBNAIL_SIZE = (320, 320)
+CHAT_THUMBNAIL_WORKERS = 2
+CHAT_THUMBNAIL_ASYNC = True
+
+# Reports KPIs: kpi_summary_api serves the latest KpiSnapshot and recomputes it
+# when it is older than this, in case refresh_kpi_snapshot has stopped running.
+KPI_SNAPSHOT_MAX_AGE = 15 * 60  # seconds; None serves the latest snapshot however old
+
+# Admin dashboard: each stats section is cached this long, and dropped early
+# when one of its models is saved or deleted (see accounts.dashboard).
+ADMIN_DASHBOARD_CACHE_TTL = 60  # seconds
+
+# Avatar URLs are cached per user and dropped when one of their profiles is
+# saved or deleted (see accounts.avatars).
+AVATAR_CACHE_TTL = 60 * 60  # seconds
+
+# Doctor slots: availability is cut into DoctorSlot rows of this length for a
+# rolling horizon (see doctors.slots). Run refresh_doctor_slots after changing it.
+DOCTOR_SLOT_MINUTES = 30
+DOCTOR_SLOT_HORIZON_DAYS = 28
+
+# Audit log: entries are buffered per request and written with one bulk INSERT
+# when the response is ready (see audit.buffer). Set AUDIT_LOG_ASYNC to hand the
+# batch to a background thread instead.
+AUDIT_LOG_ASYNC = False
+
+# Models whose creates, updates and deletes are audited, as
+# {'app_label.Model': [field names] or None for all fields}. Defaults to
+# audit.registry.DEFAULT_TRACKED_MODELS.
+# AUDIT_TRACKED_MODELS = {'billing.Bill': ['status', 'amount_paid', 'payment_method']}
+
+# purge_audit_logs --archive moves old logs into gzip NDJSON segments here, one
+# per day per batch, indexed by manifest.json (see audit.archive).
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'audit_archive'
+
+# Request tracing: CorrelationIdMiddleware times every request and its queries,
+# and saves a RequestTrace for requests over either threshold (see audit.tracing).
+AUDIT_SLOW_REQUEST_MS = 500
+AUDIT_SLOW_REQUEST_QUERIES = 100
+
+# Hot-view benchmarks (python manage.py test core.benchmarks): dataset size as a
+# multiple of core.seed.SCALE, warm requests per view, and how much slower than
+# its baseline a view may get before it counts as a regression.
+BENCHMARK_SCALE = 1
+BENCHMARK_REPEAT = 5
+BENCHMARK_LATENCY_TOLERANCE = 0.5  # fraction of the baseline
+BENCHMARK_LATENCY_FLOOR_MS = 5
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'audit.middleware.CorrelationIdMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.RoleInfoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'audit.middleware.CorrelationIdMiddleware',
+    'audit.middleware.AuditBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'medcare_hms.urls'
@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from .models import Notification
-from .utils import create_notification
+from .utils import create_notification, create_notifications
 from accounts.tests import create_user_with_role
 from datetime import timedelta
 
@@ -127,6 +127,25 @@ class NotificationUtilsTest(TestCase):
         notification = Notification.objects.first()
         self.assertEqual(notification.link, "/actions/1/")
 
+    def test_create_notifications_bulk(self):
+        """Test fanning one notification out to many recipients in one query"""
+        other = User.objects.create_user(username='otheruser', password='password')
+
+        with self.assertNumQueries(1):
+            create_notifications([self.user, other.pk], "Clinic closes early today", link="/news/")
+
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(
+            set(Notification.objects.values_list('recipient_id', flat=True)),
+            {self.user.pk, other.pk}
+        )
+        self.assertTrue(all(n.link == "/news/" for n in Notification.objects.all()))
+
+    def test_create_notifications_no_recipients(self):
+        """Test that an empty recipient list creates nothing"""
+        create_notifications([], "Nobody to tell")
+        self.assertEqual(Notification.objects.count(), 0)
+
 
 class NotificationViewsTest(TestCase):
     """Test suite for notification views"""
@@ -8,4 +8,16 @@ def create_notification(recipient, message, link=None):
         recipient=recipient,
         message=message,
         link=link
-    )
\ No newline at end of file
+    )
+
+
+def create_notifications(recipients, message, link=None):
+    """
+    Create the same notification for many recipients in a single INSERT.
+    Recipients may be User instances or user ids.
+    """
+    notifications = [
+        Notification(recipient_id=getattr(recipient, 'pk', recipient), message=message, link=link)
+        for recipient in recipients
+    ]
+    return Notification.objects.bulk_create(notifications)
@@ -0,0 +1,74 @@
+"""
+Conflict-safe appointment booking.
+
+Both booking views go through book_appointment(). The slot is reserved by the
+INSERT itself: the partial unique constraint on Appointment (doctor, date and
+time among active statuses) lets exactly one of several concurrent bookings
+win, whichever view or worker they come from. Losers get SlotUnavailable
+carrying the doctor's next open slots to offer instead. Lock and serialization
+errors from a busy database are retried with a short backoff.
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, transaction
+
+from doctors.models import DoctorProfile
+from doctors.slots import search_open_slots
+from .models import Appointment
+
+BOOKING_RETRIES = 5
+ALTERNATIVE_DAYS = 7
+
+
+class SlotUnavailable(Exception):
+    """The requested slot is held by another active appointment"""
+
+    def __init__(self, alternatives):
+        super().__init__("This time slot has just been booked by someone else.")
+        self.alternatives = alternatives
+
+
+def slot_taken(doctor_id, day, slot_time, exclude_pk=None):
+    clashes = Appointment.objects.filter(
+        doctor_id=doctor_id, appointment_date=day, appointment_time=slot_time,
+        status__in=Appointment.ACTIVE_STATUSES,
+    )
+    if exclude_pk:
+        clashes = clashes.exclude(pk=exclude_pk)
+    return clashes.exists()
+
+
+def suggest_alternatives(doctor_id, day, limit=3):
+    """The doctor's next open slots from the requested day on"""
+    return search_open_slots(
+        DoctorProfile.objects.filter(pk=doctor_id), day, day + timedelta(days=ALTERNATIVE_DAYS), limit
+    )
+
+
+def book_appointment(appointment, retries=BOOKING_RETRIES):
+    """
+    Save a new or rescheduled appointment only if its slot is still free.
+
+    Raises SlotUnavailable when another active appointment holds the slot.
+    """
+    slot = (appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
+    for attempt in range(retries):
+        try:
+            if appointment.status in Appointment.ACTIVE_STATUSES and slot_taken(*slot, exclude_pk=appointment.pk):
+                break
+            with transaction.atomic():
+                appointment.save()
+            return appointment
+        except IntegrityError:
+            if slot_taken(*slot, exclude_pk=appointment.pk):
+                break
+            raise
+        except OperationalError:
+            # Lock contention under load; back off and try again
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.02 * (attempt + 1) + random.uniform(0, 0.02))
+    raise SlotUnavailable(suggest_alternatives(appointment.doctor_id, appointment.appointment_date))
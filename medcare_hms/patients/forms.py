@@ -127,24 +127,9 @@ class AppointmentBookingForm(forms.ModelForm):
             raise ValidationError("Appointment date cannot be in the past.")
         return appointment_date
 
-    def clean(self):
-        cleaned_data = super().clean()
-        doctor = cleaned_data.get('doctor')
-        appointment_date = cleaned_data.get('appointment_date')
-        appointment_time = cleaned_data.get('appointment_time')
-
-        if doctor and appointment_date and appointment_time:
-            # Check for double booking
-            existing_appointments = Appointment.objects.filter(
-                doctor=doctor,
-                appointment_date=appointment_date,
-                appointment_time=appointment_time
-            ).exclude(pk=self.instance.pk) # Exclude self if updating
-
-            if existing_appointments.exists():
-                raise ValidationError("This time slot with the selected doctor is already booked.")
-        return cleaned_data
-    
+    # Slot conflicts are not checked here: patients.booking.book_appointment
+    # enforces them against active appointments only and suggests alternatives.
+
 
 class MedicalRecordForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+ACTIVE_STATUSES = ('Pending', 'Approved', 'Completed')
+
+
+def cancel_double_bookings(apps, schema_editor):
+    """Keep the earliest active appointment per slot; later duplicates would break the constraint"""
+    Appointment = apps.get_model('patients', 'Appointment')
+    active = Appointment.objects.filter(status__in=ACTIVE_STATUSES)
+    clashes = (
+        active.values('doctor_id', 'appointment_date', 'appointment_time')
+        .annotate(total=Count('id')).filter(total__gt=1).order_by()
+    )
+    for clash in clashes:
+        duplicates = active.filter(
+            doctor_id=clash['doctor_id'],
+            appointment_date=clash['appointment_date'],
+            appointment_time=clash['appointment_time'],
+        ).order_by('created_at', 'id').values_list('id', flat=True)[1:]
+        Appointment.objects.filter(pk__in=list(duplicates)).update(status='Cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_alter_patientprofile_profile_picture_medicalrecord'),
+        # The sample data seeds random appointments; clean those up before the constraint goes on
+        ('reports', '0002_populate_sample_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ACTIVE_STATUSES)), fields=('doctor', 'appointment_date', 'appointment_time'), name='unique_active_appointment_slot'),
+        ),
+    ]
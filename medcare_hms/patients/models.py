@@ -33,6 +33,10 @@ class PatientProfile(models.Model):
         return f"Patient: {self.user.username}"
 
 
+# Statuses that hold on to their time slot; Rejected and Cancelled free it
+ACTIVE_APPOINTMENT_STATUSES = ('Pending', 'Approved', 'Completed')
+
+
 def get_appointment_attachment_path(instance, filename):
     return f'attachments/appointments/{instance.pk}/{filename}'
 
@@ -41,6 +45,7 @@ class Appointment(models.Model):
         ('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected'),
         ('Completed', 'Completed'), ('Cancelled', 'Cancelled'),
     )
+    ACTIVE_STATUSES = ACTIVE_APPOINTMENT_STATUSES
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
     doctor = models.ForeignKey(DoctorProfile, on_delete=models.PROTECT) # Protect doctor from deletion if they have appointments
     appointment_date = models.DateField()
@@ -54,6 +59,16 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # A doctor's time slot can be held by only one active appointment (see patients.booking)
+            models.UniqueConstraint(
+                fields=['doctor', 'appointment_date', 'appointment_time'],
+                condition=models.Q(status__in=ACTIVE_APPOINTMENT_STATUSES),
+                name='unique_active_appointment_slot',
+            ),
+        ]
+
     def __str__(self):
         return f"Appointment for {self.patient.user.username} with {self.doctor}"
     
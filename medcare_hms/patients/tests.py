@@ -1,10 +1,14 @@
 # patients/tests.py
 
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.db import connection
 from django.urls import reverse
 from datetime import date, time, timedelta
 from .models import PatientProfile, Appointment
 from .forms import AppointmentBookingForm, PatientProfileForm
+from .booking import SlotUnavailable, book_appointment
+from doctors.models import DoctorAvailability
+import threading
 from doctors.models import DoctorProfile
 from accounts.tests import create_user_with_role
 
@@ -93,4 +97,124 @@ class PatientFormsTest(TestCase):
         form = AppointmentBookingForm(data=form_data)
         self.assertFalse(form.is_valid())
         self.assertIn('appointment_date', form.errors)
-        self.assertEqual(form.errors['appointment_date'][0], "Appointment date cannot be in the past.")
\ No newline at end of file
+        self.assertEqual(form.errors['appointment_date'][0], "Appointment date cannot be in the past.")
+
+
+class AppointmentBookingServiceTest(TestCase):
+    """Tests for conflict-safe booking through patients.booking"""
+
+    def setUp(self):
+        self.day = date.today() + timedelta(days=1)
+        doctor_user = create_user_with_role('booking_doctor', 'password', 'DOCTOR')
+        self.doctor = DoctorProfile.objects.create(user=doctor_user, specialization='Cardiology')
+        DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=self.day.weekday(), start_time=time(9, 0), end_time=time(10, 0)
+        )
+        self.patients = [
+            PatientProfile.objects.create(user=create_user_with_role(f'booking_patient{i}', 'password', 'PATIENT'))
+            for i in range(2)
+        ]
+
+    def make(self, patient, status='Pending'):
+        return Appointment(
+            patient=patient, doctor=self.doctor, appointment_date=self.day,
+            appointment_time=time(9, 0), reason='Checkup', status=status
+        )
+
+    def test_second_booking_of_a_slot_is_refused_with_alternatives(self):
+        book_appointment(self.make(self.patients[0]))
+        before = Appointment.objects.count()
+        with self.assertRaises(SlotUnavailable) as conflict:
+            book_appointment(self.make(self.patients[1]))
+        self.assertEqual([slot['start_time'] for slot in conflict.exception.alternatives][:1], [time(9, 30)])
+        self.assertEqual(Appointment.objects.count(), before)
+
+    def test_cancelled_appointments_release_their_slot(self):
+        first = book_appointment(self.make(self.patients[0]))
+        first.status = 'Cancelled'
+        first.save()
+        book_appointment(self.make(self.patients[1]))
+        slot = Appointment.objects.filter(doctor=self.doctor, appointment_date=self.day, appointment_time=time(9, 0))
+        self.assertEqual(slot.filter(status__in=Appointment.ACTIVE_STATUSES).count(), 1)
+
+    def test_patient_booking_view_reports_conflict(self):
+        book_appointment(self.make(self.patients[0]))
+        before = Appointment.objects.count()
+        self.client.login(username='booking_patient1', password='password')
+        response = self.client.post(reverse('patients:book_appointment'), {
+            'doctor': self.doctor.pk,
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': '09:00:00',
+            'reason': 'Checkup',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['alternative_slots'])
+        self.assertEqual(Appointment.objects.count(), before)
+
+    def test_patient_can_rebook_a_cancelled_slot(self):
+        self.make(self.patients[0], status='Cancelled').save()
+        self.client.login(username='booking_patient1', password='password')
+        self.client.post(reverse('patients:book_appointment'), {
+            'doctor': self.doctor.pk,
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': '09:00:00',
+            'reason': 'Checkup',
+        })
+        self.assertTrue(Appointment.objects.filter(
+            patient=self.patients[1], doctor=self.doctor, appointment_date=self.day, status='Pending'
+        ).exists())
+
+    def test_doctor_cannot_reactivate_into_a_taken_slot(self):
+        rejected = self.make(self.patients[0], status='Rejected')
+        rejected.save()
+        book_appointment(self.make(self.patients[1]))
+        self.client.login(username='booking_doctor', password='password')
+        response = self.client.get(reverse('doctors:update_appointment_status', args=[rejected.pk, 'Approved']))
+        self.assertRedirects(response, reverse('doctors:doctor_appointments'), fetch_redirect_response=False)
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.status, 'Rejected')
+
+
+class AppointmentBookingLoadTest(TransactionTestCase):
+    """Fires concurrent bookings at one slot; exactly one may win"""
+
+    concurrency = 8
+
+    def setUp(self):
+        self.day = date.today() + timedelta(days=1)
+        doctor_user = create_user_with_role('load_doctor', 'password', 'DOCTOR')
+        self.doctor = DoctorProfile.objects.create(user=doctor_user, specialization='Cardiology')
+        self.patients = [
+            PatientProfile.objects.create(user=create_user_with_role(f'load_patient{i}', 'password', 'PATIENT'))
+            for i in range(self.concurrency)
+        ]
+
+    def test_concurrent_bookings_of_one_slot(self):
+        barrier = threading.Barrier(self.concurrency)
+        outcomes = []
+
+        def attempt(patient):
+            try:
+                barrier.wait()
+                book_appointment(Appointment(
+                    patient=patient, doctor=self.doctor, appointment_date=self.day,
+                    appointment_time=time(9, 0), reason='Load test', status='Approved'
+                ), retries=50)
+                outcomes.append('booked')
+            except SlotUnavailable:
+                outcomes.append('conflict')
+            except Exception as exc:
+                outcomes.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(patient,)) for patient in self.patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['booked'] + ['conflict'] * (self.concurrency - 1))
+        self.assertEqual(Appointment.objects.filter(
+            doctor=self.doctor, appointment_date=self.day, appointment_time=time(9, 0)
+        ).count(), 1)
@@ -5,13 +5,14 @@ from django.contrib import messages
 from accounts.decorators import patient_required, receptionist_required, admin_required
 from .models import PatientProfile, Appointment, MedicalRecord 
 from .forms import PatientProfileForm, AppointmentBookingForm
+from .booking import SlotUnavailable, book_appointment
 from datetime import date
 from doctors.models import DoctorProfile
 from django.utils import timezone
 from billing.models import Bill 
 from django.db.models import Q
 from django.urls import reverse
-from notifications.utils import create_notification
+from notifications.utils import create_notifications
 from accounts.models import UserProfile as AccountUserProfile
 
 # --- Profile Views ---
@@ -40,6 +41,7 @@ def edit_patient_profile_view(request):
 @patient_required
 def book_appointment_view(request):
     patient_profile = get_object_or_404(PatientProfile, user=request.user)
+    alternatives = []
     
     if request.method == 'POST':
         form = AppointmentBookingForm(request.POST, request.FILES)
@@ -47,15 +49,20 @@ def book_appointment_view(request):
             appointment = form.save(commit=False)
             appointment.patient = patient_profile
             appointment.created_by = request.user
-            appointment.save()
-            # --- NOTIFICATION LOGIC ---
-            receptionists = AccountUserProfile.objects.filter(role='RECEPTIONIST', user__is_active=True)
-            message = f"New appointment request from {request.user.get_full_name()} for Dr. {appointment.doctor.user.get_full_name()}."
-            for profile in receptionists:
-                create_notification(recipient=profile.user, message=message, link=reverse('receptionist:appointment_list'))
-            # --- END NOTIFICATION LOGIC ---
-            messages.success(request, 'Your appointment has been successfully booked and is pending approval.')
-            return redirect('patients:my_appointments')
+            try:
+                book_appointment(appointment)
+            except SlotUnavailable as conflict:
+                alternatives = conflict.alternatives
+                form.add_error('appointment_time', str(conflict))
+                messages.error(request, f"{conflict} Please choose another time.")
+            else:
+                # --- NOTIFICATION LOGIC ---
+                receptionist_ids = AccountUserProfile.objects.filter(role='RECEPTIONIST', user__is_active=True).values_list('user_id', flat=True)
+                message = f"New appointment request from {request.user.get_full_name()} for Dr. {appointment.doctor.user.get_full_name()}."
+                create_notifications(receptionist_ids, message, link=reverse('receptionist:appointment_list'))
+                # --- END NOTIFICATION LOGIC ---
+                messages.success(request, 'Your appointment has been successfully booked and is pending approval.')
+                return redirect('patients:my_appointments')
     else:
         form = AppointmentBookingForm()
 
@@ -63,7 +70,8 @@ def book_appointment_view(request):
     
     context = {
         'form': form,
-        'doctors': available_doctors # Pass the list of doctors to the template
+        'doctors': available_doctors, # Pass the list of doctors to the template
+        'alternative_slots': alternatives, # Next open slots when the chosen one was just taken
     }
     return render(request, 'patients/book_appointment.html', context)
 
@@ -7,6 +7,7 @@ from django.contrib.auth.models import User
 from django.db.models import Q
 from accounts.models import UserProfile as AccountUserProfile
 from patients.models import PatientProfile, Appointment
+from patients.booking import SlotUnavailable, book_appointment
 from .models import ReceptionistProfile
 from .forms import ReceptionistProfileForm, ManualPatientRegistrationForm, AppointmentBookingForm
 from patients.forms import PatientProfileForm as PatientUpdateForm # Reuse the patient's own edit form
@@ -113,6 +114,7 @@ def appointment_list_view(request):
 @login_required
 @receptionist_required
 def book_appointment_view(request):
+    alternatives = []
     if request.method == 'POST':
         # The form now needs to be instantiated without the patient argument initially
         form = AppointmentBookingForm(request.POST)
@@ -120,32 +122,37 @@ def book_appointment_view(request):
             appointment = form.save(commit=False)
             appointment.created_by = request.user
             appointment.status = 'Approved' # Receptionist bookings are auto-approved
-            appointment.save()
-
-            # --- START OF NEW NOTIFICATION LOGIC ---
-
-            # 1. Notify the Patient
-            patient_user = appointment.patient.user
-            patient_message = f"An appointment has been booked for you with {appointment.doctor} on {appointment.appointment_date} at {appointment.appointment_time.strftime('%I:%M %p')}."
-            create_notification(
-                recipient=patient_user,
-                message=patient_message,
-                link=reverse('patients:my_appointments')
-            )
-
-            # 2. Notify the Doctor
-            doctor_user = appointment.doctor.user
-            doctor_message = f"A new appointment has been scheduled for you with patient {appointment.patient.user.get_full_name()} on {appointment.appointment_date}."
-            create_notification(
-                recipient=doctor_user,
-                message=doctor_message,
-                link=reverse('doctors:doctor_appointments')
-            )
-
-            # --- END OF NEW NOTIFICATION LOGIC ---
-
-            messages.success(request, f"Appointment for {appointment.patient.user.get_full_name()} successfully booked and confirmed.")
-            return redirect('receptionist:appointment_list')
+            try:
+                book_appointment(appointment)
+            except SlotUnavailable as conflict:
+                alternatives = conflict.alternatives
+                form.add_error('appointment_time', str(conflict))
+                messages.error(request, f"{conflict} Please choose another time.")
+            else:
+                # --- START OF NEW NOTIFICATION LOGIC ---
+
+                # 1. Notify the Patient
+                patient_user = appointment.patient.user
+                patient_message = f"An appointment has been booked for you with {appointment.doctor} on {appointment.appointment_date} at {appointment.appointment_time.strftime('%I:%M %p')}."
+                create_notification(
+                    recipient=patient_user,
+                    message=patient_message,
+                    link=reverse('patients:my_appointments')
+                )
+
+                # 2. Notify the Doctor
+                doctor_user = appointment.doctor.user
+                doctor_message = f"A new appointment has been scheduled for you with patient {appointment.patient.user.get_full_name()} on {appointment.appointment_date}."
+                create_notification(
+                    recipient=doctor_user,
+                    message=doctor_message,
+                    link=reverse('doctors:doctor_appointments')
+                )
+
+                # --- END OF NEW NOTIFICATION LOGIC ---
+
+                messages.success(request, f"Appointment for {appointment.patient.user.get_full_name()} successfully booked and confirmed.")
+                return redirect('receptionist:appointment_list')
     else:
         form = AppointmentBookingForm()
 
@@ -158,7 +165,8 @@ def book_appointment_view(request):
     context = {
         'form': form,
         'doctors': available_doctors,
-        'patients': all_patients
+        'patients': all_patients,
+        'alternative_slots': alternatives,
     }
     return render(request, 'receptionist/book_appointment.html', context)
 
@@ -177,7 +185,12 @@ def update_appointment_status_view(request, pk, status):
         return redirect('receptionist:appointment_list')
         
     appointment.status = status
-    appointment.save()
+    try:
+        # Approving a rejected or cancelled appointment re-claims its slot
+        book_appointment(appointment)
+    except SlotUnavailable as conflict:
+        messages.error(request, f"{conflict} The appointment was not {status.lower()}.")
+        return redirect('receptionist:appointment_list')
     # --- NOTIFICATION LOGIC ---
     patient_user = appointment.patient.user
     patient_message = f"Your appointment for {appointment.appointment_date} with Dr. {appointment.doctor.user.get_full_name()} has been {status.lower()} by our staff."
@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import KpiSnapshot, DailyRollup, MonthlyRollup
 
-# Register your models here.
+@admin.register(KpiSnapshot)
+class KpiSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['computed_at', 'total_appointments', 'active_prescriptions', 'total_revenue', 'outstanding_revenue']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'appointments', 'paid_revenue']
+    date_hierarchy = 'day'
+
+
+@admin.register(MonthlyRollup)
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ['month', 'appointments', 'paid_revenue']
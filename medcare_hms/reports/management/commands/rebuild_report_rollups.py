@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from reports.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Recompute the daily and monthly report rollups from all appointments and bills.'
+
+    def handle(self, *args, **options):
+        days = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt report rollups for {days} days."))
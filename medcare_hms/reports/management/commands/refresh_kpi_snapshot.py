@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from reports.models import KpiSnapshot
+
+class Command(BaseCommand):
+    help = 'Recompute the reports dashboard KPIs into a new snapshot; schedule it (e.g. every 5 minutes) via cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30, help='Delete snapshots older than this many days')
+
+    def handle(self, *args, **options):
+        snapshot = KpiSnapshot.capture()
+        cutoff = timezone.now() - timedelta(days=options['keep_days'])
+        pruned, _ = KpiSnapshot.objects.filter(computed_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Captured {snapshot}; pruned {pruned} old snapshots."))
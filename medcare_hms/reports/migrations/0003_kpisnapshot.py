@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_populate_sample_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_appointments', models.PositiveIntegerField(default=0)),
+                ('completed_appointments', models.PositiveIntegerField(default=0)),
+                ('cancelled_appointments', models.PositiveIntegerField(default=0)),
+                ('active_prescriptions', models.PositiveIntegerField(default=0)),
+                ('new_patients_30_days', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('outstanding_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-computed_at'],
+                'get_latest_by': 'computed_at',
+            },
+        ),
+    ]
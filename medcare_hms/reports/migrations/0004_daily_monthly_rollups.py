@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:33
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Appointment = apps.get_model('patients', 'Appointment')
+    Bill = apps.get_model('billing', 'Bill')
+    DailyRollup = apps.get_model('reports', 'DailyRollup')
+    MonthlyRollup = apps.get_model('reports', 'MonthlyRollup')
+
+    days = {}
+    for row in Appointment.objects.values('appointment_date').annotate(total=Count('id')).order_by():
+        days.setdefault(row['appointment_date'], [0, Decimal('0')])[0] = row['total']
+    for row in Bill.objects.filter(status='Paid').values('bill_date').annotate(total=Sum('total_amount')).order_by():
+        days.setdefault(row['bill_date'], [0, Decimal('0')])[1] = row['total'] or Decimal('0')
+
+    months = {}
+    for day, (appointments, revenue) in days.items():
+        month = months.setdefault(day.replace(day=1), [0, Decimal('0')])
+        month[0] += appointments
+        month[1] += revenue
+
+    DailyRollup.objects.bulk_create(
+        DailyRollup(day=day, appointments=a, paid_revenue=r) for day, (a, r) in days.items()
+    )
+    MonthlyRollup.objects.bulk_create(
+        MonthlyRollup(month=month, appointments=a, paid_revenue=r) for month, (a, r) in months.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_kpisnapshot'),
+        ('patients', '0003_alter_patientprofile_profile_picture_medicalrecord'),
+        ('billing', '0004_bill_amount_paid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('appointments', models.IntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('appointments', models.IntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
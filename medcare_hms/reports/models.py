@@ -1,3 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class KpiSnapshot(models.Model):
+    """Dashboard KPI totals computed off the request path.
+
+    Written by the refresh_kpi_snapshot command (run it from cron/a scheduler),
+    so kpi_summary_api reads one row instead of scanning the source tables.
+    """
+    total_appointments = models.PositiveIntegerField(default=0)
+    completed_appointments = models.PositiveIntegerField(default=0)
+    cancelled_appointments = models.PositiveIntegerField(default=0)
+    active_prescriptions = models.PositiveIntegerField(default=0)
+    new_patients_30_days = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-computed_at']
+        get_latest_by = 'computed_at'
+
+    def __str__(self):
+        return f"KPI snapshot at {self.computed_at:%Y-%m-%d %H:%M}"
+
+    @staticmethod
+    def compute():
+        """Compute the KPI figures live, in one conditional aggregate per source table"""
+        from billing.models import Bill
+        from patients.models import Appointment, PatientProfile
+        from prescriptions.models import Prescription
+
+        now = timezone.now()
+        money = DecimalField(max_digits=14, decimal_places=2)
+        appointments = Appointment.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='Completed')),
+            cancelled=Count('id', filter=Q(status__in=['Cancelled', 'Rejected'])),
+        )
+        bills = Bill.objects.aggregate(
+            paid=Coalesce(Sum('total_amount', filter=Q(status='Paid')), 0, output_field=money),
+            outstanding=Coalesce(
+                Sum(F('total_amount') - F('amount_paid'), filter=Q(status__in=['Unpaid', 'Partially Paid'])),
+                0, output_field=money
+            ),
+        )
+        return {
+            'total_appointments': appointments['total'],
+            'completed_appointments': appointments['completed'],
+            'cancelled_appointments': appointments['cancelled'],
+            'active_prescriptions': Prescription.objects.filter(status='ACTIVE').count(),
+            # New patients in last 30 days (based on related user date_joined)
+            'new_patients_30_days': PatientProfile.objects.filter(
+                user__date_joined__gte=now - timedelta(days=30)
+            ).count(),
+            'total_revenue': bills['paid'],
+            'outstanding_revenue': bills['outstanding'],
+            'computed_at': now,
+        }
+
+    @classmethod
+    def capture(cls):
+        """Compute the KPIs and store them as a new snapshot"""
+        return cls.objects.create(**cls.compute())
+
+    @classmethod
+    def get_current(cls):
+        """
+        Return the latest snapshot, capturing a new one when there is none yet
+        or the latest is older than KPI_SNAPSHOT_MAX_AGE seconds (None never expires).
+        """
+        snapshot = cls.objects.order_by('-computed_at').first()
+        max_age = getattr(settings, 'KPI_SNAPSHOT_MAX_AGE', 15 * 60)
+        if snapshot is None or (
+            max_age is not None and snapshot.computed_at < timezone.now() - timedelta(seconds=max_age)
+        ):
+            snapshot = cls.capture()
+        return snapshot
+
+
+class DailyRollup(models.Model):
+    """Appointments booked and revenue paid on one calendar day.
+
+    Kept in step by reports.signals as appointments and bills change; rebuilt
+    from scratch by the rebuild_report_rollups command.
+    """
+    day = models.DateField(unique=True)
+    appointments = models.IntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.day}: {self.appointments} appointments, {self.paid_revenue} paid"
+
+
+class MonthlyRollup(models.Model):
+    """Appointments booked and revenue paid in one month, keyed by its first day"""
+    month = models.DateField(unique=True)
+    appointments = models.IntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['month']
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.month:%b %Y}: {self.appointments} appointments, {self.paid_revenue} paid"
@@ -0,0 +1,63 @@
+"""
+Daily and monthly rollups behind the reports time-series charts.
+
+Appointments are counted on their appointment_date and paid revenue on the
+bill_date of bills whose status is Paid, the same buckets the charts used to
+GROUP BY on every request. Signal handlers apply each change as a delta to
+one DailyRollup and one MonthlyRollup row; rebuild_rollups() recomputes
+everything from the source tables.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import DailyRollup, MonthlyRollup
+
+
+def apply_delta(day, appointments=0, paid_revenue=0):
+    """Add the given amounts to the day's and the month's rollup rows"""
+    if day is None or (not appointments and not paid_revenue):
+        return
+    with transaction.atomic():
+        for model, key in ((DailyRollup, {'day': day}), (MonthlyRollup, {'month': day.replace(day=1)})):
+            row, _ = model.objects.get_or_create(**key)
+            model.objects.filter(pk=row.pk).update(
+                appointments=F('appointments') + appointments,
+                paid_revenue=F('paid_revenue') + paid_revenue,
+            )
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from Appointment and Bill; returns the number of days written"""
+    from billing.models import Bill
+    from patients.models import Appointment
+
+    days = {}
+    appointment_days = Appointment.objects.values('appointment_date').annotate(total=Count('id')).order_by()
+    for row in appointment_days:
+        days.setdefault(row['appointment_date'], [0, Decimal('0')])[0] = row['total']
+    revenue_days = (
+        Bill.objects.filter(status='Paid')
+        .values('bill_date').annotate(total=Sum('total_amount')).order_by()
+    )
+    for row in revenue_days:
+        days.setdefault(row['bill_date'], [0, Decimal('0')])[1] = row['total'] or Decimal('0')
+
+    months = {}
+    for day, (appointments, revenue) in days.items():
+        month = months.setdefault(day.replace(day=1), [0, Decimal('0')])
+        month[0] += appointments
+        month[1] += revenue
+
+    with transaction.atomic():
+        DailyRollup.objects.all().delete()
+        MonthlyRollup.objects.all().delete()
+        DailyRollup.objects.bulk_create(
+            DailyRollup(day=day, appointments=a, paid_revenue=r) for day, (a, r) in days.items()
+        )
+        MonthlyRollup.objects.bulk_create(
+            MonthlyRollup(month=month, appointments=a, paid_revenue=r) for month, (a, r) in months.items()
+        )
+    return len(days)
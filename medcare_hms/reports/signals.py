@@ -0,0 +1,52 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from billing.models import Bill
+from patients.models import Appointment
+from .rollups import apply_delta
+
+
+# The stored row is read in pre_save so post_save can move counts between buckets
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_date(sender, instance, **kwargs):
+    instance._rollup_previous = (
+        sender.objects.filter(pk=instance.pk).values('appointment_date').first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def rollup_appointment_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous and previous['appointment_date'] != instance.appointment_date:
+        apply_delta(previous['appointment_date'], appointments=-1)
+        apply_delta(instance.appointment_date, appointments=1)
+    elif previous is None:
+        apply_delta(instance.appointment_date, appointments=1)
+
+
+@receiver(post_delete, sender=Appointment)
+def rollup_appointment_deleted(sender, instance, **kwargs):
+    apply_delta(instance.appointment_date, appointments=-1)
+
+
+@receiver(pre_save, sender=Bill)
+def remember_bill_payment(sender, instance, **kwargs):
+    instance._rollup_previous = (
+        sender.objects.filter(pk=instance.pk).values('status', 'bill_date', 'total_amount').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Bill)
+def rollup_bill_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous and previous['status'] == 'Paid':
+        apply_delta(previous['bill_date'], paid_revenue=-previous['total_amount'])
+    if instance.status == 'Paid':
+        apply_delta(instance.bill_date, paid_revenue=instance.total_amount)
+
+
+@receiver(post_delete, sender=Bill)
+def rollup_bill_deleted(sender, instance, **kwargs):
+    if instance.status == 'Paid':
+        apply_delta(instance.bill_date, paid_revenue=-instance.total_amount)
@@ -1,3 +1,151 @@
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.core.management import call_command
+from accounts.tests import create_user_with_role
+from billing.models import Bill
+from doctors.models import DoctorProfile
+from patients.models import Appointment, PatientProfile
+from .models import KpiSnapshot, DailyRollup, MonthlyRollup
+from .rollups import rebuild_rollups
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+import json
 
-# Create your tests here.
+
+class KpiSnapshotTest(TestCase):
+    """Test suite for the precomputed KPI snapshot behind kpi_summary_api"""
+
+    def setUp(self):
+        self.admin = create_user_with_role('admin1', 'password', 'ADMIN')
+        patient_user = create_user_with_role('kpi_patient', 'password', 'PATIENT')
+        doctor_user = create_user_with_role('kpi_doctor', 'password', 'DOCTOR')
+        self.patient = PatientProfile.objects.create(user=patient_user)
+        self.doctor = DoctorProfile.objects.create(user=doctor_user, specialization='Cardiology')
+        self.client.login(username='admin1', password='password')
+
+    def add_appointment(self, status):
+        return Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=date.today(),
+            appointment_time=time(9, 0), reason='Checkup', status=status
+        )
+
+    def get_kpis(self, **params):
+        response = self.client.get(reverse('reports:kpi_summary_api'), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_compute_matches_source_tables(self):
+        """The single-pass aggregates agree with plain per-status counts"""
+        self.add_appointment('Completed')
+        self.add_appointment('Cancelled')
+        Bill.objects.create(patient=self.patient, total_amount=Decimal('100'), amount_paid=Decimal('40'), status='Partially Paid')
+        figures = KpiSnapshot.compute()
+
+        self.assertEqual(figures['total_appointments'], Appointment.objects.count())
+        self.assertEqual(figures['completed_appointments'], Appointment.objects.filter(status='Completed').count())
+        self.assertEqual(
+            figures['cancelled_appointments'],
+            Appointment.objects.filter(status__in=['Cancelled', 'Rejected']).count()
+        )
+        self.assertGreaterEqual(figures['outstanding_revenue'], Decimal('60'))
+
+    def test_api_serves_latest_snapshot(self):
+        """Without ?fresh=1 the API reads the stored snapshot instead of the source tables"""
+        KpiSnapshot.capture()
+        before = self.get_kpis()
+        self.add_appointment('Pending')
+        self.assertEqual(self.get_kpis()['totalAppointments'], before['totalAppointments'])
+
+        fresh = self.get_kpis(fresh='1')
+        self.assertEqual(fresh['totalAppointments'], before['totalAppointments'] + 1)
+        self.assertEqual(self.get_kpis()['totalAppointments'], fresh['totalAppointments'])
+
+    def test_first_request_captures_a_snapshot(self):
+        """The API seeds a snapshot when none has been taken yet"""
+        self.assertFalse(KpiSnapshot.objects.exists())
+        self.get_kpis()
+        self.assertEqual(KpiSnapshot.objects.count(), 1)
+
+    def test_stale_snapshot_is_recomputed(self):
+        """A snapshot older than KPI_SNAPSHOT_MAX_AGE is replaced on the next request"""
+        stale = KpiSnapshot.capture()
+        KpiSnapshot.objects.filter(pk=stale.pk).update(computed_at=timezone.now() - timedelta(hours=1))
+        self.add_appointment('Pending')
+        with self.settings(KPI_SNAPSHOT_MAX_AGE=60):
+            self.assertEqual(self.get_kpis()['totalAppointments'], Appointment.objects.count())
+        self.assertEqual(KpiSnapshot.objects.count(), 2)
+
+    def test_refresh_command_stores_snapshot(self):
+        """refresh_kpi_snapshot captures a new snapshot"""
+        call_command('refresh_kpi_snapshot', stdout=StringIO())
+        self.assertEqual(KpiSnapshot.objects.count(), 1)
+
+
+class RollupTest(TestCase):
+    """Test suite for the signal-maintained rollups behind the time-series charts"""
+
+    def setUp(self):
+        create_user_with_role('admin1', 'password', 'ADMIN')
+        self.patient = PatientProfile.objects.create(user=create_user_with_role('roll_patient', 'password', 'PATIENT'))
+        self.doctor = DoctorProfile.objects.create(
+            user=create_user_with_role('roll_doctor', 'password', 'DOCTOR'), specialization='Cardiology'
+        )
+        self.client.login(username='admin1', password='password')
+        self.day = date(2024, 3, 15)
+
+    def rollup_snapshot(self):
+        return (
+            list(DailyRollup.objects.exclude(appointments=0, paid_revenue=0).values_list('day', 'appointments', 'paid_revenue')),
+            list(MonthlyRollup.objects.exclude(appointments=0, paid_revenue=0).values_list('month', 'appointments', 'paid_revenue')),
+        )
+
+    def test_signals_match_a_full_rebuild(self):
+        """Creating, rescheduling, paying and deleting keep the rollups equal to a rebuild"""
+        paid_today = DailyRollup.objects.filter(day=date.today()).values_list('paid_revenue', flat=True).first() or 0
+        appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day,
+            appointment_time=time(9, 0), reason='Checkup'
+        )
+        appointment.appointment_date = self.day + timedelta(days=30)
+        appointment.status = 'Approved'
+        appointment.save()
+        bill = Bill.objects.create(patient=self.patient, appointment=appointment, total_amount=Decimal('250'))
+        bill.status = 'Paid'
+        bill.amount_paid = bill.total_amount
+        bill.save()
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day,
+            appointment_time=time(10, 0), reason='Follow-up'
+        ).delete()
+
+        maintained = self.rollup_snapshot()
+        rebuild_rollups()
+        self.assertEqual(maintained, self.rollup_snapshot())
+        self.assertEqual(MonthlyRollup.objects.get(month=date(2024, 4, 1)).appointments, 1)
+        self.assertEqual(DailyRollup.objects.get(day=bill.bill_date).paid_revenue, paid_today + Decimal('250'))
+
+    def test_endpoints_read_monthly_rollups(self):
+        """The chart endpoints serve the monthly rollup rows"""
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day,
+            appointment_time=time(9, 0), reason='Checkup'
+        )
+        response = self.client.get(reverse('reports:appointments_over_time_api'))
+        data = json.loads(response.content)
+        self.assertIn('Mar 2024', data['labels'])
+        self.assertEqual(data['data'][data['labels'].index('Mar 2024')], 1)
+
+        with self.assertNumQueries(3):  # session, user, rollups; the role comes from the session
+            self.client.get(reverse('reports:revenue_over_time_api'))
+
+    def test_daily_period(self):
+        """?period=day returns the recent daily series"""
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=date.today(),
+            appointment_time=time(9, 0), reason='Checkup'
+        )
+        response = self.client.get(reverse('reports:appointments_over_time_api'), {'period': 'day', 'days': 1})
+        data = json.loads(response.content)
+        self.assertEqual(data['labels'], [date.today().strftime('%d %b %Y')])
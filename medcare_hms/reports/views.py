@@ -4,14 +4,13 @@ import json
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from accounts.decorators import admin_required
-from django.db.models import Count, Sum, F, DecimalField
-from django.db.models.functions import TruncMonth, Coalesce
+from django.db.models import Count, Sum
 from django.http import JsonResponse
 from django.utils import timezone
 from datetime import timedelta
-from patients.models import Appointment, PatientProfile
 from billing.models import Bill
 from prescriptions.models import Prescription
+from .models import KpiSnapshot, DailyRollup, MonthlyRollup
 
 @login_required
 @admin_required
@@ -24,61 +23,50 @@ def reports_dashboard_view(request):
 @login_required
 @admin_required
 def kpi_summary_api(request):
-    """Return JSON for KPI cards."""
-    total_appointments = Appointment.objects.count()
-    completed_appointments = Appointment.objects.filter(status='Completed').count()
-    cancelled_appointments = Appointment.objects.filter(status__in=['Cancelled','Rejected']).count()
-    active_prescriptions = Prescription.objects.filter(status='ACTIVE').count()
-
-    # New patients in last 30 days (based on related user date_joined)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    new_patients = PatientProfile.objects.filter(user__date_joined__gte=thirty_days_ago).count()
-
-    total_revenue = Bill.objects.filter(status='Paid').aggregate(
-        total=Coalesce(Sum('total_amount'), 0, output_field=DecimalField())
-    )['total']
-    outstanding_revenue = Bill.objects.filter(status__in=['Unpaid', 'Partially Paid']).aggregate(
-        total=Coalesce(Sum(F('total_amount') - F('amount_paid')), 0, output_field=DecimalField())
-    )['total']
+    """Return JSON for KPI cards from the latest snapshot; ?fresh=1 recomputes it first."""
+    if request.GET.get('fresh') == '1':
+        snapshot = KpiSnapshot.capture()
+    else:
+        snapshot = KpiSnapshot.get_current()
 
     return JsonResponse({
-        'totalAppointments': total_appointments,
-        'completedAppointments': completed_appointments,
-        'cancelledAppointments': cancelled_appointments,
-        'activePrescriptions': active_prescriptions,
-        'newPatients30Days': new_patients,
-        'totalRevenue': float(total_revenue),
-        'outstandingRevenue': float(outstanding_revenue),
+        'totalAppointments': snapshot.total_appointments,
+        'completedAppointments': snapshot.completed_appointments,
+        'cancelledAppointments': snapshot.cancelled_appointments,
+        'activePrescriptions': snapshot.active_prescriptions,
+        'newPatients30Days': snapshot.new_patients_30_days,
+        'totalRevenue': float(snapshot.total_revenue),
+        'outstandingRevenue': float(snapshot.outstanding_revenue),
+        'computedAt': snapshot.computed_at.isoformat(),
     })
 
 
+def _rollup_series(request, field):
+    """Labels and values of a rollup column; ?period=day with ?days=N gives the daily series"""
+    if request.GET.get('period') == 'day':
+        try:
+            days = min(max(int(request.GET.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        since = timezone.localdate() - timedelta(days=days - 1)
+        rows = DailyRollup.objects.filter(day__gte=since).exclude(**{field: 0}).values_list('day', field)
+        return [day.strftime('%d %b %Y') for day, _ in rows], [value for _, value in rows]
+    rows = MonthlyRollup.objects.exclude(**{field: 0}).values_list('month', field)
+    return [month.strftime('%b %Y') for month, _ in rows], [value for _, value in rows]
+
+
 @login_required
 @admin_required
 def appointments_over_time_api(request):
-    appointments_by_month = (
-        Appointment.objects
-        .annotate(month=TruncMonth('appointment_date'))
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
-    )
-    labels = [d['month'].strftime('%b %Y') for d in appointments_by_month]
-    data = [d['count'] for d in appointments_by_month]
+    labels, data = _rollup_series(request, 'appointments')
     return JsonResponse({'labels': labels, 'data': data})
 
 
 @login_required
 @admin_required
 def revenue_over_time_api(request):
-    revenue_by_month = (
-        Bill.objects.filter(status='Paid')
-        .annotate(month=TruncMonth('bill_date'))
-        .values('month')
-        .annotate(total=Sum('total_amount'))
-        .order_by('month')
-    )
-    labels = [r['month'].strftime('%b %Y') for r in revenue_by_month]
-    data = [float(r['total']) for r in revenue_by_month]
+    labels, totals = _rollup_series(request, 'paid_revenue')
+    data = [float(total) for total in totals]
     return JsonResponse({'labels': labels, 'data': data})
 
 
@@ -60,6 +60,13 @@ def main():
         },
     ]
     
+    # Opt-in hot-view benchmarks against stored baselines (see core/benchmarks.py)
+    if '--bench' in sys.argv:
+        test_suites.append({
+            'cmd': 'python manage.py test core.benchmarks --verbosity=2',
+            'desc': 'Performance - Hot View Benchmarks'
+        })
+    
     results = []
     
     # Run each test suite